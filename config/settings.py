@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -42,6 +45,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so it times everything below it; a no-op unless FINFLOW_INSTRUMENTATION
+    'finflow.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -63,6 +68,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'finflow.context_processors.branding',
             ],
         },
     },
@@ -73,14 +79,151 @@ WSGI_APPLICATION = 'config.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
+# FINFLOW_DB_ENGINE picks the profile: 'sqlite' (default) or 'postgresql'.
+# Connections are set up and counted in finflow/db.py.
+
+FINFLOW_DB_ENGINE = os.environ.get('FINFLOW_DB_ENGINE', 'sqlite')
+if FINFLOW_DB_ENGINE not in ('sqlite', 'postgresql'):
+    raise ImproperlyConfigured(
+        f"FINFLOW_DB_ENGINE must be 'sqlite' or 'postgresql', not {FINFLOW_DB_ENGINE!r}."
+    )
+# Seconds a connection is kept open across requests (0 closes it after each)
+FINFLOW_DB_CONN_MAX_AGE = int(os.environ.get('FINFLOW_DB_CONN_MAX_AGE', 60))
+
+if FINFLOW_DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('FINFLOW_DB_NAME', 'finflow'),
+            'USER': os.environ.get('FINFLOW_DB_USER', ''),
+            'PASSWORD': os.environ.get('FINFLOW_DB_PASSWORD', ''),
+            'HOST': os.environ.get('FINFLOW_DB_HOST', ''),
+            'PORT': os.environ.get('FINFLOW_DB_PORT', ''),
+            # Persistent connections, checked before being reused
+            'CONN_MAX_AGE': FINFLOW_DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
+    }
+    if os.environ.get('FINFLOW_DB_POOL', '0') == '1':
+        # psycopg 3 connection pool (needs psycopg[pool]) instead of persistent connections
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('FINFLOW_DB_POOL_MIN', 2)),
+            'max_size': int(os.environ.get('FINFLOW_DB_POOL_MAX', 10)),
+        }
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+else:  # sqlite
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('FINFLOW_DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': FINFLOW_DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                # Take the write lock when a transaction starts, so a writer
+                # waits out busy_timeout instead of failing with "database is
+                # locked" when a read transaction tries to upgrade
+                'transaction_mode': 'IMMEDIATE',
+            },
+        }
+    }
+
+# Applied to every new SQLite connection: WAL lets readers run alongside the
+# writer, NORMAL sync is safe under WAL, and writers queue for busy_timeout ms
+FINFLOW_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': int(os.environ.get('FINFLOW_SQLITE_BUSY_TIMEOUT', 20000)),
+    'mmap_size': int(os.environ.get('FINFLOW_SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    'temp_store': 'MEMORY',
+}
+
 
-DATABASES = {
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Dashboard and reports contexts are cached per user and invalidated on
+# writes (see finflow/cache.py). Point this at Redis/Memcached to share it
+# between worker processes.
+# 'shared' holds what every process must see the same way (the per-user data
+# versions, instrumentation stats); the database table is created by the
+# finflow migrations. It can point at the same Redis/Memcached as 'default'.
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'finflow',
+        'TIMEOUT': int(os.environ.get('FINFLOW_CACHE_TTL', 300)),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('FINFLOW_CACHE_MAX_ENTRIES', 1000)),
+            'CULL_FREQUENCY': int(os.environ.get('FINFLOW_CACHE_CULL_FREQUENCY', 3)),
+        },
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'finflow_cache',
+        'TIMEOUT': int(os.environ.get('FINFLOW_CACHE_TTL', 300)),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('FINFLOW_SHARED_CACHE_MAX_ENTRIES', 10000)),
+        },
+    },
 }
 
+FINFLOW_CACHE_ALIAS = 'default'
+FINFLOW_SHARED_CACHE_ALIAS = 'shared'
+FINFLOW_CACHE_TTL = int(os.environ.get('FINFLOW_CACHE_TTL', 300))
+
+# Transactions list (keyset pagination)
+FINFLOW_TRANSACTIONS_PAGE_SIZE = int(os.environ.get('FINFLOW_TRANSACTIONS_PAGE_SIZE', 50))
+FINFLOW_TRANSACTIONS_MAX_PAGE_SIZE = 200
+
+# Background exports: 'thread' runs jobs on an in-process thread pool,
+# 'command' leaves them to `manage.py run_export_worker`
+FINFLOW_EXPORT_WORKER = os.environ.get('FINFLOW_EXPORT_WORKER', 'thread')
+FINFLOW_EXPORT_THREADS = int(os.environ.get('FINFLOW_EXPORT_THREADS', 2))
+# Jobs whose worker has been silent this long (seconds) are queued again, up
+# to FINFLOW_EXPORT_MAX_ATTEMPTS tries; finished files are kept for reuse
+# for FINFLOW_EXPORT_RETENTION_DAYS (see `manage.py prune_exports`)
+FINFLOW_EXPORT_STALE_SECONDS = int(os.environ.get('FINFLOW_EXPORT_STALE_SECONDS', 600))
+FINFLOW_EXPORT_MAX_ATTEMPTS = int(os.environ.get('FINFLOW_EXPORT_MAX_ATTEMPTS', 3))
+FINFLOW_EXPORT_RETENTION_DAYS = int(os.environ.get('FINFLOW_EXPORT_RETENTION_DAYS', 7))
+# PDF reports keep every finished page in memory until the file is written
+# (about 20 KB a page), so they are limited to this many transactions
+FINFLOW_PDF_MAX_ROWS = int(os.environ.get('FINFLOW_PDF_MAX_ROWS', 20000))
+
+# Bulk import: rows per bulk_create batch
+FINFLOW_IMPORT_BATCH_SIZE = int(os.environ.get('FINFLOW_IMPORT_BATCH_SIZE', 1000))
+
+# JSON batch API: maximum operations accepted in one request
+FINFLOW_BATCH_MAX_OPERATIONS = int(os.environ.get('FINFLOW_BATCH_MAX_OPERATIONS', 500))
+
+# Delta sync: transactions per page, seconds of overlap between syncs and
+# days deletions are remembered (older tokens get a full resync)
+FINFLOW_SYNC_PAGE_SIZE = int(os.environ.get('FINFLOW_SYNC_PAGE_SIZE', 500))
+FINFLOW_SYNC_OVERLAP = int(os.environ.get('FINFLOW_SYNC_OVERLAP', 5))
+FINFLOW_SYNC_TOMBSTONE_DAYS = int(os.environ.get('FINFLOW_SYNC_TOMBSTONE_DAYS', 90))
+
+# Recurring transactions: rules materialized per database transaction
+FINFLOW_RECURRING_BATCH_SIZE = int(os.environ.get('FINFLOW_RECURRING_BATCH_SIZE', 1000))
+
+# Business logos: largest upload accepted, in bytes (see finflow/logos.py)
+FINFLOW_LOGO_MAX_BYTES = int(os.environ.get('FINFLOW_LOGO_MAX_BYTES', 5 * 1024 * 1024))
+
+# Instrumentation: per-view latency/SQL histograms (see finflow/instrumentation.py),
+# shown at /instrumentation/ to staff and by `manage.py dump_instrumentation`.
+# Queries repeated this many times in one request are logged.
+FINFLOW_INSTRUMENTATION = os.environ.get('FINFLOW_INSTRUMENTATION', '0') == '1'
+FINFLOW_INSTRUMENTATION_FLUSH_SECONDS = int(os.environ.get('FINFLOW_INSTRUMENTATION_FLUSH_SECONDS', 10))
+FINFLOW_DUPLICATE_QUERY_THRESHOLD = int(os.environ.get('FINFLOW_DUPLICATE_QUERY_THRESHOLD', 2))
+
+
+# Authentication
+# ProfileBackend loads the profile with the user on every request (page
+# branding); ModelBackend stays listed for sessions that were started with it.
+AUTHENTICATION_BACKENDS = [
+    'finflow.backends.ProfileBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
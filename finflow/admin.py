@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Category, Transaction
+from .models import Category, Transaction, ExportJob, RecurringTransaction, Budget
+from .budgets import refresh as refresh_budget
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -34,3 +35,26 @@ class TransactionAdmin(admin.ModelAdmin):
         }),
     )
 
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'format', 'status', 'rows_done', 'rows_total', 'created_at', 'finished_at')
+    list_filter = ('format', 'status', 'created_at')
+    search_fields = ('user__username',)
+    readonly_fields = ('fingerprint', 'created_at', 'started_at', 'finished_at', 'heartbeat_at', 'attempts')
+
+@admin.register(RecurringTransaction)
+class RecurringTransactionAdmin(admin.ModelAdmin):
+    list_display = ('description', 'transaction_type', 'amount', 'frequency', 'interval', 'next_date', 'active', 'user')
+    list_filter = ('frequency', 'transaction_type', 'active')
+    search_fields = ('description', 'user__username')
+    readonly_fields = ('created_at', 'updated_at')
+
+@admin.register(Budget)
+class BudgetAdmin(admin.ModelAdmin):
+    list_display = ('category', 'amount', 'user', 'updated_at')
+    search_fields = ('category__name', 'user__username')
+    readonly_fields = ('created_at', 'updated_at')
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        refresh_budget(obj)
@@ -0,0 +1,180 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import models
+
+from .models import Category, MonthlyRollup, Transaction
+
+
+def month_start(day):
+    """Return the first day of the month containing ``day``"""
+    return date(day.year, day.month, 1)
+
+
+def add_months(day, months):
+    """Shift a first-of-month date by a whole number of calendar months"""
+    index = day.year * 12 + (day.month - 1) + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_end(day):
+    """Return the last day of the month containing ``day``"""
+    return add_months(month_start(day), 1) - timedelta(days=1)
+
+
+def percent_change(current, previous):
+    """Month-over-month change, matching the figures shown on the reports page"""
+    if previous == 0:
+        return 100 if current > 0 else 0
+    return round(((current - previous) / previous) * 100, 2)
+
+
+def financial_summary(user, months=6, today=None):
+    """
+    Compute every headline figure used by the dashboard and reports pages.
+
+    Everything is read from the ``MonthlyRollup`` table in one grouped
+    query, so the cost scales with the number of months of history rather
+    than the number of transactions.
+    """
+    today = today or date.today()
+
+    rows = (
+        MonthlyRollup.objects.filter(user=user)
+        .order_by()
+        .values('month', 'transaction_type')
+        .annotate(total=models.Sum('amount'), n=models.Sum('count'))
+    )
+
+    total_income = total_expenses = Decimal('0')
+    income_count = expense_count = 0
+    by_month = {}
+    for row in rows:
+        bucket = by_month.setdefault(row['month'], {})
+        if row['transaction_type'] == 'income':
+            total_income += row['total']
+            income_count += row['n']
+            bucket['income'] = row['total']
+        else:
+            total_expenses += row['total']
+            expense_count += row['n']
+            bucket['expenses'] = row['total']
+
+    # Monthly series, oldest month first
+    current_month = month_start(today)
+    first_month = add_months(current_month, -(months - 1))
+
+    monthly = []
+    for i in range(months):
+        month = add_months(first_month, i)
+        row = by_month.get(month, {})
+        income = row.get('income') or Decimal('0')
+        expenses = row.get('expenses') or Decimal('0')
+        monthly.append({
+            'month_start': month,
+            'month': month.strftime('%b %Y'),
+            'income': income,
+            'expenses': expenses,
+            'net_profit': income - expenses,
+        })
+
+    this_month = monthly[-1]
+    last_month = monthly[-2] if months > 1 else {
+        'income': Decimal('0'), 'expenses': Decimal('0'), 'net_profit': Decimal('0'),
+    }
+
+    return {
+        'total_income': total_income,
+        'total_expenses': total_expenses,
+        'net_profit': total_income - total_expenses,
+        'income_count': income_count,
+        'expense_count': expense_count,
+        'monthly': monthly,
+        'this_month': this_month,
+        'last_month': last_month,
+        'income_change_percent': percent_change(this_month['income'], last_month['income']),
+        'expense_change_percent': percent_change(this_month['expenses'], last_month['expenses']),
+        'net_profit_change': percent_change(this_month['net_profit'], last_month['net_profit']),
+    }
+
+
+UNCATEGORIZED = 'Uncategorized'
+
+
+def category_breakdown(user, start=None, end=None):
+    """
+    Per-category totals, counts and shares for both category types.
+
+    Every category of the user is listed under its ``category_type``, with
+    a zero amount when it has no transactions in the range. The totals come
+    from a single ``values('category').annotate(...)`` query over the
+    monthly rollups, so the cost does not depend on how many transactions
+    the user has. Transactions left without a category (after their
+    category was deleted) are reported as an "Uncategorized" entry under
+    their transaction type, when there are any.
+
+    ``start``/``end`` limit the breakdown to a date range. Ranges made of
+    whole months are still answered from the rollups; any other range
+    groups the transactions themselves, again in one query.
+
+    Returns ``{'income': [...], 'expense': [...]}``, each list sorted by
+    amount, largest first (categories with equal amounts keep their name
+    order).
+    """
+    whole_months = (
+        (start is None or start == month_start(start))
+        and (end is None or end == month_end(end))
+    )
+    if whole_months:
+        rows = MonthlyRollup.objects.filter(user=user)
+        if start is not None:
+            rows = rows.filter(month__gte=start)
+        if end is not None:
+            rows = rows.filter(month__lte=month_start(end))
+        count = models.Sum('count')
+    else:
+        rows = Transaction.objects.filter(user=user)
+        if start is not None:
+            rows = rows.filter(date__gte=start)
+        if end is not None:
+            rows = rows.filter(date__lte=end)
+        count = models.Count('id')
+
+    rows = (
+        rows.order_by()
+        .values('transaction_type', 'category')
+        .annotate(amount=models.Sum('amount'), count=count)
+    )
+
+    breakdown = {'income': [], 'expense': []}
+    items = {}
+    for pk, name, category_type in Category.objects.filter(user=user).values_list('id', 'name', 'category_type'):
+        items[pk] = {'id': pk, 'name': name, 'amount': Decimal('0'), 'count': 0}
+        breakdown[category_type].append(items[pk])
+
+    uncategorized = {}
+    for row in rows:
+        if row['category'] is None:
+            item = uncategorized.get(row['transaction_type'])
+            if item is None:
+                item = uncategorized[row['transaction_type']] = {
+                    'id': None, 'name': UNCATEGORIZED, 'amount': Decimal('0'), 'count': 0,
+                }
+                breakdown[row['transaction_type']].append(item)
+        elif row['category'] in items:
+            # A category's total includes all of its transactions, whatever
+            # their own type
+            item = items[row['category']]
+        else:
+            # Created after the categories were read
+            continue
+        item['amount'] += row['amount'] or Decimal('0')
+        item['count'] += row['count']
+
+    for entries in breakdown.values():
+        total = sum(item['amount'] for item in entries)
+        for item in entries:
+            item['share'] = round(item['amount'] / total * 100, 2) if total > 0 else 0
+        entries.sort(key=lambda x: x['amount'], reverse=True)
+
+    return breakdown
@@ -0,0 +1,197 @@
+"""
+Forecasting and trend metrics for the reports page.
+
+A user's amounts in the analysis window are pulled as compact NumPy arrays
+with one grouped ``values_list`` query (``load_amounts``), and every metric
+is computed with vectorized operations on those arrays: daily totals with
+``bincount``, rolling means with a cumulative sum, and the per-category
+trend slopes as one least-squares fit over a categories x months matrix.
+Nothing loops over ``Transaction`` objects, so the cost is dominated by the
+query itself (see the ``benchmark_analytics`` command).
+"""
+import calendar
+from collections import namedtuple
+from datetime import date, timedelta
+from operator import itemgetter
+
+import numpy as np
+from django.db import models
+
+from .aggregation import UNCATEGORIZED, add_months, month_start
+from .models import Category, MonthlyRollup, Transaction
+
+
+# Rolling average window and run-rate window, in days
+ROLLING_DAYS = 30
+RUN_RATE_DAYS = 90
+# Complete months of history used for the per-category trend slopes
+TREND_MONTHS = 6
+
+NO_CATEGORY = -1
+EPOCH = date(1970, 1, 1)
+
+# ``days`` are datetime64[D], ``amounts`` float64 (expenses are negative),
+# ``categories`` int64 with NO_CATEGORY for uncategorized rows
+Amounts = namedtuple('Amounts', ['days', 'amounts', 'categories'])
+
+
+def to_arrays(rows):
+    """Build ``Amounts`` from ``(date, transaction_type, category_id, amount)`` rows"""
+    # Column by column straight into NumPy; no per-row Python objects are kept
+    n = len(rows)
+    ordinals = np.fromiter(map(date.toordinal, map(itemgetter(0), rows)), np.int64, n)
+    is_expense = np.fromiter(map('expense'.__eq__, map(itemgetter(1), rows)), bool, n)
+    categories = np.array(list(map(itemgetter(2), rows)), dtype=np.float64)  # None -> nan
+    amounts = np.fromiter(map(float, map(itemgetter(3), rows)), np.float64, n)
+    amounts[is_expense] *= -1
+    return Amounts(
+        (ordinals - EPOCH.toordinal()).astype('datetime64[D]'),
+        amounts,
+        np.nan_to_num(categories, nan=NO_CATEGORY).astype(np.int64),
+    )
+
+
+def load_amounts(user, start, end):
+    """
+    The user's amounts from ``start`` to ``end`` as ``Amounts``, in one query.
+
+    Every metric is a sum over days, categories and types, so the database
+    adds up each (day, type, category) first; the arrays then hold at most
+    days x categories entries however many transactions there are.
+    """
+    return to_arrays(amount_rows(user, start, end))
+
+
+def amount_rows(user, start, end):
+    """The ``(date, transaction_type, category_id, total)`` rows ``load_amounts()`` builds on"""
+    return list(
+        Transaction.objects.filter(user=user, date__gte=start, date__lte=end)
+        .order_by()
+        .values_list('date', 'transaction_type', 'category_id')
+        .annotate(total=models.Sum('amount'))
+    )
+
+
+def daily_totals(data, start, end):
+    """Income and expenses per day from ``start`` to ``end`` (two float arrays)"""
+    n_days = (end - start).days + 1
+    index = (data.days - np.datetime64(start, 'D')).astype(np.int64)
+    income = np.bincount(index, weights=np.where(data.amounts > 0, data.amounts, 0), minlength=n_days)
+    expenses = np.bincount(index, weights=np.where(data.amounts < 0, -data.amounts, 0), minlength=n_days)
+    return income[:n_days], expenses[:n_days]
+
+
+def rolling_mean(values, window):
+    """Trailing mean over ``window`` values (fewer at the start of the series)"""
+    sums = np.cumsum(values)
+    sums[window:] = sums[window:] - sums[:-window]
+    counts = np.minimum(np.arange(1, len(values) + 1), window)
+    return sums / counts
+
+
+def trend_slopes(data, first_month, months):
+    """
+    Least-squares slope of the monthly totals of every category and type,
+    over the ``months`` months starting with ``first_month``.
+
+    Returns ``(category_ids, is_expense, slopes, means)``: one entry per
+    category and transaction type present in ``data``, with the slope (per
+    month) and mean of its monthly totals. Totals are positive for both
+    types, so a positive slope always means growth.
+    """
+    month_index = (
+        data.days.astype('datetime64[M]') - np.datetime64(first_month, 'M')
+    ).astype(np.int64)
+    inside = (month_index >= 0) & (month_index < months)
+    month_index, amounts, categories = month_index[inside], data.amounts[inside], data.categories[inside]
+
+    # One row per (category, type); uncategorized income and expenses stay apart
+    keys = (categories + 1) * 2 + (amounts < 0)
+    unique_keys, rows = np.unique(keys, return_inverse=True)
+
+    totals = np.zeros((len(unique_keys), months))
+    np.add.at(totals, (rows, month_index), np.abs(amounts))
+
+    x = np.arange(months) - (months - 1) / 2
+    means = totals.mean(axis=1)
+    slopes = (totals - means[:, None]) @ x / (x @ x) if months > 1 else np.zeros(len(unique_keys))
+    return unique_keys // 2 - 1, unique_keys % 2 == 1, slopes, means
+
+
+def summarize(data, start, today, opening=0.0):
+    """
+    Compute every metric from ``data`` covering ``start`` to ``today``.
+
+    ``opening`` is the balance before ``start``. Trends carry category ids;
+    ``forecast()`` adds the names.
+    """
+    # Trends use whole months only; the current one is still incomplete
+    first_month = add_months(month_start(today), -TREND_MONTHS)
+    income, expenses = daily_totals(data, start, today)
+    net = income - expenses
+    balance = opening + float(net.sum())
+
+    run_rate = float(net[-RUN_RATE_DAYS:].mean())
+    days_in_month = calendar.monthrange(today.year, today.month)[1]
+
+    category_ids, is_expense, slopes, means = trend_slopes(data, first_month, TREND_MONTHS)
+    trends = [
+        {
+            'id': None if category_id == NO_CATEGORY else category_id,
+            'type': 'expense' if expense else 'income',
+            'monthly_average': round(mean, 2),
+            'slope': round(slope, 2),
+            'slope_percent': round(slope / mean * 100, 1) if mean else 0.0,
+        }
+        for category_id, expense, slope, mean in zip(
+            category_ids.tolist(), is_expense.tolist(), slopes.tolist(), means.tolist()
+        )
+    ]
+    trends.sort(key=lambda item: abs(item['slope']), reverse=True)
+
+    return {
+        'rolling_days': ROLLING_DAYS,
+        'rolling_income': round(float(rolling_mean(income, ROLLING_DAYS)[-1]), 2),
+        'rolling_expenses': round(float(rolling_mean(expenses, ROLLING_DAYS)[-1]), 2),
+        'run_rate_days': RUN_RATE_DAYS,
+        'daily_run_rate': round(run_rate, 2),
+        'monthly_run_rate': round(run_rate * days_in_month, 2),
+        'annual_run_rate': round(run_rate * 365, 2),
+        'balance': round(balance, 2),
+        'projected_month_end_balance': round(balance + run_rate * (days_in_month - today.day), 2),
+        'trend_months': TREND_MONTHS,
+        'trends': trends,
+    }
+
+
+def window_start(today):
+    """First day of the data ``summarize()`` needs for ``today``"""
+    # Whole months, so the balance before the window comes from the rollups
+    first_month = add_months(month_start(today), -TREND_MONTHS)
+    return month_start(min(first_month, today - timedelta(days=RUN_RATE_DAYS - 1)))
+
+
+def forecast(user, today=None):
+    """
+    Rolling averages, run-rates, the projected month-end balance and the
+    per-category trends for the reports page, in three queries.
+    """
+    today = today or date.today()
+    start = window_start(today)
+
+    before = (
+        MonthlyRollup.objects.filter(user=user, month__lt=start)
+        .order_by()
+        .values('transaction_type')
+        .annotate(total=models.Sum('amount'))
+    )
+    opening = sum(float(row['total']) * (1 if row['transaction_type'] == 'income' else -1) for row in before)
+
+    metrics = summarize(load_amounts(user, start, today), start, today, opening)
+
+    names = dict(Category.objects.filter(
+        user=user, id__in=[item['id'] for item in metrics['trends'] if item['id']]
+    ).values_list('id', 'name'))
+    for item in metrics['trends']:
+        item['name'] = names.get(item['id'], UNCATEGORIZED)
+    return metrics
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class FinflowConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'finflow'
+
+    def ready(self):
+        # Connects the connection_created receiver
+        from . import db  # noqa: F401
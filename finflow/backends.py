@@ -0,0 +1,24 @@
+"""Authentication backend that loads the signed-in user's profile along with them"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+
+UserModel = get_user_model()
+
+
+class ProfileBackend(ModelBackend):
+    """
+    ``ModelBackend`` whose ``get_user()``, run once per request by
+    ``AuthenticationMiddleware``, joins the profile into the same query.
+
+    The branding on every page (``finflow.context_processors.branding``)
+    then reads ``request.user.profile`` without a query or a cache of its
+    own, so it is never stale in any worker process.
+    """
+
+    def get_user(self, user_id):
+        try:
+            user = UserModel._default_manager.select_related('profile').get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
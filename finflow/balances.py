@@ -0,0 +1,171 @@
+"""
+Stored running balances.
+
+Every ``Transaction`` keeps ``running_balance``: the user's balance (income
+minus expenses) after it, in ``(date, id)`` order. Reading the balance at a
+date, or the running column of a page of transactions, is then an index
+lookup instead of a sum over all earlier rows.
+
+Single-row writes (the receivers in ``finflow/models.py``) shift the rows
+after the changed position with one relative ``F()`` UPDATE, so a back-dated
+edit only touches the rows after it. Bulk writes (``finflow.bulk``)
+recompute each user's rows from the earliest position they touched with a
+window sum.
+"""
+from datetime import date
+from decimal import Decimal
+
+from django.db import connections, models
+
+from .models import Transaction
+
+
+ZERO = Decimal('0')
+BALANCE_FIELD = models.DecimalField(max_digits=14, decimal_places=2)
+# Income adds to the balance, expenses take from it
+SIGNED_AMOUNT = models.Case(
+    models.When(transaction_type='expense', then=-models.F('amount')),
+    default=models.F('amount'),
+    output_field=BALANCE_FIELD,
+)
+
+
+def signed(transaction_type, amount):
+    return -amount if transaction_type == 'expense' else amount
+
+
+def _after(day, pk):
+    """Rows after position ``(day, pk)``"""
+    return models.Q(date__gt=day) | models.Q(date=day, id__gt=pk)
+
+
+def _before(user_id, day, pk):
+    """Balance just before position ``(day, pk)``"""
+    return (
+        Transaction.objects.filter(user_id=user_id)
+        .filter(models.Q(date__lt=day) | models.Q(date=day, id__lt=pk))
+        .order_by('-date', '-id')
+        .values_list('running_balance', flat=True)
+        .first()
+    ) or ZERO
+
+
+def balance_at(user, day):
+    """The user's balance at the end of ``day``"""
+    return (
+        Transaction.objects.filter(user=user, date__lte=day)
+        .order_by('-date', '-id')
+        .values_list('running_balance', flat=True)
+        .first()
+    ) or ZERO
+
+
+def _settle(instance):
+    """Set ``instance``'s own balance from the row before it"""
+    instance.running_balance = (
+        _before(instance.user_id, instance.date, instance.pk) + signed(instance.transaction_type, instance.amount)
+    )
+    Transaction.objects.filter(pk=instance.pk).update(running_balance=instance.running_balance)
+
+
+def inserted(instance):
+    """After a single transaction was created"""
+    Transaction.objects.filter(user_id=instance.user_id).filter(_after(instance.date, instance.pk)).update(
+        running_balance=models.F('running_balance') + signed(instance.transaction_type, instance.amount)
+    )
+    _settle(instance)
+
+
+def changed(instance, previous):
+    """After a single transaction was updated; ``previous`` holds its old date, type and amount"""
+    day = Transaction._meta.get_field('date').to_python(previous['date'])
+    old = signed(previous['transaction_type'], Transaction._meta.get_field('amount').to_python(previous['amount']))
+    new = signed(instance.transaction_type, instance.amount)
+    if day == instance.date and old == new:
+        return
+
+    # Rows after the old position lose the old amount and rows after the new
+    # one gain the new amount; one UPDATE covers both
+    after_old, after_new = _after(day, instance.pk), _after(instance.date, instance.pk)
+    Transaction.objects.filter(user_id=instance.user_id).filter(after_old | after_new).exclude(pk=instance.pk).update(
+        running_balance=models.F('running_balance') + models.Case(
+            models.When(after_old & after_new, then=models.Value(new - old)),
+            models.When(after_new, then=models.Value(new)),
+            default=models.Value(-old),
+            output_field=BALANCE_FIELD,
+        )
+    )
+    _settle(instance)
+
+
+def removed(instance):
+    """After a single transaction was deleted"""
+    Transaction.objects.filter(user_id=instance.user_id).filter(_after(instance.date, instance.pk)).update(
+        running_balance=models.F('running_balance') - signed(instance.transaction_type, instance.amount)
+    )
+
+
+def earliest_positions(rows, positions=None):
+    """
+    The earliest ``(date, id)`` per user among ``rows`` (instances or
+    ``bulk.snapshot()`` dicts); pass ``positions`` to keep accumulating.
+    """
+    positions = {} if positions is None else positions
+    for row in rows:
+        if not isinstance(row, dict):
+            row = {'user_id': row.user_id, 'date': row.date, 'id': row.pk}
+        position = (Transaction._meta.get_field('date').to_python(row['date']), row['id'])
+        user_id = row['user_id']
+        positions[user_id] = min(positions.get(user_id, position), position)
+    return positions
+
+
+def recompute(rows):
+    """
+    Recompute balances after a bulk write of ``rows`` (instances or
+    ``bulk.snapshot()`` dicts, both before and after an update).
+    """
+    recompute_from(earliest_positions(rows))
+
+
+def recompute_from(positions, chunk_size=1000):
+    """
+    Recompute each user's balances from their position in ``positions``.
+
+    One windowed query per user reads the new balances, and only the rows
+    whose balance changed are written back.
+    """
+    connection = connections[Transaction.objects.db]
+    table = connection.ops.quote_name(Transaction._meta.db_table)
+    for user_id, (day, pk) in positions.items():
+        opening = _before(user_id, day, pk)
+        totals = (
+            Transaction.objects.filter(user_id=user_id)
+            .filter(models.Q(date__gt=day) | models.Q(date=day, id__gte=pk))
+            .annotate(total=models.Window(
+                models.Sum(SIGNED_AMOUNT), order_by=[models.F('date').asc(), models.F('id').asc()],
+            ))
+            .order_by()
+            .values_list('id', 'total', 'running_balance')
+        )
+        updates = []
+        for row_id, total, current in totals.iterator(chunk_size=chunk_size):
+            balance = opening + total
+            if balance != current:
+                updates.append((balance, row_id))
+        with connection.cursor() as cursor:
+            for i in range(0, len(updates), chunk_size):
+                cursor.executemany(
+                    f'UPDATE {table} SET running_balance = %s WHERE id = %s', updates[i:i + chunk_size]
+                )
+
+
+def rebuild(user=None):
+    """Recompute every balance of ``user``, or of all users; returns the number of users"""
+    if user is None:
+        user_ids = Transaction.objects.order_by().values_list('user_id', flat=True).distinct()
+    else:
+        user_ids = [user.pk]
+    positions = {user_id: (date.min, 0) for user_id in user_ids}
+    recompute_from(positions)
+    return len(positions)
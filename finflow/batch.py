@@ -0,0 +1,205 @@
+"""
+Batch create/update/delete of transactions for the JSON API.
+
+A batch is a list of operations::
+
+    {"op": "create", "ref": "tmp-1", "data": {"date": ..., "description": ...,
+                                              "type": ..., "amount": ..., "category": 3}}
+    {"op": "update", "id": 42, "data": {"amount": "120.00"}}
+    {"op": "delete", "id": 43}
+
+Every operation is validated first; if any of them is invalid nothing is
+written. Otherwise the whole batch is applied in one database transaction
+with one ``bulk_create``, one ``bulk_update`` and one delete, and the
+rollups, search index and caches are kept in step through ``finflow.bulk``.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import bulk
+from .importers import MAX_AMOUNT, MAX_DESCRIPTION_LENGTH, TRANSACTION_TYPES, parse_amount, parse_date_value
+from .models import Category, Transaction
+
+
+OPERATIONS = ('create', 'update', 'delete')
+# API field name -> model field name
+FIELDS = {
+    'date': 'date',
+    'description': 'description',
+    'category': 'category_id',
+    'type': 'transaction_type',
+    'amount': 'amount',
+}
+REQUIRED_FIELDS = ('date', 'description', 'type', 'amount')
+
+
+class BatchError(Exception):
+    """The payload as a whole is unusable (not a list, too many operations)"""
+
+
+def max_operations():
+    return getattr(settings, 'FINFLOW_BATCH_MAX_OPERATIONS', 500)
+
+
+def _is_id(value):
+    return isinstance(value, int) and not isinstance(value, bool) and value > 0
+
+
+def clean_fields(data, category_ids, partial=False):
+    """
+    Validate the ``data`` of a create (or, with ``partial``, an update).
+
+    Returns ``(cleaned, errors)`` where ``cleaned`` maps model field names
+    to values for the fields present in ``data``.
+    """
+    if not isinstance(data, dict):
+        return {}, ['"data" must be an object.']
+
+    errors = []
+    unknown = sorted(set(data) - set(FIELDS))
+    if unknown:
+        errors.append(f'Unknown fields: {", ".join(unknown)}.')
+    if not partial:
+        missing = [name for name in REQUIRED_FIELDS if name not in data]
+        if missing:
+            errors.append(f'Missing fields: {", ".join(missing)}.')
+    elif not set(data) & set(FIELDS):
+        errors.append('Nothing to update.')
+
+    cleaned = {}
+    if 'date' in data:
+        cleaned['date'] = parse_date_value(data['date'])
+        if cleaned['date'] is None:
+            errors.append(f'Invalid date "{data["date"]}".')
+
+    if 'description' in data:
+        cleaned['description'] = str(data['description'] or '').strip()
+        if not cleaned['description']:
+            errors.append('Description is required.')
+        elif len(cleaned['description']) > MAX_DESCRIPTION_LENGTH:
+            errors.append(f'Description is longer than {MAX_DESCRIPTION_LENGTH} characters.')
+
+    if 'type' in data:
+        cleaned['transaction_type'] = str(data['type'] or '').strip().lower()
+        if cleaned['transaction_type'] not in TRANSACTION_TYPES:
+            errors.append(f'Type must be income or expense, got "{data["type"]}".')
+
+    if 'amount' in data:
+        # parse_amount() turns NaN and Infinity (which json.loads accepts) into None
+        cleaned['amount'] = parse_amount(data['amount'])
+        if cleaned['amount'] is None:
+            errors.append(f'Invalid amount "{data["amount"]}".')
+        elif cleaned['amount'] < 0 or cleaned['amount'] >= MAX_AMOUNT:
+            errors.append(f'Amount must be between 0 and {MAX_AMOUNT}.')
+
+    if 'category' in data:
+        cleaned['category_id'] = data['category']
+        if data['category'] is not None and not _is_id(data['category']):
+            errors.append('"category" must be a category id or null.')
+        elif data['category'] is not None and data['category'] not in category_ids:
+            errors.append(f'Category {data["category"]} not found.')
+
+    return cleaned, errors
+
+
+def apply_batch(user, operations):
+    """
+    Validate and apply a batch of operations for ``user``.
+
+    Returns ``(applied, results)``; ``results`` has one entry per operation,
+    in order, with its ``index``, ``op``, ``ref`` (echoed back for creates),
+    the transaction ``id``, ``success`` and the list of ``errors``.
+    """
+    if not isinstance(operations, list):
+        raise BatchError('"operations" must be a list.')
+    if len(operations) > max_operations():
+        raise BatchError(f'At most {max_operations()} operations are allowed per batch.')
+
+    # Everything the validation needs is loaded up front in two queries
+    target_ids = {
+        op.get('id') for op in operations
+        if isinstance(op, dict) and op.get('op') in ('update', 'delete') and _is_id(op.get('id'))
+    }
+    targets = Transaction.objects.filter(user=user).in_bulk(target_ids) if target_ids else {}
+    requested_categories = {
+        op['data']['category'] for op in operations
+        if isinstance(op, dict) and isinstance(op.get('data'), dict) and _is_id(op['data'].get('category'))
+    }
+    category_ids = set(
+        Category.objects.filter(user=user, id__in=requested_categories).values_list('id', flat=True)
+    ) if requested_categories else set()
+
+    results = []
+    creates, updates, deletes = [], [], []
+    seen_ids = set()
+    for index, op in enumerate(operations):
+        result = {'index': index, 'op': None, 'ref': None, 'id': None, 'success': False, 'errors': []}
+        results.append(result)
+        if not isinstance(op, dict):
+            result['errors'].append('Operation must be an object.')
+            continue
+
+        kind = result['op'] = op.get('op')
+        result['ref'] = op.get('ref')
+        if kind not in OPERATIONS:
+            result['errors'].append(f'"op" must be one of {", ".join(OPERATIONS)}.')
+            continue
+
+        if kind == 'create':
+            cleaned, errors = clean_fields(op.get('data'), category_ids)
+            result['errors'].extend(errors)
+            if not errors:
+                creates.append((result, Transaction(user=user, **cleaned)))
+            continue
+
+        pk = op.get('id')
+        if not _is_id(pk) or pk not in targets:
+            result['errors'].append(f'Transaction {pk} not found.')
+            continue
+        result['id'] = pk
+        if pk in seen_ids:
+            result['errors'].append(f'Transaction {pk} appears more than once in the batch.')
+            continue
+        seen_ids.add(pk)
+
+        if kind == 'update':
+            cleaned, errors = clean_fields(op.get('data'), category_ids, partial=True)
+            result['errors'].extend(errors)
+            if not errors:
+                updates.append((result, targets[pk], cleaned))
+        else:
+            deletes.append((result, targets[pk]))
+
+    if any(result['errors'] for result in results):
+        return False, results
+
+    with transaction.atomic():
+        if creates:
+            created = Transaction.objects.bulk_create([t for _, t in creates])
+            bulk.transactions_created(created)
+            for (result, _), t in zip(creates, created):
+                result['id'] = t.pk
+
+        if updates:
+            changed = [t for _, t, _ in updates]
+            previous = bulk.snapshot(changed)
+            # bulk_update() doesn't run auto_now, so the timestamp is set here
+            now = timezone.now()
+            fields = {'updated_at'}
+            for _, t, cleaned in updates:
+                for field, value in cleaned.items():
+                    setattr(t, field, value)
+                t.updated_at = now
+                fields.update(cleaned)
+            Transaction.objects.bulk_update(changed, sorted(fields))
+            bulk.transactions_updated(previous, changed)
+
+        if deletes:
+            previous = bulk.snapshot([t for _, t in deletes])
+            Transaction.objects.filter(user=user, pk__in=[row['id'] for row in previous]).bulk_delete()
+            bulk.transactions_deleted(previous)
+
+    for result in results:
+        result['success'] = True
+    return True, results
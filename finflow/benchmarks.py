@@ -0,0 +1,107 @@
+"""
+View benchmarks at several data sizes.
+
+``run()`` generates one synthetic user per size (``finflow.synthetic``) and
+requests each page in ``VIEWS`` as that user through the test client,
+recording the status, the number of SQL queries and the wall time. Cached
+contexts are invalidated before every request, so the numbers are for a cold
+page. The result is plain JSON-friendly data that runs can be compared with.
+
+A page whose query count grows with the number of rows has an N+1 somewhere;
+``query_growth()`` lists them, and the test suite and the
+``benchmark_views`` command fail on any.
+"""
+import platform
+import statistics
+import time
+
+import django
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .cache import bump_data_version
+from .synthetic import generate
+
+
+VIEWS = (
+    'finflow:dashboard',
+    'finflow:reports',
+    'finflow:transactions',
+    'finflow:categories',
+    'finflow:export_report_csv',
+    'finflow:export_report_excel',
+    'finflow:export_report_pdf',
+)
+
+
+def measure(client, user, url):
+    """One cold request to ``url``: ``(status, queries, milliseconds)``"""
+    bump_data_version(user.pk)
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        response = client.get(url)
+        # Streamed exports only do their work while being read
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        elapsed = time.perf_counter() - started
+    return response.status_code, len(queries), elapsed * 1000
+
+
+def run(sizes, repeat=3, categories=12, years=3, seed=0, views=VIEWS):
+    """
+    Benchmark ``views`` for a user with each of ``sizes`` transactions.
+
+    Returns ``{'meta': {...}, 'results': {view: [{'rows', 'status',
+    'queries', 'best_ms', 'median_ms'}, ...]}}`` with one entry per size,
+    smallest first. The query count is the highest seen over ``repeat``
+    requests.
+    """
+    sizes = sorted(sizes)
+    results = {view: [] for view in views}
+    for size in sizes:
+        user, = generate(
+            categories=categories, transactions=size, years=years, seed=seed,
+            prefix=f'benchmark-{size}-{timezone.now():%Y%m%d%H%M%S%f}-',
+        )
+        client = Client()
+        client.force_login(user)
+        for view in views:
+            runs = [measure(client, user, reverse(view)) for _ in range(repeat)]
+            timings = [ms for _, _, ms in runs]
+            results[view].append({
+                'rows': size,
+                'status': runs[-1][0],
+                'queries': max(count for _, count, _ in runs),
+                'best_ms': round(min(timings), 2),
+                'median_ms': round(statistics.median(timings), 2),
+            })
+
+    return {
+        'meta': {
+            'created': timezone.now().isoformat(),
+            'sizes': sizes,
+            'repeat': repeat,
+            'categories': categories,
+            'years': years,
+            'database': connection.vendor,
+            'django': django.get_version(),
+            'python': platform.python_version(),
+        },
+        'results': results,
+    }
+
+
+def query_growth(report):
+    """Views whose query count at the largest size exceeds the one at the smallest"""
+    growing = []
+    for view, entries in report['results'].items():
+        if len(entries) > 1 and entries[-1]['queries'] > entries[0]['queries']:
+            growing.append({
+                'view': view,
+                'queries': {entry['rows']: entry['queries'] for entry in entries},
+            })
+    return growing
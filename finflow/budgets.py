@@ -0,0 +1,139 @@
+"""
+Category budgets.
+
+A ``Budget`` is a monthly spending limit on an expense category. Spending
+is read from the monthly rollups, so ``utilization()`` answers for every
+budgeted category of a month with one grouped query however many
+transactions there are. Whether a budget is exceeded is decided on write:
+``MonthlyRollupManager.apply()`` passes the buckets it changed to
+``evaluate()``, which adds or removes the month's ``BudgetAlert``. Pages only
+read those flags.
+"""
+from datetime import date
+from decimal import Decimal
+
+from django.db import models
+
+from .aggregation import month_start
+from .models import Budget, BudgetAlert, MonthlyRollup
+
+
+def _spent(pairs):
+    """``{(category_id, month): expenses}`` for ``(category_id, month)`` pairs, from the rollups"""
+    rows = (
+        MonthlyRollup.objects.filter(
+            category_id__in={category_id for category_id, _ in pairs},
+            month__in={month for _, month in pairs},
+            transaction_type='expense',
+        )
+        .order_by()
+        .values_list('category_id', 'month')
+        .annotate(total=models.Sum('amount'))
+    )
+    return {(category_id, month): total for category_id, month, total in rows}
+
+
+def check(pairs):
+    """
+    Bring the alerts of ``(category_id, month)`` pairs in line with the rollups.
+
+    Pairs of categories without a budget are ignored. Costs one query when
+    none of the categories has a budget, and four at most otherwise.
+    """
+    budgets = {
+        budget.category_id: budget
+        for budget in Budget.objects.filter(category_id__in={c for c, _ in pairs}).order_by()
+    }
+    pairs = {(category_id, month) for category_id, month in pairs if category_id in budgets}
+    if not pairs:
+        return
+
+    spent = _spent(pairs)
+    alerts = {
+        (alert.budget.category_id, alert.month): alert
+        for alert in BudgetAlert.objects.filter(
+            budget__in=[budgets[c] for c, _ in pairs], month__in={m for _, m in pairs}
+        ).select_related('budget')
+    }
+
+    new, changed, resolved = [], [], []
+    for category_id, month in pairs:
+        total = spent.get((category_id, month), Decimal('0'))
+        alert = alerts.get((category_id, month))
+        if total > budgets[category_id].amount:
+            if alert is None:
+                new.append(BudgetAlert(budget=budgets[category_id], month=month, spent=total))
+            elif alert.spent != total:
+                alert.spent = total
+                changed.append(alert)
+        elif alert is not None:
+            resolved.append(alert.pk)
+
+    if new:
+        BudgetAlert.objects.bulk_create(new)
+    if changed:
+        BudgetAlert.objects.bulk_update(changed, ['spent'])
+    if resolved:
+        BudgetAlert.objects.filter(pk__in=resolved).delete()
+
+
+def evaluate(deltas):
+    """Re-check the budgets touched by ``MonthlyRollupManager.collect()`` deltas"""
+    pairs = {
+        (category_id, month)
+        for (_, month, transaction_type, category_id) in deltas
+        if transaction_type == 'expense' and category_id is not None
+    }
+    if pairs:
+        check(pairs)
+
+
+def refresh(budget):
+    """Re-check every month of ``budget``'s category, after its amount changed"""
+    months = (
+        MonthlyRollup.objects.filter(category_id=budget.category_id, transaction_type='expense')
+        .order_by()
+        .values_list('month', flat=True)
+        .distinct()
+    )
+    check({(budget.category_id, month) for month in months})
+
+
+def utilization(user, month=None):
+    """
+    Spent vs budget of every budgeted category of ``user`` in ``month``.
+
+    Returns a list of dicts with the category ``id`` and ``name``, the
+    ``budget``, ``spent``, ``remaining``, ``percent`` used and the stored
+    ``over_budget`` flag, most used first. One query.
+    """
+    month = month_start(month or date.today())
+    budgets = (
+        Budget.objects.filter(user=user)
+        .select_related('category')
+        .annotate(
+            spent=models.Sum(
+                'category__monthly_rollups__amount',
+                filter=models.Q(
+                    category__monthly_rollups__month=month,
+                    category__monthly_rollups__transaction_type='expense',
+                ),
+            ),
+            over_budget=models.Exists(BudgetAlert.objects.filter(budget=models.OuterRef('pk'), month=month)),
+        )
+    )
+
+    result = []
+    for budget in budgets:
+        spent = budget.spent or Decimal('0')
+        result.append({
+            'id': budget.category_id,
+            'name': budget.category.name,
+            'budget': budget.amount,
+            'spent': spent,
+            'remaining': budget.amount - spent,
+            'percent': round(float(spent / budget.amount * 100), 1) if budget.amount else (100.0 if spent else 0.0),
+            'over_budget': budget.over_budget,
+        })
+    result.sort(key=lambda item: item['percent'], reverse=True)
+    return result
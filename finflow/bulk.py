@@ -0,0 +1,73 @@
+"""
+Bookkeeping for bulk transaction writes.
+
+``bulk_create``/``bulk_update``/``Transaction.objects.bulk_delete()`` skip
+the per-row receivers, so every code path that writes transactions in bulk
+calls these helpers to keep the monthly rollups, the running balances, the
+search index, the sync tombstones and the cached contexts in step, the same
+way the receivers in ``finflow/models.py`` do for single rows. Call them
+inside the same ``transaction.atomic()`` block as the write.
+"""
+from django.db import transaction
+
+from . import balances, search
+from .cache import bump_data_version
+from .models import MonthlyRollup, SyncTombstone
+
+
+SNAPSHOT_FIELDS = ('id', 'user_id', 'date', 'transaction_type', 'category_id', 'amount')
+
+
+def snapshot(transactions):
+    """Capture the bookkeeping-relevant fields of ``transactions`` before changing them"""
+    return [{field: getattr(t, field) for field in SNAPSHOT_FIELDS} for t in transactions]
+
+
+def _invalidate(user_ids):
+    for user_id in set(user_ids):
+        transaction.on_commit(lambda user_id=user_id: bump_data_version(user_id))
+
+
+def transactions_created(transactions, rollup_deltas=None, balance_positions=None):
+    """
+    After ``bulk_create`` of ``transactions`` (which must have primary keys).
+
+    Long imports can pass a ``rollup_deltas`` dict to accumulate the rollup
+    changes across batches and apply them once at the end with
+    ``MonthlyRollup.objects.apply(rollup_deltas)``, and likewise a
+    ``balance_positions`` dict for ``balances.recompute_from()``.
+    """
+    if not transactions:
+        return
+    if rollup_deltas is None:
+        MonthlyRollup.objects.add_transactions(transactions)
+    else:
+        MonthlyRollup.objects.collect(transactions, deltas=rollup_deltas)
+    if balance_positions is None:
+        balances.recompute(transactions)
+    else:
+        balances.earliest_positions(transactions, positions=balance_positions)
+    search.index_transactions(transactions, replace=False)
+    _invalidate(t.user_id for t in transactions)
+
+
+def transactions_updated(previous, transactions):
+    """After ``bulk_update``; ``previous`` is the ``snapshot()`` taken before it"""
+    if not transactions:
+        return
+    MonthlyRollup.objects.add_transactions(previous, sign=-1)
+    MonthlyRollup.objects.add_transactions(transactions)
+    balances.recompute(previous + list(transactions))
+    search.index_transactions(transactions)
+    _invalidate(t.user_id for t in transactions)
+
+
+def transactions_deleted(previous):
+    """After a bulk delete; ``previous`` is the ``snapshot()`` of the deleted rows"""
+    if not previous:
+        return
+    MonthlyRollup.objects.add_transactions(previous, sign=-1)
+    balances.recompute(previous)
+    search.remove_transactions(row['id'] for row in previous)
+    SyncTombstone.objects.record('transaction', previous)
+    _invalidate(row['user_id'] for row in previous)
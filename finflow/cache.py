@@ -0,0 +1,96 @@
+"""
+Per-user versioned caching for the dashboard and reports contexts.
+
+Every user has a data version stored in the shared cache. Cached contexts
+are keyed by that version, and any Transaction/Category write bumps it (see
+the receivers in ``finflow/models.py`` and ``finflow.bulk``), so stale
+entries are never read again and simply age out under the cache's
+TTL/eviction policy. The contexts themselves may stay in a per-process
+cache: a write in any process (another web worker, the export worker, a
+management command) changes the version every process reads.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+VERSION_KEY = 'finflow:version:{user_id}'
+CONTEXT_KEY = 'finflow:{name}:{user_id}:{version}:{extra}'
+STATS_KEYS = {'hits': 'finflow:stats:hits', 'misses': 'finflow:stats:misses'}
+
+
+def get_cache():
+    return caches[getattr(settings, 'FINFLOW_CACHE_ALIAS', 'default')]
+
+
+def get_shared_cache():
+    """The cache every worker process (and management command) reads and writes alike"""
+    return caches[getattr(settings, 'FINFLOW_SHARED_CACHE_ALIAS', 'shared')]
+
+
+def _initial_version():
+    # Time based, so a version lost to eviction never restarts at a value
+    # that older cached contexts were stored under.
+    return int(time.time() * 1000)
+
+
+def data_version(user_id):
+    """Return the current data version for ``user_id``"""
+    cache = get_shared_cache()
+    key = VERSION_KEY.format(user_id=user_id)
+    version = cache.get(key)
+    if version is None:
+        version = _initial_version()
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key)
+    return version
+
+
+def bump_data_version(user_id):
+    """Invalidate every cached context of ``user_id``, in every process"""
+    cache = get_shared_cache()
+    key = VERSION_KEY.format(user_id=user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _initial_version(), timeout=None)
+
+
+def _count(outcome):
+    cache = get_cache()
+    key = STATS_KEYS[outcome]
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=None)
+
+
+def cached_context(user_id, name, builder, extra=''):
+    """
+    Return the context ``name`` for ``user_id``, building it on a miss.
+
+    ``extra`` is folded into the key for inputs other than the user's data,
+    such as the current date for month-relative figures.
+    """
+    cache = get_cache()
+    key = CONTEXT_KEY.format(name=name, user_id=user_id, version=data_version(user_id), extra=extra)
+    context = cache.get(key)
+    if context is not None:
+        _count('hits')
+        return context
+
+    _count('misses')
+    context = builder()
+    cache.set(key, context, timeout=getattr(settings, 'FINFLOW_CACHE_TTL', 300))
+    return context
+
+
+def cache_stats():
+    """Hit/miss counters across all cached contexts"""
+    values = get_cache().get_many(STATS_KEYS.values())
+    stats = {name: values.get(key, 0) for name, key in STATS_KEYS.items()}
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = round(stats['hits'] / lookups * 100, 2) if lookups else 0
+    return stats
@@ -0,0 +1,91 @@
+"""
+Chart datasets served as JSON to the dashboard and reports pages.
+
+Each dataset is built from the rollups for a user and a date range. The
+responses are validated with an ETag and Last-Modified derived from the last
+change to the user's data (see ``last_modified``), so the browser revalidates
+its cached copy with a cheap conditional request instead of downloading it
+again.
+"""
+import hashlib
+from datetime import date, datetime, time
+
+from django.contrib.auth.models import User
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from .aggregation import add_months, category_breakdown, month_end, month_start
+from .models import Category, SyncTombstone, Transaction
+from .periods import period_totals
+
+
+DEFAULT_MONTHS = 6
+TOP_INCOME_SOURCES = 5
+
+
+def periods_chart(user, start=None, end=None, granularity='month'):
+    """Income, expenses and net profit per period (the last six months by default)"""
+    # Whole months by default, so the rollups can answer
+    end = end or month_end(date.today())
+    start = start or add_months(month_start(end), -(DEFAULT_MONTHS - 1))
+    periods = period_totals(user, start, end, granularity)
+    return {
+        'labels': [item['label'] for item in periods],
+        'income': [float(item['income']) for item in periods],
+        'expenses': [float(item['expenses']) for item in periods],
+        'net_profit': [float(item['net_profit']) for item in periods],
+    }
+
+
+def expense_categories_chart(user, start=None, end=None, granularity=None):
+    """Expense totals and shares per category"""
+    items = category_breakdown(user, start, end)['expense']
+    return {
+        'labels': [item['name'] for item in items],
+        'amounts': [float(item['amount']) for item in items],
+        'shares': [float(item['share']) for item in items],
+    }
+
+
+def top_income_chart(user, start=None, end=None, granularity=None):
+    """The largest income categories"""
+    items = category_breakdown(user, start, end)['income'][:TOP_INCOME_SOURCES]
+    return {
+        'labels': [item['name'] for item in items],
+        'amounts': [float(item['amount']) for item in items],
+    }
+
+
+CHARTS = {
+    'periods': periods_chart,
+    'expense-categories': expense_categories_chart,
+    'top-income': top_income_chart,
+}
+
+
+def _latest(queryset, field):
+    return Subquery(queryset.filter(user=OuterRef('pk')).order_by(f'-{field}').values(field)[:1])
+
+
+def last_modified(user):
+    """
+    When the user's chart data last changed, in one query.
+
+    That is the latest ``updated_at`` of their transactions and categories,
+    or the latest deletion. The start of today counts as a change too, since
+    the default ranges are relative to today.
+    """
+    stamps = User.objects.filter(pk=user.pk).annotate(
+        transaction_changed=_latest(Transaction.objects, 'updated_at'),
+        category_changed=_latest(Category.objects, 'updated_at'),
+        deleted=_latest(SyncTombstone.objects, 'deleted_at'),
+    ).values_list('transaction_changed', 'category_changed', 'deleted').first() or ()
+
+    today = timezone.make_aware(datetime.combine(timezone.localdate(), time.min))
+    return max([today, *(stamp for stamp in stamps if stamp is not None)])
+
+
+def etag(user, name, start, end, granularity, modified):
+    """Validator for one dataset of one user over one range"""
+    raw = f'{user.pk}|{name}|{start}|{end}|{granularity}|{modified.isoformat()}'
+    return hashlib.md5(raw.encode()).hexdigest()
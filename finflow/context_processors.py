@@ -0,0 +1,29 @@
+"""Template context shared by every page"""
+from django.utils.functional import SimpleLazyObject
+
+from .logos import thumbnail_urls
+from .models import Profile
+
+
+def _load_branding(user):
+    try:
+        profile = user.profile
+    except Profile.DoesNotExist:
+        return {'business_name': '', 'logo_url': '', 'logo_webp_url': ''}
+    webp_url, png_url = thumbnail_urls(profile)
+    return {'business_name': profile.business_name, 'logo_url': png_url, 'logo_webp_url': webp_url}
+
+
+def branding(request):
+    """
+    ``branding.business_name`` and the logo thumbnail (``branding.logo_url``,
+    PNG, and ``branding.logo_webp_url``) of the signed-in user.
+
+    Built from the profile that ``finflow.backends.ProfileBackend`` loaded
+    with ``request.user``, so it costs no query, and only when a template
+    actually uses it.
+    """
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return {}
+    return {'branding': SimpleLazyObject(lambda: _load_branding(user))}
@@ -0,0 +1,62 @@
+"""
+Database connection setup and statistics.
+
+Every new connection goes through ``configure_connection`` (Django's
+``connection_created`` signal): SQLite connections get the
+``FINFLOW_SQLITE_PRAGMAS`` (WAL journal, ``synchronous=NORMAL``, a busy
+timeout, memory-mapped reads), which let several workers write without
+"database is locked" errors. The number of connections opened per alias is
+counted, so ``connection_stats()`` shows whether ``CONN_MAX_AGE`` reuse or
+pooling is doing its job.
+"""
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+_lock = threading.Lock()
+_opened = Counter()
+
+
+def sqlite_pragmas():
+    return getattr(settings, 'FINFLOW_SQLITE_PRAGMAS', {})
+
+
+@receiver(connection_created)
+def configure_connection(sender, connection, **kwargs):
+    with _lock:
+        _opened[connection.alias] += 1
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            for name, value in sqlite_pragmas().items():
+                cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def connection_stats():
+    """
+    Per database alias: vendor, connections opened by this process,
+    persistence settings and, for SQLite, the PRAGMA values in effect.
+    """
+    stats = {}
+    for alias in connections:
+        connection = connections[alias]
+        entry = {
+            'vendor': connection.vendor,
+            'opened': _opened[alias],
+            'conn_max_age': connection.settings_dict.get('CONN_MAX_AGE'),
+            'health_checks': connection.settings_dict.get('CONN_HEALTH_CHECKS'),
+            'pool': bool(connection.settings_dict.get('OPTIONS', {}).get('pool')),
+        }
+        if connection.vendor == 'sqlite':
+            entry['pragmas'] = {}
+            with connection.cursor() as cursor:
+                for name in sqlite_pragmas():
+                    # Some PRAGMAs (mmap_size on an in-memory database) return no row
+                    row = cursor.execute(f'PRAGMA {name}').fetchone()
+                    entry['pragmas'][name] = row[0] if row else None
+        stats[alias] = entry
+    return stats
@@ -0,0 +1,130 @@
+import csv
+import tempfile
+from datetime import datetime
+
+from openpyxl import Workbook
+
+from .aggregation import financial_summary
+from .models import Transaction
+
+
+EXPORT_CHUNK_SIZE = 2000
+STREAM_BATCH_LINES = 500
+# Exports smaller than this stay in memory; larger ones spill to a temp file
+SPOOL_MAX_SIZE = 5 * 1024 * 1024
+EXPORT_COLUMNS = ['Date', 'Description', 'Category', 'Type', 'Amount']
+
+
+def export_queryset(user, start=None, end=None, category_id=None):
+    """Transactions of ``user`` in the optional date range / category"""
+    transactions = Transaction.objects.filter(user=user)
+    if start:
+        transactions = transactions.filter(date__gte=start)
+    if end:
+        transactions = transactions.filter(date__lte=end)
+    if category_id:
+        transactions = transactions.filter(category_id=category_id)
+    return transactions
+
+
+def export_rows(user, chunk_size=EXPORT_CHUNK_SIZE, progress=None, **filters):
+    """
+    Yield ``(date, description, category, type, amount)`` for every transaction.
+
+    Rows are read as plain tuples with the category name joined in, in
+    server-side chunks, so memory use does not grow with the row count and
+    there is no per-row category lookup. ``filters`` are passed on to
+    ``export_queryset``; ``progress``, if given, is called with the number
+    of rows produced so far after every chunk.
+    """
+    rows = (
+        export_queryset(user, **filters)
+        .order_by('-date', '-created_at')
+        .values_list('date', 'description', 'category__name', 'transaction_type', 'amount')
+    )
+    done = 0
+    for day, description, category, transaction_type, amount in rows.iterator(chunk_size=chunk_size):
+        yield day, description, category or '', transaction_type.title(), amount
+        done += 1
+        if progress and done % chunk_size == 0:
+            progress(done)
+    if progress:
+        progress(done)
+
+
+class Echo:
+    """File-like object whose write() just hands the line back to csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def csv_report_lines(user, progress=None):
+    """Generate the CSV report line by line for a StreamingHttpResponse"""
+    writer = csv.writer(Echo())
+    summary = financial_summary(user)
+
+    # Header
+    yield writer.writerow(['FinFlow - Financial Report'])
+    yield writer.writerow([f'Generated: {datetime.now().strftime("%Y-%m-%d %H:%M")}'])
+    yield writer.writerow([])
+
+    # P&L Summary
+    yield writer.writerow(['Profit & Loss Statement'])
+    yield writer.writerow(['Total Income', f'Ksh {summary["total_income"]}'])
+    yield writer.writerow(['Total Expenses', f'Ksh {summary["total_expenses"]}'])
+    yield writer.writerow(['Net Profit', f'Ksh {summary["net_profit"]}'])
+    yield writer.writerow([])
+
+    # All Transactions
+    yield writer.writerow(['All Transactions'])
+    yield writer.writerow(EXPORT_COLUMNS)
+
+    # Lines are sent in batches to keep the number of socket writes down
+    batch = []
+    for day, description, category, transaction_type, amount in export_rows(user, progress=progress):
+        batch.append(writer.writerow([day, description, category, transaction_type, f'Ksh {amount}']))
+        if len(batch) >= STREAM_BATCH_LINES:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+def summary_rows(summary):
+    """The P&L summary block shared by the CSV, Excel and PDF exports"""
+    return [
+        ['Profit & Loss Statement'],
+        ['Total Income', summary['total_income']],
+        ['Total Expenses', summary['total_expenses']],
+        ['Net Profit', summary['net_profit']],
+    ]
+
+
+def excel_report_file(user, progress=None):
+    """
+    Build the Excel report and return it as a file object positioned at 0.
+
+    The workbook is write-only, so openpyxl serialises each row as it is
+    appended instead of keeping a cell tree in memory, and the result is
+    written to a spooled temp file that only hits disk for big exports.
+    """
+    wb = Workbook(write_only=True)
+    summary = financial_summary(user)
+
+    ws = wb.create_sheet("P&L Summary")
+    ws.append(['FinFlow - Financial Report'])
+    ws.append([f'Generated: {datetime.now().strftime("%Y-%m-%d %H:%M")}'])
+    ws.append([])
+    for row in summary_rows(summary):
+        ws.append(row)
+
+    ws = wb.create_sheet("FinFlow Report")
+    ws.append(EXPORT_COLUMNS)
+    for row in export_rows(user, progress=progress):
+        ws.append(row)
+
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    wb.save(output)
+    output.seek(0)
+    return output
@@ -0,0 +1,255 @@
+"""
+Bulk import of transactions from CSV or XLSX files.
+
+Files are read as a stream of rows, categories are resolved from an
+in-memory map (and created on first sight), and valid rows are inserted
+with ``bulk_create`` in batches inside a single database transaction.
+Invalid rows are skipped and reported back with their row numbers.
+
+The expected columns are Date, Description, Category, Type and Amount, in
+any order; the CSV and Excel files produced by the exports are accepted as
+they are.
+"""
+import csv
+import io
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.dateparse import parse_date
+from openpyxl import load_workbook
+from openpyxl.utils.exceptions import InvalidFileException
+
+from . import balances, bulk
+from .models import Category, MonthlyRollup, Transaction
+
+
+COLUMNS = ('date', 'description', 'category', 'type', 'amount')
+REQUIRED_COLUMNS = ('date', 'description', 'type', 'amount')
+TRANSACTION_TYPES = dict(Transaction.TRANSACTION_TYPES)
+MAX_DESCRIPTION_LENGTH = Transaction._meta.get_field('description').max_length
+MAX_AMOUNT = Decimal(10) ** (
+    Transaction._meta.get_field('amount').max_digits - Transaction._meta.get_field('amount').decimal_places
+)
+# Only the first errors are kept so a completely wrong file can't blow up memory
+MAX_REPORTED_ERRORS = 200
+# Rows scanned for the header line (the exports have a summary block first)
+HEADER_SEARCH_ROWS = 20
+
+
+class ImportFileError(Exception):
+    """The file as a whole can't be imported (unknown format, unreadable, no header row)"""
+
+
+# -----------------------------
+# READERS
+# -----------------------------
+
+def _csv_rows(fileobj):
+    text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+    try:
+        yield from csv.reader(text)
+    except UnicodeDecodeError as e:
+        raise ImportFileError('The CSV file is not UTF-8 encoded; save it as "CSV UTF-8" and try again.') from e
+    except csv.Error as e:
+        raise ImportFileError(f'The CSV file is malformed: {e}.') from e
+    finally:
+        text.detach()
+
+
+def _xlsx_rows(fileobj):
+    try:
+        wb = load_workbook(fileobj, read_only=True, data_only=True)
+        try:
+            # The exports put the transactions on the last sheet
+            for row in wb.worksheets[-1].iter_rows(values_only=True):
+                yield list(row)
+        finally:
+            wb.close()
+    # openpyxl lets the zip and XML errors of a damaged workbook through
+    except (zipfile.BadZipFile, InvalidFileException, KeyError, ValueError, OSError) as e:
+        raise ImportFileError('The Excel file is damaged or not an .xlsx workbook.') from e
+
+
+def read_rows(fileobj, filename):
+    """
+    Yield ``(row_number, {column: value})`` for every data row of the file.
+
+    The header row is located by name, so preamble lines before it (like
+    the summary block of the exports) are skipped. A file that can't be
+    decoded or parsed raises ``ImportFileError``.
+    """
+    name = filename.lower()
+    if name.endswith('.csv'):
+        rows = _csv_rows(fileobj)
+    elif name.endswith('.xlsx'):
+        rows = _xlsx_rows(fileobj)
+    else:
+        raise ImportFileError('Unsupported file type; upload a .csv or .xlsx file.')
+
+    positions = None
+    for number, row in enumerate(rows, start=1):
+        if positions is None:
+            header = [str(cell or '').strip().lower() for cell in row]
+            if all(column in header for column in REQUIRED_COLUMNS):
+                positions = {column: header.index(column) for column in COLUMNS if column in header}
+            elif number >= HEADER_SEARCH_ROWS:
+                break
+            continue
+
+        if not any(cell not in (None, '') for cell in row):
+            continue
+        yield number, {
+            column: row[index] if index < len(row) else None
+            for column, index in positions.items()
+        }
+
+    if positions is None:
+        raise ImportFileError(f'No header row with the columns {", ".join(c.title() for c in REQUIRED_COLUMNS)} found.')
+
+
+# -----------------------------
+# VALIDATION
+# -----------------------------
+
+def parse_date_value(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    value = str(value or '').strip()
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        for fmt in ('%d/%m/%Y', '%d-%m-%Y'):
+            try:
+                return datetime.strptime(value, fmt).date()
+            except ValueError:
+                pass
+    return parsed
+
+
+def parse_amount(value):
+    """The amount as a 2-place ``Decimal``, or ``None`` if it isn't a finite number"""
+    if isinstance(value, (int, float, Decimal)):
+        value = str(value)
+    value = str(value or '').replace('Ksh', '').replace(',', '').strip()
+    try:
+        amount = Decimal(value)
+        # NaN and Infinity parse, but can't be compared or stored
+        if not amount.is_finite():
+            return None
+        return amount.quantize(Decimal('0.01'))
+    except InvalidOperation:
+        return None
+
+
+def clean_row(values):
+    """Validate one row; returns ``(cleaned, errors)``"""
+    errors = []
+
+    day = parse_date_value(values.get('date'))
+    if day is None:
+        errors.append(f'Invalid date "{values.get("date")}".')
+
+    description = str(values.get('description') or '').strip()
+    if not description:
+        errors.append('Description is required.')
+    elif len(description) > MAX_DESCRIPTION_LENGTH:
+        errors.append(f'Description is longer than {MAX_DESCRIPTION_LENGTH} characters.')
+
+    transaction_type = str(values.get('type') or '').strip().lower()
+    if transaction_type not in TRANSACTION_TYPES:
+        errors.append(f'Type must be Income or Expense, got "{values.get("type")}".')
+
+    amount = parse_amount(values.get('amount'))
+    if amount is None:
+        errors.append(f'Invalid amount "{values.get("amount")}".')
+    elif amount < 0 or amount >= MAX_AMOUNT:
+        errors.append(f'Amount must be between 0 and {MAX_AMOUNT}.')
+
+    cleaned = {
+        'date': day,
+        'description': description,
+        'category': str(values.get('category') or '').strip()[:100],
+        'transaction_type': transaction_type,
+        'amount': amount,
+    }
+    return cleaned, errors
+
+
+# -----------------------------
+# IMPORT
+# -----------------------------
+
+def import_transactions(user, fileobj, filename, batch_size=None, dry_run=False):
+    """
+    Import the transactions in ``fileobj`` for ``user``.
+
+    Returns a dict with the number of ``rows`` read, transactions
+    ``created``, ``categories_created`` and the per-row ``errors``
+    (``[{'row': n, 'errors': [...]}, ...]``). With ``dry_run`` the file is
+    only validated and nothing is written.
+    """
+    batch_size = batch_size or getattr(settings, 'FINFLOW_IMPORT_BATCH_SIZE', 1000)
+    result = {'rows': 0, 'created': 0, 'categories_created': 0, 'errors': [], 'error_count': 0}
+
+    categories = {
+        (name.lower(), category_type): pk
+        for pk, name, category_type in Category.objects.filter(user=user).values_list('id', 'name', 'category_type')
+    }
+
+    def category_id(name, category_type):
+        if not name:
+            return None
+        key = (name.lower(), category_type)
+        if key not in categories:
+            if dry_run:
+                return None
+            categories[key] = Category.objects.create(user=user, name=name, category_type=category_type).pk
+            result['categories_created'] += 1
+        return categories[key]
+
+    def flush(batch):
+        if batch and not dry_run:
+            created = Transaction.objects.bulk_create(batch)
+            bulk.transactions_created(created, rollup_deltas=rollup_deltas, balance_positions=balance_positions)
+            result['created'] += len(created)
+        elif batch:
+            result['created'] += len(batch)
+
+    # Rollup changes are summed over the whole file and written once, and
+    # running balances are recomputed once from the earliest imported row
+    rollup_deltas, balance_positions = {}, {}
+
+    with transaction.atomic():
+        batch = []
+        for number, values in read_rows(fileobj, filename):
+            result['rows'] += 1
+            cleaned, errors = clean_row(values)
+            if errors:
+                result['error_count'] += 1
+                if len(result['errors']) < MAX_REPORTED_ERRORS:
+                    result['errors'].append({'row': number, 'errors': errors})
+                continue
+
+            batch.append(Transaction(
+                user=user,
+                date=cleaned['date'],
+                description=cleaned['description'],
+                category_id=category_id(cleaned['category'], cleaned['transaction_type']),
+                transaction_type=cleaned['transaction_type'],
+                amount=cleaned['amount'],
+            ))
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+        flush(batch)
+        MonthlyRollup.objects.apply(rollup_deltas)
+        balances.recompute_from(balance_positions)
+
+    return result
@@ -0,0 +1,295 @@
+"""
+Per-view latency and SQL instrumentation.
+
+``InstrumentationMiddleware`` (enabled with ``FINFLOW_INSTRUMENTATION``)
+times every request, counts its SQL queries and their time through a
+database execute wrapper, and files the numbers under the resolved view
+name (``finflow:reports``, ``finflow:dashboard``, ...). Queries executed
+more than once with the same parameters inside one request are logged as
+duplicates.
+
+Numbers are kept in mergeable log-bucketed histograms, so percentiles cost
+a few hundred counters per view however many requests were seen. Each
+process aggregates in memory and writes its histograms to the shared cache
+(``FINFLOW_SHARED_CACHE_ALIAS``, a database table by default) every
+``FINFLOW_INSTRUMENTATION_FLUSH_SECONDS``; ``report()`` merges all
+processes, so the ``dump_instrumentation`` command sees what the web
+workers recorded.
+"""
+import logging
+import math
+import os
+import socket
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from .cache import get_shared_cache
+
+
+logger = logging.getLogger(__name__)
+
+PROCESSES_KEY = 'finflow:instrumentation:processes'
+PROCESS_KEY = 'finflow:instrumentation:{process}'
+# Process snapshots not refreshed for a day are dropped
+PROCESS_TIMEOUT = 24 * 60 * 60
+PERCENTILES = (50, 90, 95, 99)
+UNRESOLVED = '<unresolved>'
+
+
+class Histogram:
+    """
+    Counts of values in buckets: exact up to ``LINEAR_MAX`` (query counts,
+    whole milliseconds), then each ``GROWTH`` times wider than the last, so
+    a percentile is off by at most 2%.
+    """
+    LINEAR_MAX = 100
+    GROWTH = 1.02
+
+    def __init__(self, buckets=None, count=0, total=0.0, maximum=0.0):
+        self.buckets = Counter(buckets or {})
+        self.count = count
+        self.total = total
+        self.maximum = maximum
+
+    @classmethod
+    def bucket(cls, value):
+        if value <= cls.LINEAR_MAX:
+            return math.ceil(value)
+        return cls.LINEAR_MAX + math.ceil(math.log(value / cls.LINEAR_MAX, cls.GROWTH))
+
+    @classmethod
+    def upper_bound(cls, bucket):
+        if bucket <= cls.LINEAR_MAX:
+            return bucket
+        return cls.LINEAR_MAX * cls.GROWTH ** (bucket - cls.LINEAR_MAX)
+
+    def add(self, value):
+        self.buckets[self.bucket(value)] += 1
+        self.count += 1
+        self.total += value
+        self.maximum = max(self.maximum, value)
+
+    def merge(self, other):
+        self.buckets.update(other.buckets)
+        self.count += other.count
+        self.total += other.total
+        self.maximum = max(self.maximum, other.maximum)
+
+    def percentile(self, p):
+        """Upper bound of the bucket holding the ``p``-th percentile value"""
+        if not self.count:
+            return 0
+        rank = math.ceil(self.count * p / 100)
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(self.upper_bound(bucket), self.maximum)
+        return self.maximum
+
+    def summary(self):
+        result = {f'p{p}': round(self.percentile(p), 2) for p in PERCENTILES}
+        result['max'] = round(self.maximum, 2)
+        result['mean'] = round(self.total / self.count, 2) if self.count else 0
+        return result
+
+    def to_dict(self):
+        # Bucket keys become strings in JSON-like caches; from_dict() undoes that
+        return {'buckets': dict(self.buckets), 'count': self.count, 'total': self.total, 'max': self.maximum}
+
+    @classmethod
+    def from_dict(cls, data):
+        buckets = {int(key): value for key, value in data['buckets'].items()}
+        return cls(buckets, data['count'], data['total'], data['max'])
+
+
+class ViewStats:
+    """Histograms of one view: wall time and SQL time in ms, query count"""
+    METRICS = ('wall_ms', 'queries', 'sql_ms')
+
+    def __init__(self):
+        self.histograms = {metric: Histogram() for metric in self.METRICS}
+        self.duplicates = 0
+
+    def add(self, wall_ms, queries, sql_ms, duplicates):
+        self.histograms['wall_ms'].add(wall_ms)
+        self.histograms['queries'].add(queries)
+        self.histograms['sql_ms'].add(sql_ms)
+        self.duplicates += duplicates
+
+    def merge(self, other):
+        for metric in self.METRICS:
+            self.histograms[metric].merge(other.histograms[metric])
+        self.duplicates += other.duplicates
+
+    def to_dict(self):
+        data = {metric: histogram.to_dict() for metric, histogram in self.histograms.items()}
+        data['duplicates'] = self.duplicates
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.histograms = {metric: Histogram.from_dict(data[metric]) for metric in cls.METRICS}
+        stats.duplicates = data['duplicates']
+        return stats
+
+
+class Registry:
+    """This process's stats per view, flushed to the cache now and then"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+        self.process = f'{socket.gethostname()}:{os.getpid()}'
+        self.flushed_at = 0.0
+
+    def record(self, view, wall_ms, queries, sql_ms, duplicates):
+        with self.lock:
+            self.views.setdefault(view, ViewStats()).add(wall_ms, queries, sql_ms, duplicates)
+            due = time.monotonic() - self.flushed_at >= flush_interval()
+        if due:
+            self.flush()
+
+    def snapshot(self):
+        with self.lock:
+            return {view: stats.to_dict() for view, stats in self.views.items()}
+
+    def flush(self):
+        """Write this process's histograms to the cache"""
+        self.flushed_at = time.monotonic()
+        cache = get_shared_cache()
+        key = PROCESS_KEY.format(process=self.process)
+        cache.set(key, self.snapshot(), timeout=PROCESS_TIMEOUT)
+        keys = cache.get(PROCESSES_KEY) or []
+        if key not in keys:
+            cache.set(PROCESSES_KEY, keys + [key], timeout=None)
+
+    def reset(self):
+        with self.lock:
+            self.views = {}
+
+
+registry = Registry()
+
+
+def enabled():
+    return getattr(settings, 'FINFLOW_INSTRUMENTATION', False)
+
+
+def flush_interval():
+    return getattr(settings, 'FINFLOW_INSTRUMENTATION_FLUSH_SECONDS', 10)
+
+
+def duplicate_threshold():
+    return getattr(settings, 'FINFLOW_DUPLICATE_QUERY_THRESHOLD', 2)
+
+
+def collect():
+    """Merged ``{view: ViewStats}`` of every process that flushed to the cache, and this one"""
+    # A process that recorded nothing (such as a management command) has
+    # nothing to add
+    if registry.views:
+        registry.flush()
+    cache = get_shared_cache()
+    keys = cache.get(PROCESSES_KEY) or []
+    snapshots = cache.get_many(keys)
+    if len(snapshots) < len(keys):
+        # Forget processes whose snapshot expired
+        cache.set(PROCESSES_KEY, [key for key in keys if key in snapshots], timeout=None)
+
+    merged = {}
+    for snapshot in snapshots.values():
+        for view, data in snapshot.items():
+            stats = ViewStats.from_dict(data)
+            if view in merged:
+                merged[view].merge(stats)
+            else:
+                merged[view] = stats
+    return merged
+
+
+def report():
+    """
+    Percentile summary per view, slowest (p95 wall time) first.
+
+    Returns a list of dicts with the ``view``, its ``requests``, the
+    ``duplicates`` logged and a ``wall_ms``/``queries``/``sql_ms`` summary
+    (p50, p90, p95, p99, max and mean).
+    """
+    rows = [
+        {
+            'view': view,
+            'requests': stats.histograms['wall_ms'].count,
+            'duplicates': stats.duplicates,
+            **{metric: histogram.summary() for metric, histogram in stats.histograms.items()},
+        }
+        for view, stats in collect().items()
+    ]
+    rows.sort(key=lambda row: row['wall_ms']['p95'], reverse=True)
+    return rows
+
+
+def reset():
+    """Forget the stats of every process"""
+    registry.reset()
+    cache = get_shared_cache()
+    cache.delete_many((cache.get(PROCESSES_KEY) or []) + [PROCESSES_KEY])
+
+
+class QueryRecorder:
+    """Execute wrapper counting the queries of one request"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+            self.statements[(sql, repr(params))] += 1
+
+
+class InstrumentationMiddleware:
+    """Record wall time, query count and SQL time of every request per view"""
+
+    def __init__(self, get_response):
+        if not enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        wall_ms = (time.perf_counter() - started) * 1000
+
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else UNRESOLVED
+        duplicates = self.log_duplicates(view, recorder)
+        registry.record(view, wall_ms, recorder.count, recorder.seconds * 1000, duplicates)
+        return response
+
+    def log_duplicates(self, view, recorder):
+        """Log statements run repeatedly with the same parameters; returns the surplus executions"""
+        threshold = duplicate_threshold()
+        surplus = 0
+        for (sql, params), times in recorder.statements.items():
+            if times >= threshold:
+                surplus += times - 1
+                logger.warning('%s: query executed %d times in one request: %s %s', view, times, sql, params)
+        return surplus
@@ -0,0 +1,286 @@
+"""
+Background report exports.
+
+``request_export`` records an ``ExportJob`` and returns straight away, so
+request workers never render a report themselves. Jobs are executed by
+``run_job`` either on an in-process thread pool (``FINFLOW_EXPORT_WORKER =
+'thread'``, the default) or by ``manage.py run_export_worker``, which polls
+the table and runs jobs on a local thread or process pool. Finished files
+are stored under ``MEDIA_ROOT/exports/`` and reused for identical requests
+while the user's data is unchanged; a newer file for the same request
+replaces the older one, and ``manage.py prune_exports`` removes files older
+than ``FINFLOW_EXPORT_RETENTION_DAYS``.
+
+A running job refreshes ``heartbeat_at`` from a timer thread for as long
+as ``run_job`` works on it, including long stretches without rows such as
+saving a workbook or building the PDF. A worker that dies
+(a restart, a crash) leaves its job silent; after
+``FINFLOW_EXPORT_STALE_SECONDS`` ``recover_stale`` queues it again, or fails
+it once it has been tried ``FINFLOW_EXPORT_MAX_ATTEMPTS`` times, so the
+request is never stuck "in progress".
+"""
+import hashlib
+import json
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import close_old_connections, connection, models, transaction
+from django.utils import timezone
+
+from .exports import SPOOL_MAX_SIZE, csv_report_lines, excel_report_file, export_queryset
+from .models import Category, ExportJob
+from .pdf_reports import pdf_report_file
+
+
+logger = logging.getLogger(__name__)
+
+# Flush rows_done to the database every this many rows, and refresh the
+# heartbeat of a running job this often (seconds)
+PROGRESS_EVERY = 5000
+HEARTBEAT_EVERY = 30
+
+_executor = None
+
+
+def data_fingerprint(user, format, params):
+    """
+    Identify an export by its format, parameters and the data it covers.
+
+    Any insert, update or delete in the exported rows changes the row count,
+    the latest ``updated_at`` or the amount sum, and renaming a category
+    changes the categories' latest ``updated_at``, so a matching fingerprint
+    means an existing artifact can be served again.
+    """
+    state = _queryset(user, format, params).aggregate(
+        rows=models.Count('id'),
+        updated=models.Max('updated_at'),
+        amount=models.Sum('amount'),
+    )
+    state.update(Category.objects.filter(user=user).aggregate(categories_updated=models.Max('updated_at')))
+    payload = json.dumps(
+        {'format': format, 'params': params, 'user': user.id, **state},
+        sort_keys=True, default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _queryset(user, format, params):
+    if format != 'pdf':
+        return export_queryset(user)
+    return export_queryset(
+        user, start=params.get('start'), end=params.get('end'), category_id=params.get('category'),
+    )
+
+
+def stale_after():
+    return timedelta(seconds=getattr(settings, 'FINFLOW_EXPORT_STALE_SECONDS', 600))
+
+
+def max_attempts():
+    return getattr(settings, 'FINFLOW_EXPORT_MAX_ATTEMPTS', 3)
+
+
+def retention():
+    return timedelta(days=getattr(settings, 'FINFLOW_EXPORT_RETENTION_DAYS', 7))
+
+
+def _thread_worker():
+    return getattr(settings, 'FINFLOW_EXPORT_WORKER', 'thread') == 'thread'
+
+
+def recover_stale(jobs=None):
+    """
+    Recover the jobs among ``jobs`` (default: all) whose heartbeat stopped.
+
+    A silent running job goes back to pending, or is failed once it has had
+    ``max_attempts()`` tries. With the in-process thread pool, silent
+    pending jobs (queued by a process that died before running them) are
+    submitted again; ``run_job`` claims atomically, so a job submitted twice
+    still runs once. Returns the ids of the jobs queued again.
+    """
+    jobs = ExportJob.objects.all() if jobs is None else jobs
+    now = timezone.now()
+    stale = jobs.filter(heartbeat_at__lt=now - stale_after())
+
+    stale.filter(status='running', attempts__gte=max_attempts()).update(
+        status='failed', error='The export stopped responding and was given up.', finished_at=now,
+    )
+    requeued = list(stale.filter(status='running').values_list('pk', flat=True))
+    if requeued:
+        ExportJob.objects.filter(pk__in=requeued, status='running').update(status='pending', heartbeat_at=now)
+        logger.warning('Re-queued stale export jobs %s', requeued)
+
+    if _thread_worker():
+        pending = list(stale.filter(status='pending').values_list('pk', flat=True))
+        ExportJob.objects.filter(pk__in=pending, status='pending').update(heartbeat_at=now)
+        requeued += pending
+        for pk in requeued:
+            _submit(pk)
+    return requeued
+
+
+def _submit(job_id):
+    transaction.on_commit(lambda: _get_executor().submit(run_job, job_id))
+
+
+def request_export(user, format, params=None):
+    """Return an existing matching job, or queue a new one"""
+    params = {key: value for key, value in (params or {}).items() if value}
+    fingerprint = data_fingerprint(user, format, params)
+
+    recover_stale(ExportJob.objects.filter(user=user, fingerprint=fingerprint))
+    existing = (
+        ExportJob.objects.filter(user=user, fingerprint=fingerprint)
+        .exclude(status='failed')
+        .order_by('-created_at')
+        .first()
+    )
+    if existing and (existing.status != 'done' or existing.file.storage.exists(existing.file.name)):
+        return existing
+
+    job = ExportJob.objects.create(
+        user=user, format=format, params=params, fingerprint=fingerprint, heartbeat_at=timezone.now(),
+    )
+    if _thread_worker():
+        _submit(job.pk)
+    return job
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'FINFLOW_EXPORT_THREADS', 2),
+            thread_name_prefix='finflow-export',
+        )
+    return _executor
+
+
+def _claim(job_id):
+    """Mark one pending job as running; False if someone else got it first"""
+    now = timezone.now()
+    return bool(ExportJob.objects.filter(pk=job_id, status='pending').update(
+        status='running', started_at=now, heartbeat_at=now, attempts=models.F('attempts') + 1,
+    ))
+
+
+def claim_pending(limit):
+    """
+    Atomically mark up to ``limit`` pending jobs as running and return their
+    ids, after queueing again the jobs of workers that died.
+    """
+    recover_stale()
+    claimed = []
+    for pk in ExportJob.objects.filter(status='pending').order_by('created_at').values_list('pk', flat=True)[:limit]:
+        if _claim(pk):
+            claimed.append(pk)
+    return claimed
+
+
+class Heartbeat:
+    """
+    Refresh ``heartbeat_at`` of a running job every ``HEARTBEAT_EVERY``
+    seconds from a daemon thread, until the ``with`` block ends.
+    """
+
+    def __init__(self, job_id, every=None):
+        self.job_id = job_id
+        self.every = HEARTBEAT_EVERY if every is None else every
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f'finflow-export-heartbeat-{job_id}', daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self):
+        try:
+            while not self._stopped.wait(self.every):
+                ExportJob.objects.filter(pk=self.job_id, status='running').update(heartbeat_at=timezone.now())
+        except Exception:
+            logger.exception('Heartbeat of export job %s failed', self.job_id)
+        finally:
+            connection.close()
+
+
+def run_job(job_id, claimed=False):
+    """
+    Render one export job to its file; safe to call from any thread or process.
+
+    Pass ``claimed=True`` for jobs already marked running by ``claim_pending``.
+    """
+    close_old_connections()
+    try:
+        if not claimed and not _claim(job_id):
+            return  # someone else picked it up
+        job = ExportJob.objects.select_related('user').get(pk=job_id)
+
+        job.rows_total = _queryset(job.user, job.format, job.params).count()
+        job.save(update_fields=['rows_total'])
+
+        flushed = 0
+
+        def progress(done):
+            nonlocal flushed
+            if done - flushed >= PROGRESS_EVERY:
+                ExportJob.objects.filter(pk=job.pk).update(rows_done=done)
+                flushed = done
+
+        with Heartbeat(job.pk):
+            output = _render(job, progress)
+            job.file.save(f'finflow_report_{job.fingerprint[:16]}.{job.format}', File(output), save=False)
+            output.close()
+
+        job.status = 'done'
+        job.rows_done = job.rows_total
+        job.finished_at = timezone.now()
+        job.save(update_fields=['file', 'status', 'rows_done', 'finished_at'])
+        _remove_superseded(job)
+    except Exception as e:
+        logger.exception('Export job %s failed', job_id)
+        ExportJob.objects.filter(pk=job_id).update(status='failed', error=str(e), finished_at=timezone.now())
+    finally:
+        close_old_connections()
+
+
+def _remove_superseded(job):
+    """Delete the older finished files of the same export; the new one replaces them"""
+    older = ExportJob.objects.filter(
+        user_id=job.user_id, format=job.format, params=job.params, status='done', finished_at__lt=job.finished_at,
+    ).exclude(pk=job.pk)
+    for name in older.exclude(file='').values_list('file', flat=True):
+        if name != job.file.name:
+            job.file.storage.delete(name)
+    older.delete()
+
+
+def _render(job, progress):
+    if job.format == 'csv':
+        output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        for chunk in csv_report_lines(job.user, progress=progress):
+            output.write(chunk.encode('utf-8'))
+        output.seek(0)
+        return output
+
+    if job.format == 'xlsx':
+        return excel_report_file(job.user, progress=progress)
+
+    category = None
+    if job.params.get('category'):
+        category = Category.objects.get(pk=job.params['category'], user=job.user)
+    return pdf_report_file(
+        job.user,
+        progress=progress,
+        start=job.params.get('start'),
+        end=job.params.get('end'),
+        category=category,
+    )
@@ -0,0 +1,125 @@
+"""
+Business logo processing.
+
+An uploaded logo is checked (size, pixel count, real image format), turned
+upright from its EXIF orientation and re-encoded from its pixels alone, so
+EXIF, GPS, ICC and comment data never reach storage. A few fixed-size
+variants are written in WebP and PNG under content-hashed names
+(``logos/<hash>-<size>.<format>``): a new logo always gets new URLs, and a
+stored file never changes, so ``logo_file`` can serve it with far-future
+cache headers.
+"""
+import hashlib
+import io
+import re
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .models import Profile
+
+
+LOGO_DIR = 'logos'
+# Longest side in pixels of each variant; templates use THUMBNAIL_SIZE
+SIZES = (64, 128, 256)
+THUMBNAIL_SIZE = 128
+FORMATS = {'webp': 'WEBP', 'png': 'PNG'}
+CONTENT_TYPES = {'webp': 'image/webp', 'png': 'image/png'}
+ACCEPTED_FORMATS = {'PNG', 'JPEG', 'GIF', 'WEBP'}
+MAX_PIXELS = 25_000_000
+NAME_RE = re.compile(r'^[0-9a-f]{16}-\d+\.(webp|png)$')
+
+
+class LogoError(ValueError):
+    """The upload is not an image we accept"""
+
+
+def max_bytes():
+    return getattr(settings, 'FINFLOW_LOGO_MAX_BYTES', 5 * 1024 * 1024)
+
+
+def variant_key(size, extension):
+    return f'{size}.{extension}'
+
+
+def _open(upload):
+    if upload.size > max_bytes():
+        raise LogoError(f'The logo must be smaller than {max_bytes() // (1024 * 1024)} MB.')
+    data = upload.read()
+    try:
+        with Image.open(io.BytesIO(data)) as probe:
+            if probe.format not in ACCEPTED_FORMATS:
+                raise LogoError('The logo must be a PNG, JPEG, GIF or WebP image.')
+            if probe.width * probe.height > MAX_PIXELS:
+                raise LogoError('The logo has too many pixels.')
+            probe.verify()
+        image = Image.open(io.BytesIO(data))
+        image.load()
+    except (UnidentifiedImageError, OSError, SyntaxError, Image.DecompressionBombError):
+        raise LogoError('The file is not a valid image.')
+    return image
+
+
+def _clean(image):
+    """Upright RGBA pixels with no metadata attached"""
+    image = ImageOps.exif_transpose(image)
+    image = image.convert('RGBA')
+    image.info = {}
+    return image
+
+
+def process(upload):
+    """
+    Validate ``upload`` and store its variants.
+
+    Returns ``{'<size>.<format>': storage name}``; raises ``LogoError`` for
+    files that are too big, not images, or in a format we don't accept.
+    """
+    image = _clean(_open(upload))
+    digest = hashlib.sha256(image.tobytes() + repr(image.size).encode()).hexdigest()[:16]
+
+    variants = {}
+    for size in SIZES:
+        resized = image.copy()
+        resized.thumbnail((size, size), Image.LANCZOS)
+        for extension, pil_format in FORMATS.items():
+            name = f'{LOGO_DIR}/{digest}-{size}.{extension}'
+            if not default_storage.exists(name):
+                buffer = io.BytesIO()
+                if pil_format == 'WEBP':
+                    resized.save(buffer, pil_format, quality=85, method=6)
+                else:
+                    resized.save(buffer, pil_format, optimize=True)
+                default_storage.save(name, ContentFile(buffer.getvalue()))
+            variants[variant_key(size, extension)] = name
+    return variants
+
+
+def delete_unused(names, keep=()):
+    """Remove the stored variants in ``names`` that are not in ``keep`` and no profile uses"""
+    for name in set(names) - set(keep):
+        if not NAME_RE.match(name.rsplit('/', 1)[-1]):
+            continue
+        # Identical uploads share files; every profile using a digest points
+        # business_logo at one of its variants
+        digest = name.rsplit('/', 1)[-1].split('-', 1)[0]
+        if not Profile.objects.filter(business_logo__startswith=f'{LOGO_DIR}/{digest}-').exists():
+            default_storage.delete(name)
+
+
+def thumbnail_urls(profile):
+    """``(webp_url, png_url)`` of the profile's thumbnail, or of its legacy unprocessed logo"""
+    variants = profile.logo_variants or {}
+    png = variants.get(variant_key(THUMBNAIL_SIZE, 'png'))
+    if png:
+        webp = variants.get(variant_key(THUMBNAIL_SIZE, 'webp'))
+        return (
+            reverse('finflow:logo_file', args=[webp.rsplit('/', 1)[-1]]) if webp else '',
+            reverse('finflow:logo_file', args=[png.rsplit('/', 1)[-1]]),
+        )
+    if profile.business_logo:
+        return '', profile.business_logo.url
+    return '', ''
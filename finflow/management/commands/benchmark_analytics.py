@@ -0,0 +1,70 @@
+import time
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from finflow.analytics import amount_rows, forecast, summarize, to_arrays, window_start
+from finflow.synthetic import generate
+
+
+class Command(BaseCommand):
+    help = (
+        'Time the reports analytics (finflow.analytics) for synthetic users of several sizes, '
+        'or for a real user'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000],
+            help='Transactions of the synthetic user per run (default: 10k, 100k and 1M)',
+        )
+        parser.add_argument('--categories', type=int, default=50)
+        parser.add_argument(
+            '--years', type=int, default=1,
+            help='Years the synthetic transactions are spread over (default: 1, so most fall in the window)',
+        )
+        parser.add_argument('--user', help='Time forecast() against this user\'s data instead')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per size; the best is reported')
+        parser.add_argument('--keep', action='store_true', help='Keep the synthetic users instead of rolling back')
+
+    def handle(self, *args, **options):
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f'User "{options["user"]}" does not exist')
+            best = min(self._time(lambda: forecast(user)) for _ in range(options['repeat']))
+            self.stdout.write(f'forecast() for "{user.username}": {best * 1000:.1f} ms')
+            return
+
+        today = date.today()
+        start = window_start(today)
+        self.stdout.write(
+            f'{"rows":>10}  {"grouped":>8}  {"query":>10}  {"arrays":>10}  {"metrics":>10}  {"total":>10}  {"rows/s":>12}'
+        )
+        with transaction.atomic():
+            for n in options['rows']:
+                user, = generate(
+                    categories=options['categories'], transactions=n, years=options['years'], seed=n,
+                    prefix=f'analytics-benchmark-{n}-{time.time_ns()}-', today=today,
+                )
+                # load_amounts() is the query plus to_arrays(); the two are timed apart
+                query = min(self._time(lambda: amount_rows(user, start, today)) for _ in range(options['repeat']))
+                rows = amount_rows(user, start, today)
+                arrays = min(self._time(lambda: to_arrays(rows)) for _ in range(options['repeat']))
+                data = to_arrays(rows)
+                metrics = min(self._time(lambda: summarize(data, start, today)) for _ in range(options['repeat']))
+                total = query + arrays + metrics
+                self.stdout.write(
+                    f'{n:>10}  {len(rows):>8}  {query * 1000:>8.1f}ms  {arrays * 1000:>8.1f}ms'
+                    f'  {metrics * 1000:>8.1f}ms  {total * 1000:>8.1f}ms  {n / total:>12,.0f}'
+                )
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+    def _time(self, func):
+        started = time.perf_counter()
+        func()
+        return time.perf_counter() - started
@@ -0,0 +1,55 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from finflow.benchmarks import VIEWS, query_growth, run
+
+
+class Command(BaseCommand):
+    help = (
+        'Time the main pages and exports for synthetic users of several sizes and '
+        'fail if a page\'s query count grows with the number of transactions'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[100, 1000, 10000],
+            help='Transactions of the synthetic user per run (default: 100, 1000 and 10000)',
+        )
+        parser.add_argument('--repeat', type=int, default=3, help='Requests per view and size')
+        parser.add_argument('--views', nargs='+', default=list(VIEWS), help='URL names to benchmark')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        parser.add_argument('--keep', action='store_true', help='Keep the synthetic users instead of rolling back')
+
+    def handle(self, *args, **options):
+        if len(options['sizes']) < 2:
+            raise CommandError('Give at least two --sizes to compare.')
+
+        with transaction.atomic():
+            report = run(options['sizes'], repeat=options['repeat'], views=options['views'])
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+        self.stdout.write(f'{"view":<32} {"rows":>8} {"status":>6} {"queries":>7} {"best ms":>9} {"median ms":>9}')
+        for view, entries in report['results'].items():
+            for entry in entries:
+                self.stdout.write(
+                    f'{view:<32} {entry["rows"]:>8} {entry["status"]:>6} {entry["queries"]:>7}'
+                    f' {entry["best_ms"]:>9.1f} {entry["median_ms"]:>9.1f}'
+                )
+
+        growing = query_growth(report)
+        report['query_growth'] = growing
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f'Results written to {options["output"]}.')
+
+        if growing:
+            details = '; '.join(
+                f'{item["view"]} ({", ".join(f"{rows} rows: {n}" for rows, n in item["queries"].items())})'
+                for item in growing
+            )
+            raise CommandError(f'Query count grows with the number of transactions: {details}')
+        self.stdout.write(self.style.SUCCESS('Query counts are independent of the data size.'))
@@ -0,0 +1,37 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from finflow import instrumentation
+
+
+class Command(BaseCommand):
+    help = 'Print the per-view latency and SQL percentiles recorded by the instrumentation middleware'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+        parser.add_argument('--reset', action='store_true', help='Clear the recorded stats after printing them')
+
+    def handle(self, *args, **options):
+        rows = instrumentation.report()
+        if options['json']:
+            self.stdout.write(json.dumps(rows, indent=2))
+        elif not rows:
+            note = '' if instrumentation.enabled() else ' (FINFLOW_INSTRUMENTATION is off)'
+            self.stdout.write(f'No requests recorded{note}.')
+        else:
+            self.stdout.write(
+                f'{"view":<36} {"requests":>8}  {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8}'
+                f'  {"queries p50":>11} {"p95":>5} {"max":>5}  {"sql p95 ms":>10} {"dupes":>6}'
+            )
+            for row in rows:
+                wall, queries = row['wall_ms'], row['queries']
+                self.stdout.write(
+                    f'{row["view"]:<36} {row["requests"]:>8}  {wall["p50"]:>8.1f} {wall["p95"]:>8.1f} {wall["p99"]:>8.1f}'
+                    f'  {queries["p50"]:>11.0f} {queries["p95"]:>5.0f} {queries["max"]:>5.0f}'
+                    f'  {row["sql_ms"]["p95"]:>10.1f} {row["duplicates"]:>6}'
+                )
+
+        if options['reset']:
+            instrumentation.reset()
+            self.stdout.write(self.style.SUCCESS('Instrumentation stats cleared.'))
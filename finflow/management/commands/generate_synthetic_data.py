@@ -0,0 +1,46 @@
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from finflow.synthetic import generate
+
+
+class Command(BaseCommand):
+    help = 'Create users with synthetic categories and transactions spread over several years'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1)
+        parser.add_argument('--categories', type=int, default=12, help='Categories per user')
+        parser.add_argument('--transactions', type=int, default=1000, help='Transactions per user')
+        parser.add_argument('--years', type=int, default=3, help='Years of history, ending today')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--prefix', default='synthetic', help='Usernames are <prefix><n>')
+        parser.add_argument('--password', help='Password of every generated user (unusable by default)')
+
+    def handle(self, *args, **options):
+        if min(options['users'], options['years']) < 1:
+            raise CommandError('--users and --years must be at least 1.')
+        if min(options['transactions'], options['categories']) < 0:
+            raise CommandError('--transactions and --categories must not be negative.')
+        usernames = [f'{options["prefix"]}{n}' for n in range(1, options['users'] + 1)]
+        taken = User.objects.filter(username__in=usernames).values_list('username', flat=True)[:5]
+        if taken:
+            raise CommandError(f'Users already exist: {", ".join(taken)}; pick another --prefix.')
+
+        started = time.perf_counter()
+        users = generate(
+            users=options['users'],
+            categories=options['categories'],
+            transactions=options['transactions'],
+            years=options['years'],
+            seed=options['seed'],
+            prefix=options['prefix'],
+            password=make_password(options['password']) if options['password'] else None,
+        )
+        elapsed = time.perf_counter() - started
+        total = len(users) * options['transactions']
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {len(users)} users with {total} transactions in {elapsed:.1f}s.'
+        ))
@@ -0,0 +1,37 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from finflow.importers import ImportFileError, import_transactions
+
+
+class Command(BaseCommand):
+    help = 'Bulk import transactions for a user from a CSV or XLSX file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('path')
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--dry-run', action='store_true', help='Validate the file without writing anything')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f'User "{options["username"]}" does not exist')
+
+        try:
+            with open(options['path'], 'rb') as fileobj:
+                result = import_transactions(
+                    user, fileobj, options['path'],
+                    batch_size=options['batch_size'], dry_run=options['dry_run'],
+                )
+        except (OSError, ImportFileError) as e:
+            raise CommandError(str(e))
+
+        for error in result['errors']:
+            self.stderr.write(f"Row {error['row']}: {' '.join(error['errors'])}")
+        verb = 'Validated' if options['dry_run'] else 'Imported'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {result['created']} of {result['rows']} rows "
+            f"({result['error_count']} skipped, {result['categories_created']} categories created)."
+        ))
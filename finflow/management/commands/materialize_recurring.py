@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from finflow.recurring import materialize_due
+
+
+class Command(BaseCommand):
+    help = 'Create the transactions of every due recurring transaction (safe to re-run)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Materialize up to this date (YYYY-MM-DD) instead of today')
+        parser.add_argument('--batch-size', type=int, default=None, help='Rules per database transaction')
+
+    def handle(self, *args, **options):
+        today = None
+        if options['date']:
+            today = parse_date(options['date'])
+            if today is None:
+                raise CommandError(f'Invalid date "{options["date"]}"')
+
+        totals = materialize_due(
+            today=today,
+            batch_size=options['batch_size'],
+            progress=lambda totals: self.stdout.write(
+                f"Batch {totals['batches']}: {totals['rules']} rules, {totals['transactions']} transactions"
+            ) if options['verbosity'] > 1 else None,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {totals['transactions']} transactions from {totals['rules']} due rules."
+        ))
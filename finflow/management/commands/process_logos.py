@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from finflow import logos
+from finflow.models import Profile
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate the resized, metadata-free variants of logos uploaded before logo processing '
+        'and delete the original uploads'
+    )
+
+    def handle(self, *args, **options):
+        done = failed = 0
+        profiles = Profile.objects.filter(logo_variants={}).exclude(business_logo='').exclude(business_logo=None)
+        for profile in profiles.iterator():
+            original = profile.business_logo
+            name = original.name
+            try:
+                with original.open('rb') as upload:
+                    profile.set_logo(logos.process(upload))
+            except (logos.LogoError, OSError) as e:
+                failed += 1
+                self.stderr.write(f'{profile.user_id}: {name}: {e}')
+                continue
+            profile.save()
+            # The original still carries its EXIF/GPS metadata
+            if not Profile.objects.filter(business_logo=name).exists():
+                original.storage.delete(name)
+            done += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Processed {done} logos ({failed} failed).'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from finflow.jobs import retention
+from finflow.models import ExportJob
+
+
+class Command(BaseCommand):
+    help = 'Delete export jobs and files finished more than FINFLOW_EXPORT_RETENTION_DAYS ago'
+
+    def handle(self, *args, **options):
+        removed = ExportJob.objects.prune(timezone.now() - retention())
+        self.stdout.write(self.style.SUCCESS(f'Removed {removed} export jobs.'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from finflow.models import SyncTombstone
+from finflow.sync import tombstone_retention
+
+
+class Command(BaseCommand):
+    help = 'Delete sync tombstones older than FINFLOW_SYNC_TOMBSTONE_DAYS'
+
+    def handle(self, *args, **options):
+        removed = SyncTombstone.objects.prune(timezone.now() - tombstone_retention())
+        self.stdout.write(self.style.SUCCESS(f'Removed {removed} tombstones.'))
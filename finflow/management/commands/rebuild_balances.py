@@ -0,0 +1,25 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from finflow.balances import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored running balance of every transaction'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Only rebuild balances for this username')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f'User "{options["user"]}" does not exist')
+
+        with transaction.atomic():
+            users = rebuild(user=user)
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt running balances for {users} users.'))
@@ -0,0 +1,51 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from finflow.jobs import claim_pending, run_job
+
+
+class Command(BaseCommand):
+    help = 'Run queued report export jobs on a local thread or process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Number of concurrent jobs')
+        parser.add_argument('--pool', choices=['thread', 'process'], default='thread')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds between polls when idle')
+        parser.add_argument('--once', action='store_true', help='Run whatever is pending, then exit')
+
+    def handle(self, *args, **options):
+        workers = max(options['workers'], 1)
+        pool_class = ProcessPoolExecutor if options['pool'] == 'process' else ThreadPoolExecutor
+        self.stdout.write(f'Export worker started ({workers} {options["pool"]} workers).')
+
+        running = {}
+        with pool_class(max_workers=workers) as pool:
+            while True:
+                # Claim only as many jobs as there are free workers, so a
+                # claimed job never waits behind a slow one
+                job_ids = claim_pending(workers - len(running)) if len(running) < workers else []
+                if job_ids:
+                    # Child processes must not inherit open DB connections
+                    connections.close_all()
+                    for pk in job_ids:
+                        running[pool.submit(run_job, pk, True)] = pk
+                elif not running:
+                    if options['once']:
+                        break
+                    time.sleep(options['interval'])
+                    continue
+
+                # Take every job that finishes as soon as it does, and poll for
+                # new work at least every interval while others still run
+                done, _ = wait(running, timeout=options['interval'], return_when=FIRST_COMPLETED)
+                for future in done:
+                    pk = running.pop(future)
+                    try:
+                        future.result()
+                    except Exception as e:
+                        self.stderr.write(f'Export job {pk} crashed its worker: {e}')
+                    else:
+                        self.stdout.write(f'Processed export job {pk}.')
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import TruncMonth
+
+
+def populate_rollups(apps, schema_editor):
+    Transaction = apps.get_model('finflow', 'Transaction')
+    MonthlyRollup = apps.get_model('finflow', 'MonthlyRollup')
+    rows = (
+        Transaction.objects.order_by()
+        .annotate(month=TruncMonth('date'))
+        .values('user_id', 'month', 'transaction_type', 'category_id')
+        .annotate(total=models.Sum('amount'), n=models.Count('id'))
+    )
+    MonthlyRollup.objects.bulk_create(
+        (
+            MonthlyRollup(
+                user_id=row['user_id'],
+                month=row['month'],
+                transaction_type=row['transaction_type'],
+                category_id=row['category_id'],
+                amount=row['total'],
+                count=row['n'],
+            )
+            for row in rows.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finflow', '0004_alter_profile_business_logo'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('transaction_type', models.CharField(choices=[('income', 'Income'), ('expense', 'Expense')], max_length=10)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('count', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='monthly_rollups', to='finflow.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['month'],
+                'indexes': [models.Index(fields=['user', 'month'], name='finflow_mon_user_id_ec94f8_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'month', 'transaction_type', 'category'), name='unique_monthly_rollup')],
+            },
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
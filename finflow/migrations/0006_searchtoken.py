@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:42
+
+import django.db.models.deletion
+from django.conf import settings
+import re
+
+from django.db import migrations, models
+from django.db.utils import OperationalError
+
+
+FTS_TABLE = 'finflow_transaction_fts'
+
+
+def create_search_index(apps, schema_editor):
+    """Create and fill the FTS5 table where available, else fill SearchToken"""
+    Transaction = apps.get_model('finflow', 'Transaction')
+    SearchToken = apps.get_model('finflow', 'SearchToken')
+    connection = schema_editor.connection
+
+    if connection.vendor == 'sqlite':
+        try:
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                f"description, user_id UNINDEXED, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+            )
+        except OperationalError:
+            pass  # SQLite built without FTS5
+        else:
+            schema_editor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, description, user_id) "
+                f"SELECT id, description, user_id FROM {Transaction._meta.db_table}"
+            )
+            return
+
+    tokens = []
+    for t in Transaction.objects.order_by().values('id', 'user_id', 'description').iterator():
+        for token in dict.fromkeys(re.findall(r'\w+', t['description'].lower())):
+            tokens.append(SearchToken(user_id=t['user_id'], transaction_id=t['id'], token=token[:64]))
+    SearchToken.objects.bulk_create(tokens, batch_size=1000)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finflow', '0005_monthlyrollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=64)),
+                ('transaction', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='finflow.transaction')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'token'], name='finflow_sea_user_id_9737da_idx')],
+                'unique_together': {('transaction', 'token')},
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_running_balances(apps, schema_editor):
+    Transaction = apps.get_model('finflow', 'Transaction')
+    signed = models.Case(
+        models.When(transaction_type='expense', then=-models.F('amount')),
+        default=models.F('amount'),
+        output_field=models.DecimalField(max_digits=14, decimal_places=2),
+    )
+    rows = (
+        Transaction.objects.order_by()
+        .annotate(balance=models.Window(
+            models.Sum(signed),
+            partition_by=[models.F('user_id')],
+            order_by=[models.F('date').asc(), models.F('id').asc()],
+        ))
+        .values_list('id', 'balance')
+    )
+    # Read everything first: SQLite doesn't isolate a cursor from writes to its table
+    batch = []
+    for pk, balance in list(rows):
+        batch.append(Transaction(id=pk, running_balance=balance))
+        if len(batch) >= 1000:
+            Transaction.objects.bulk_update(batch, ['running_balance'])
+            batch = []
+    Transaction.objects.bulk_update(batch, ['running_balance'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finflow', '0010_budget'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='running_balance',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, help_text="The user's balance after this transaction, in (date, id) order (see finflow/balances.py)", max_digits=14),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'date', 'id'], name='finflow_transaction_balance'),
+        ),
+        migrations.RunPython(populate_running_balances, migrations.RunPython.noop),
+    ]
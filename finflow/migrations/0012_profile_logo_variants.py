@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finflow', '0011_running_balance'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='logo_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
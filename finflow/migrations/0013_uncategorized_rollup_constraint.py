@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def merge_uncategorized_duplicates(apps, schema_editor):
+    """Fold duplicate uncategorized buckets into one before the constraint goes in"""
+    MonthlyRollup = apps.get_model('finflow', 'MonthlyRollup')
+    duplicates = (
+        MonthlyRollup.objects.filter(category__isnull=True).order_by()
+        .values('user_id', 'month', 'transaction_type')
+        .annotate(n=models.Count('id'), total=models.Sum('amount'), rows=models.Sum('count'), keep=models.Min('id'))
+        .filter(n__gt=1)
+    )
+    for row in list(duplicates):
+        buckets = MonthlyRollup.objects.filter(
+            user_id=row['user_id'], month=row['month'], transaction_type=row['transaction_type'], category__isnull=True,
+        )
+        buckets.exclude(id=row['keep']).delete()
+        buckets.filter(id=row['keep']).update(amount=row['total'], count=row['rows'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finflow', '0012_profile_logo_variants'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='monthlyrollup',
+            name='category',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='monthly_rollups', to='finflow.category'),
+        ),
+        migrations.RunPython(merge_uncategorized_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='monthlyrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('category__isnull', True)), fields=('user', 'month', 'transaction_type'), name='unique_uncategorized_monthly_rollup'),
+        ),
+    ]
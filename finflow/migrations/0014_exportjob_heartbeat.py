@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:39
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def set_heartbeats(apps, schema_editor):
+    """Unfinished jobs count as alive since they started (or were queued)"""
+    ExportJob = apps.get_model('finflow', 'ExportJob')
+    ExportJob.objects.filter(status__in=('pending', 'running')).update(
+        heartbeat_at=Coalesce('started_at', 'created_at'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finflow', '0013_uncategorized_rollup_constraint'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportjob',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='exportjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='exportjob',
+            index=models.Index(fields=['status', 'heartbeat_at'], name='finflow_exp_status_9968d6_idx'),
+        ),
+        migrations.RunPython(set_heartbeats, migrations.RunPython.noop),
+    ]
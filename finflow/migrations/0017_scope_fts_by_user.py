@@ -0,0 +1,49 @@
+from django.db import migrations
+
+
+FTS_TABLE = 'finflow_transaction_fts'
+TOKENIZE = "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'"
+
+
+def _fts_exists(schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return False
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+        return cursor.fetchone() is not None
+
+
+def index_user_column(apps, schema_editor):
+    """Rebuild the FTS5 table with ``user_id`` indexed, as the term ``u<id>``"""
+    if not _fts_exists(schema_editor):
+        return
+    table = apps.get_model('finflow', 'Transaction')._meta.db_table
+    schema_editor.execute(f'DROP TABLE {FTS_TABLE}')
+    schema_editor.execute(f'CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(description, user_id, {TOKENIZE})')
+    # Rank on the description only; every row of a user matches its user term
+    schema_editor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rank) VALUES ('rank', 'bm25(1.0, 0.0)')")
+    schema_editor.execute(
+        f"INSERT INTO {FTS_TABLE} (rowid, description, user_id) SELECT id, description, 'u' || user_id FROM {table}"
+    )
+
+
+def unindex_user_column(apps, schema_editor):
+    if not _fts_exists(schema_editor):
+        return
+    table = apps.get_model('finflow', 'Transaction')._meta.db_table
+    schema_editor.execute(f'DROP TABLE {FTS_TABLE}')
+    schema_editor.execute(f'CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(description, user_id UNINDEXED, {TOKENIZE})')
+    schema_editor.execute(
+        f'INSERT INTO {FTS_TABLE} (rowid, description, user_id) SELECT id, description, user_id FROM {table}'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finflow', '0016_transaction_keyset_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(index_user_column, unindex_user_column),
+    ]
@@ -3,7 +3,28 @@ from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
 from datetime import date
 from django.dispatch import receiver
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, pre_save, post_delete, pre_delete
+from django.db import IntegrityError, connections, transaction as db_transaction
+from django.utils import timezone
+from .cache import bump_data_version
+
+class CategoryQuerySet(models.QuerySet):
+    """Query helpers for categories"""
+
+    def with_stats(self, user=None):
+        """
+        Annotate transaction count, total amount and last-used date.
+
+        Everything is computed in the same query as the categories
+        themselves, so listing N categories never costs N extra COUNTs.
+        """
+        qs = self.filter(user=user) if user is not None else self
+        return qs.annotate(
+            num_transactions=models.Count('transactions'),
+            total_amount=models.Sum('transactions__amount'),
+            last_used=models.Max('transactions__date'),
+        )
+
 
 class Category(models.Model):
     """Transaction category model"""
@@ -18,10 +39,15 @@ class Category(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = CategoryQuerySet.as_manager()
+    
     class Meta:
         unique_together = ('user', 'name', 'category_type')
         verbose_name_plural = 'Categories'
         ordering = ['category_type', 'name']
+        indexes = [
+            models.Index(fields=['user', 'updated_at']),
+        ]
     
     def __str__(self):
         return f"{self.name} ({self.get_category_type_display()})"
@@ -29,9 +55,29 @@ class Category(models.Model):
     @property
     def transaction_count(self):
         """Get count of transactions in this category"""
+        # Reuse the value annotated by Category.objects.with_stats() when present
+        if hasattr(self, 'num_transactions'):
+            return self.num_transactions
         return self.transactions.count()
  
 
+class TransactionQuerySet(models.QuerySet):
+    """Query helpers for transactions"""
+
+    def bulk_delete(self):
+        """
+        Delete the transactions without the per-row bookkeeping receivers.
+
+        The delete still goes through Django's collector, so rows that
+        reference the transactions are cascaded or set null as usual. The
+        caller does the bookkeeping for all rows at once with
+        ``finflow.bulk.transactions_deleted()``.
+        """
+        queryset = self._chain()
+        queryset.bulk = True
+        return queryset.delete()
+
+
 class Transaction(models.Model):
     """Financial transaction model"""
     TRANSACTION_TYPES = (
@@ -45,33 +91,615 @@ class Transaction(models.Model):
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, related_name='transactions')
     transaction_type = models.CharField(max_length=10, choices=TRANSACTION_TYPES)
     amount = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)])
+    running_balance = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0, editable=False,
+        help_text="The user's balance after this transaction, in (date, id) order (see finflow/balances.py)",
+    )
+    recurring = models.ForeignKey(
+        'RecurringTransaction', on_delete=models.SET_NULL, null=True, blank=True, related_name='occurrences'
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = TransactionQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-date', '-created_at']
         indexes = [
-            models.Index(fields=['user', '-date']),
+            # Matches finflow.pagination.ORDERING, so list pages are range scans
+            models.Index(fields=['user', '-date', '-created_at', '-id'], name='finflow_transaction_keyset'),
             models.Index(fields=['user', 'transaction_type']),
             models.Index(fields=['user', 'category']),
+            models.Index(fields=['user', 'updated_at']),
+            models.Index(fields=['user', 'date', 'id'], name='finflow_transaction_balance'),
         ]
     
     def __str__(self):
         return f"{self.description} - {self.amount} ({self.get_transaction_type_display()})"
 
+
+class RecurringTransaction(models.Model):
+    """A transaction repeated on a schedule (materialized by finflow/recurring.py)"""
+    FREQUENCIES = (
+        ('daily', 'Daily'),
+        ('weekly', 'Weekly'),
+        ('monthly', 'Monthly'),
+        ('quarterly', 'Quarterly'),
+        ('yearly', 'Yearly'),
+    )
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='recurring_transactions')
+    description = models.CharField(max_length=255)
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='recurring_transactions')
+    transaction_type = models.CharField(max_length=10, choices=Transaction.TRANSACTION_TYPES)
+    amount = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)])
+    frequency = models.CharField(max_length=10, choices=FREQUENCIES, default='monthly')
+    interval = models.PositiveSmallIntegerField(default=1, validators=[MinValueValidator(1)], help_text='Repeat every N days/weeks/months/...')
+    start_date = models.DateField(default=date.today)
+    end_date = models.DateField(null=True, blank=True)
+    next_date = models.DateField(help_text='Next occurrence not yet created')
+    active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['next_date']
+        indexes = [
+            # The materializer only ever asks for active rules that are due
+            models.Index(fields=['next_date', 'id'], condition=models.Q(active=True), name='finflow_recurring_due_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.description} ({self.get_frequency_display()})"
+    
+    def save(self, *args, **kwargs):
+        if self.next_date is None:
+            self.next_date = self.start_date
+        super().save(*args, **kwargs)
+
+
+# Delta batches at least this big are applied in bulk
+BULK_APPLY_MIN = 20
+
+
+class MonthlyRollupManager(models.Manager):
+    """Incremental maintenance of the monthly rollup table"""
+
+    def add(self, user_id, day, transaction_type, category_id, amount, count=1):
+        """Add ``amount``/``count`` (negative to subtract) to one rollup bucket"""
+        day = Transaction._meta.get_field('date').to_python(day)
+        amount = Transaction._meta.get_field('amount').to_python(amount)
+        bucket = self.filter(
+            user_id=user_id,
+            month=day.replace(day=1),
+            transaction_type=transaction_type,
+            category_id=category_id,
+        )
+        updated = bucket.update(
+            amount=models.F('amount') + amount,
+            count=models.F('count') + count,
+        )
+        if not updated:
+            try:
+                # A concurrent writer may create the bucket first; the
+                # savepoint keeps the outer transaction usable if so
+                with db_transaction.atomic():
+                    self.create(
+                        user_id=user_id,
+                        month=day.replace(day=1),
+                        transaction_type=transaction_type,
+                        category_id=category_id,
+                        amount=amount,
+                        count=count,
+                    )
+            except IntegrityError:
+                bucket.update(amount=models.F('amount') + amount, count=models.F('count') + count)
+        elif count < 0:
+            bucket.filter(count__lte=0).delete()
+
+    def collect(self, transactions, sign=1, deltas=None):
+        """
+        Sum ``transactions`` into per-bucket ``(amount, count)`` deltas.
+
+        ``transactions`` may be model instances or dicts with ``user_id``,
+        ``date``, ``transaction_type``, ``category_id`` and ``amount``; pass
+        ``sign=-1`` to remove them, and an existing ``deltas`` dict to keep
+        accumulating into it.
+        """
+        deltas = {} if deltas is None else deltas
+        for t in transactions:
+            if not isinstance(t, dict):
+                t = {
+                    'user_id': t.user_id, 'date': t.date, 'transaction_type': t.transaction_type,
+                    'category_id': t.category_id, 'amount': t.amount,
+                }
+            day = Transaction._meta.get_field('date').to_python(t['date'])
+            key = (t['user_id'], day.replace(day=1), t['transaction_type'], t['category_id'])
+            amount, count = deltas.get(key, (0, 0))
+            amount += sign * Transaction._meta.get_field('amount').to_python(t['amount'])
+            deltas[key] = (amount, count + sign)
+        return deltas
+
+    def apply(self, deltas):
+        """
+        Apply ``collect()``ed deltas.
+
+        A few buckets are updated one UPDATE at a time. Large batches look up
+        the existing buckets, increment them with a single ``executemany``
+        UPDATE (still relative, so concurrent writers don't lose updates)
+        and ``bulk_create`` the missing ones.
+        """
+        deltas = {key: value for key, value in deltas.items() if value[0] or value[1]}
+        if len(deltas) < BULK_APPLY_MIN:
+            for (user_id, month, transaction_type, category_id), (amount, count) in deltas.items():
+                self.add(user_id, month, transaction_type, category_id, amount, count)
+        else:
+            self._bulk_apply(deltas)
+
+        # Every transaction write ends up here, so this is where budgets are
+        # re-checked; pages only read the stored flags
+        from .budgets import evaluate
+        evaluate(deltas)
+
+    def _bulk_apply(self, deltas):
+        existing = {}
+        user_ids = sorted({key[0] for key in deltas})
+        months = {key[1] for key in deltas}
+        for i in range(0, len(user_ids), 500):
+            rows = self.filter(user_id__in=user_ids[i:i + 500], month__in=months).values_list(
+                'id', 'user_id', 'month', 'transaction_type', 'category_id'
+            )
+            existing.update({tuple(row[1:]): row[0] for row in rows})
+
+        updates = [
+            (amount, count, existing[key])
+            for key, (amount, count) in deltas.items() if key in existing
+        ]
+        if updates:
+            connection = connections[self.db]
+            table = connection.ops.quote_name(self.model._meta.db_table)
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    f'UPDATE {table} SET amount = amount + %s, count = count + %s WHERE id = %s', updates
+                )
+            if any(count < 0 for _, count, _ in updates):
+                self.filter(id__in=[pk for _, count, pk in updates if count < 0], count__lte=0).delete()
+
+        missing = {key: value for key, value in deltas.items() if key not in existing}
+        try:
+            with db_transaction.atomic():
+                self.bulk_create(
+                    [
+                        self.model(
+                            user_id=user_id, month=month, transaction_type=transaction_type,
+                            category_id=category_id, amount=amount, count=count,
+                        )
+                        for (user_id, month, transaction_type, category_id), (amount, count) in missing.items()
+                    ],
+                    batch_size=1000,
+                )
+        except IntegrityError:
+            # Some buckets were created concurrently; add the rest one by one
+            for (user_id, month, transaction_type, category_id), (amount, count) in missing.items():
+                self.add(user_id, month, transaction_type, category_id, amount, count)
+
+    def add_transactions(self, transactions, sign=1):
+        """Add (or with ``sign=-1`` remove) many transactions at once"""
+        self.apply(self.collect(transactions, sign))
+
+    def rebuild(self, user=None):
+        """Recompute rollups from scratch with one grouped query; returns the row count"""
+        from django.db.models.functions import TruncMonth
+
+        transactions = Transaction.objects.order_by()
+        rollups = self.all()
+        if user is not None:
+            transactions = transactions.filter(user=user)
+            rollups = rollups.filter(user=user)
+
+        rows = (
+            transactions.annotate(month=TruncMonth('date'))
+            .values('user_id', 'month', 'transaction_type', 'category_id')
+            .annotate(total=models.Sum('amount'), n=models.Count('id'))
+        )
+        rollups.delete()
+        return len(self.bulk_create(
+            (
+                self.model(
+                    user_id=row['user_id'],
+                    month=row['month'],
+                    transaction_type=row['transaction_type'],
+                    category_id=row['category_id'],
+                    amount=row['total'],
+                    count=row['n'],
+                )
+                for row in rows.iterator()
+            ),
+            batch_size=1000,
+        ))
+
+
+class MonthlyRollup(models.Model):
+    """Summed amounts and counts per user, month, type and category"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='monthly_rollups')
+    month = models.DateField(help_text='First day of the month')
+    transaction_type = models.CharField(max_length=10, choices=Transaction.TRANSACTION_TYPES)
+    # A deleted category's buckets are first folded into the uncategorized
+    # ones (move_rollups_to_uncategorized); setting them to NULL instead
+    # would clash with the existing uncategorized buckets
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, null=True, related_name='monthly_rollups')
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+    
+    objects = MonthlyRollupManager()
+    
+    class Meta:
+        ordering = ['month']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'month', 'transaction_type', 'category'],
+                name='unique_monthly_rollup',
+            ),
+            # NULLs are distinct in the constraint above, so uncategorized
+            # buckets need their own
+            models.UniqueConstraint(
+                fields=['user', 'month', 'transaction_type'],
+                condition=models.Q(category__isnull=True),
+                name='unique_uncategorized_monthly_rollup',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'month']),
+        ]
+    
+    def __str__(self):
+        return f"{self.user} {self.month:%b %Y} {self.transaction_type}: {self.amount} ({self.count})"
+
+class SearchToken(models.Model):
+    """Inverted index over transaction descriptions, used when SQLite FTS5 is unavailable"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    transaction = models.ForeignKey(Transaction, on_delete=models.CASCADE, related_name='search_tokens')
+    token = models.CharField(max_length=64)
+    
+    class Meta:
+        unique_together = ('transaction', 'token')
+        indexes = [
+            models.Index(fields=['user', 'token']),
+        ]
+    
+    def __str__(self):
+        return self.token
+
+class SyncTombstoneManager(models.Manager):
+    """Tombstones are written for every deleted row and pruned after a while"""
+
+    def record(self, kind, rows):
+        """Record the deletion of ``rows`` (instances or dicts with ``id`` and ``user_id``)"""
+        now = timezone.now()
+        self.bulk_create(
+            [
+                self.model(
+                    user_id=row['user_id'] if isinstance(row, dict) else row.user_id,
+                    kind=kind,
+                    object_id=row['id'] if isinstance(row, dict) else row.pk,
+                    deleted_at=now,
+                )
+                for row in rows
+            ],
+            batch_size=1000,
+        )
+
+    def prune(self, before):
+        """Delete the tombstones older than ``before``; returns the number removed"""
+        return self.filter(deleted_at__lt=before).delete()[0]
+
+
+class SyncTombstone(models.Model):
+    """Marks a deleted transaction or category for the delta-sync API (see finflow/sync.py)"""
+    KINDS = (
+        ('transaction', 'Transaction'),
+        ('category', 'Category'),
+    )
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    kind = models.CharField(max_length=12, choices=KINDS)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+    
+    objects = SyncTombstoneManager()
+    
+    class Meta:
+        ordering = ['deleted_at']
+        indexes = [
+            models.Index(fields=['user', 'deleted_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} {self.object_id} deleted {self.deleted_at:%Y-%m-%d %H:%M}"
+
+class Budget(models.Model):
+    """Monthly spending limit of an expense category (see finflow/budgets.py)"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='budgets')
+    category = models.OneToOneField(Category, on_delete=models.CASCADE, related_name='budget')
+    amount = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)])
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['category__name']
+    
+    def __str__(self):
+        return f"{self.category.name}: {self.amount} per month"
+
+
+class BudgetAlert(models.Model):
+    """A month in which a budget was exceeded; kept up to date on every transaction write"""
+    budget = models.ForeignKey(Budget, on_delete=models.CASCADE, related_name='alerts')
+    month = models.DateField(help_text='First day of the month')
+    spent = models.DecimalField(max_digits=14, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-month']
+        constraints = [
+            models.UniqueConstraint(fields=['budget', 'month'], name='unique_budget_alert'),
+        ]
+    
+    def __str__(self):
+        return f"{self.budget.category.name} over budget in {self.month:%b %Y}"
+
+def export_upload_to(instance, filename):
+    return f'exports/{instance.user_id}/{filename}'
+
+
+class ExportJobManager(models.Manager):
+    """Finished exports are kept for reuse for a while, then pruned"""
+
+    def prune(self, before):
+        """Delete the jobs finished before ``before`` and their files; returns the number removed"""
+        jobs = self.filter(status__in=('done', 'failed'), finished_at__lt=before)
+        for name in jobs.exclude(file='').values_list('file', flat=True).iterator():
+            self.model.file.field.storage.delete(name)
+        return jobs.delete()[0]
+
+
+class ExportJob(models.Model):
+    """A report export rendered in the background (see finflow/jobs.py)"""
+    FORMATS = (
+        ('csv', 'CSV'),
+        ('xlsx', 'Excel'),
+        ('pdf', 'PDF'),
+    )
+    STATUSES = (
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='export_jobs')
+    format = models.CharField(max_length=4, choices=FORMATS)
+    params = models.JSONField(default=dict, blank=True)
+    fingerprint = models.CharField(max_length=64, help_text='Hash of format, params and the data exported')
+    status = models.CharField(max_length=10, choices=STATUSES, default='pending')
+    rows_total = models.PositiveIntegerField(default=0)
+    rows_done = models.PositiveIntegerField(default=0)
+    file = models.FileField(upload_to=export_upload_to, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Last sign of life of the worker running (or the request queueing) the
+    # job; jobs silent for FINFLOW_EXPORT_STALE_SECONDS are recovered
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    
+    objects = ExportJobManager()
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['status', 'heartbeat_at']),
+            models.Index(fields=['user', 'fingerprint']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_format_display()} export for {self.user} ({self.status})"
+    
+    @property
+    def progress(self):
+        """Completion percentage"""
+        if self.status == 'done':
+            return 100
+        if not self.rows_total:
+            return 0
+        return min(int(self.rows_done * 100 / self.rows_total), 99)
+
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     
     business_name = models.CharField(max_length=20, blank=True)
     business_logo = models.ImageField(upload_to='media/logos/', blank=True, null=True)
+    # Processed variants, {'<size>.<format>': storage name} (see finflow/logos.py)
+    logo_variants = models.JSONField(default=dict, blank=True)
     # current_year = models.DateField()
     
     def __str__(self):
         return f"{self.user.username}'s Profile"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded = instance._tracked_values()
+        return instance
+    
+    def _tracked_values(self):
+        return {
+            'business_name': self.business_name,
+            'business_logo': self.business_logo.name or '',
+            'logo_variants': dict(self.logo_variants or {}),
+        }
+    
+    def set_logo(self, variants):
+        """Point the profile at processed ``variants``; the largest PNG doubles as ``business_logo``"""
+        self.logo_variants = variants
+        largest = max(int(key.split('.')[0]) for key in variants)
+        self.business_logo = variants[f'{largest}.png']
+    
+    def has_changed(self):
+        """True for a new profile, or one whose fields differ from what was loaded"""
+        return self._state.adding or self._tracked_values() != getattr(self, '_loaded', None)
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded = self._tracked_values()
+    
 @receiver(post_save, sender=User)
-def create_or_update_user_profile(sender, instance, created, **kwargs):
+def create_or_update_user_profile(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
     if created:
         Profile.objects.create(user=instance)
-    else:
-        instance.profile.save()
\ No newline at end of file
+        return
+    # Only a profile loaded and changed along with the user is written; a
+    # plain User.save() (such as the last_login update on every login)
+    # neither reads nor writes the profile
+    profile = User.profile.related.get_cached_value(instance, default=None)
+    if profile is not None and profile.has_changed():
+        profile.save()
+
+
+# Keep MonthlyRollup and the running balances in step with single-row
+# transaction writes. Bulk writes bypass signals and go through finflow.bulk.
+
+@receiver(pre_save, sender=Transaction)
+def remember_previous_transaction(sender, instance, raw=False, **kwargs):
+    instance._rollup_previous = None
+    if instance.pk and not raw:
+        instance._rollup_previous = sender.objects.filter(pk=instance.pk).values(
+            'user_id', 'date', 'transaction_type', 'category_id', 'amount'
+        ).first()
+
+
+@receiver(post_save, sender=Transaction)
+def update_rollup_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_rollup_previous', None)
+    if previous:
+        MonthlyRollup.objects.add_transactions([previous], sign=-1)
+    MonthlyRollup.objects.add_transactions([instance])
+
+
+@receiver(post_save, sender=Transaction)
+def update_running_balances_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    from . import balances
+    previous = getattr(instance, '_rollup_previous', None)
+    if previous:
+        balances.changed(instance, previous)
+    elif created:
+        balances.inserted(instance)
+
+
+def deleted_with_user(origin):
+    """True when a delete cascades from deleting the user, whose derived rows go with it"""
+    model = origin.model if isinstance(origin, models.QuerySet) else type(origin)
+    return issubclass(model, User)
+
+
+def deleted_in_bulk(origin):
+    """True for ``TransactionQuerySet.bulk_delete()``, whose caller does the bookkeeping itself"""
+    return getattr(origin, 'bulk', False)
+
+
+@receiver(post_delete, sender=Transaction)
+def update_rollup_on_delete(sender, instance, origin=None, **kwargs):
+    if deleted_with_user(origin) or deleted_in_bulk(origin):
+        return
+    MonthlyRollup.objects.add_transactions([instance], sign=-1)
+
+
+@receiver(post_delete, sender=Transaction)
+def update_running_balances_on_delete(sender, instance, origin=None, **kwargs):
+    if deleted_with_user(origin) or deleted_in_bulk(origin):
+        return
+    from . import balances
+    balances.removed(instance)
+
+
+@receiver(pre_delete, sender=Category)
+def move_rollups_to_uncategorized(sender, instance, origin=None, **kwargs):
+    """Mirror Transaction.category's SET_NULL: fold the category's buckets into the uncategorized ones"""
+    if deleted_with_user(origin):
+        return
+    rows = MonthlyRollup.objects.filter(category=instance)
+    for row in rows:
+        MonthlyRollup.objects.add(row.user_id, row.month, row.transaction_type, None, row.amount, row.count)
+    rows.delete()
+
+
+@receiver(pre_delete, sender=Category)
+def touch_transactions_of_deleted_category(sender, instance, origin=None, **kwargs):
+    """SET_NULL doesn't touch updated_at, so do it here for the delta-sync API"""
+    if deleted_with_user(origin):
+        return
+    instance.transactions.update(updated_at=timezone.now())
+
+
+
+# Any transaction or category write invalidates the user's cached dashboard
+# and reports contexts. The bump waits for commit so a concurrent reader
+# cannot cache pre-commit data under the new version.
+
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Budget)
+@receiver(post_delete, sender=Budget)
+def invalidate_cached_contexts(sender, instance, origin=None, **kwargs):
+    if deleted_in_bulk(origin):
+        return
+    user_id = instance.user_id
+    db_transaction.on_commit(lambda: bump_data_version(user_id))
+
+
+
+# Keep the description search index in step with single-row writes.
+# Bulk writes call finflow.search.index_transactions() themselves.
+
+@receiver(post_save, sender=Transaction)
+def update_search_index_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    from . import search
+    search.index_transactions([instance])
+
+
+@receiver(post_delete, sender=Transaction)
+def update_search_index_on_delete(sender, instance, origin=None, **kwargs):
+    if deleted_in_bulk(origin):
+        return
+    from . import search
+    search.remove_transactions([instance.pk])
+
+
+
+# Deletes leave a tombstone so the delta-sync API can report them.
+# Bulk deletes record theirs in finflow.bulk.transactions_deleted().
+
+@receiver(post_delete, sender=Transaction)
+def record_transaction_tombstone(sender, instance, origin=None, **kwargs):
+    if deleted_with_user(origin) or deleted_in_bulk(origin):
+        return
+    SyncTombstone.objects.record('transaction', [instance])
+
+
+@receiver(post_delete, sender=Category)
+def record_category_tombstone(sender, instance, origin=None, **kwargs):
+    if deleted_with_user(origin):
+        return
+    SyncTombstone.objects.record('category', [instance])
@@ -0,0 +1,214 @@
+import tempfile
+from datetime import datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import models
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+
+from .exports import SPOOL_MAX_SIZE, export_queryset, export_rows
+
+
+FONT = 'Helvetica'
+FONT_BOLD = 'Helvetica-Bold'
+FONT_SIZE = 9
+ROW_HEIGHT = 14
+MARGIN = 40
+# Vertical space taken by the page header (title, period, column titles),
+# the first-page P&L summary block and the page footer
+HEADER_HEIGHT = 48
+SUMMARY_HEIGHT = 76
+FOOTER_HEIGHT = 26
+
+# (title, width in points, alignment)
+COLUMNS = (
+    ('Date', 62, 'left'),
+    ('Description', 220, 'left'),
+    ('Category', 110, 'left'),
+    ('Type', 50, 'left'),
+    ('Amount', 90, 'right'),
+)
+
+
+def fit_text(text, width, font=FONT, size=FONT_SIZE):
+    """Truncate ``text`` with an ellipsis so it fits in ``width`` points"""
+    text = str(text)
+    if stringWidth(text, font, size) <= width:
+        return text
+    ellipsis = '...'
+    budget = width - stringWidth(ellipsis, font, size)
+    # Start from a cheap estimate instead of trimming one character at a time
+    cut = max(int(len(text) * budget / stringWidth(text, font, size)), 0)
+    while cut > 0 and stringWidth(text[:cut], font, size) > budget:
+        cut -= 1
+    return text[:cut].rstrip() + ellipsis
+
+
+def money(amount):
+    return f'Ksh {amount:,.2f}'
+
+
+class ReportTooLarge(ValueError):
+    """The report has more rows than a PDF report may hold"""
+
+
+class PdfReport:
+    """
+    Paginated, fixed-column transaction report.
+
+    Rows are pulled from ``export_rows`` in chunks and drawn straight onto
+    the page, so no list of transactions or model instances is built.
+    reportlab's ``Canvas`` still keeps every finished page's content
+    stream until ``save()`` (roughly 20 KB per full page), so reports of
+    more than ``FINFLOW_PDF_MAX_ROWS`` rows are refused with
+    ``ReportTooLarge``, which bounds that memory (about 9 MB at the
+    default). Every page gets the same column header, a fixed maximum
+    number of rows and a footer with that page's income/expense subtotals;
+    the last page closes with the report totals.
+    """
+
+    def __init__(self, user, start=None, end=None, category=None, pagesize=letter):
+        self.user = user
+        self.filters = {'start': start, 'end': end, 'category_id': category.id if category else None}
+        self.category = category
+        self.width, self.height = pagesize
+        self.pagesize = pagesize
+        body_top = self.height - MARGIN - HEADER_HEIGHT
+        body_bottom = MARGIN + FOOTER_HEIGHT
+        self.rows_per_page = int((body_top - body_bottom) // ROW_HEIGHT) + 1
+        self.first_page_rows = int((body_top - SUMMARY_HEIGHT - body_bottom) // ROW_HEIGHT) + 1
+
+    def page_count(self, rows):
+        if rows <= self.first_page_rows:
+            return 1
+        rest = rows - self.first_page_rows
+        return 1 + (rest + self.rows_per_page - 1) // self.rows_per_page
+
+    def totals(self):
+        """Income/expense totals and counts for the filtered rows in one query"""
+        totals = export_queryset(self.user, **self.filters).aggregate(
+            income=models.Sum('amount', filter=models.Q(transaction_type='income')),
+            expenses=models.Sum('amount', filter=models.Q(transaction_type='expense')),
+            rows=models.Count('id'),
+        )
+        totals['income'] = totals['income'] or Decimal('0')
+        totals['expenses'] = totals['expenses'] or Decimal('0')
+        return totals
+
+    def render(self, output, progress=None):
+        """Write the report to the binary file object ``output``"""
+        totals = self.totals()
+        max_rows = getattr(settings, 'FINFLOW_PDF_MAX_ROWS', 20000)
+        if max_rows and totals['rows'] > max_rows:
+            raise ReportTooLarge(
+                f"{totals['rows']:,} transactions are more than a PDF report can hold ({max_rows:,}); "
+                f"narrow the period or category, or export CSV or Excel instead."
+            )
+        pages = self.page_count(totals['rows'])
+
+        p = canvas.Canvas(output, pagesize=self.pagesize, pageCompression=1)
+        p.setTitle('FinFlow - Financial Report')
+
+        page = 1
+        y = self._start_page(p, page, pages, totals)
+        capacity = self.first_page_rows
+        rows_on_page = 0
+        page_income = page_expenses = Decimal('0')
+
+        for row in export_rows(self.user, progress=progress, **self.filters):
+            if rows_on_page == capacity:
+                self._end_page(p, page, pages, page_income, page_expenses)
+                p.showPage()
+                page += 1
+                y = self._start_page(p, page, pages)
+                capacity = self.rows_per_page
+                rows_on_page = 0
+                page_income = page_expenses = Decimal('0')
+
+            if row[3] == 'Income':
+                page_income += row[4]
+            else:
+                page_expenses += row[4]
+            self._draw_row(p, y, [row[0].isoformat(), row[1], row[2], row[3], money(row[4])])
+            y -= ROW_HEIGHT
+            rows_on_page += 1
+
+        if not totals['rows']:
+            p.setFont(FONT, FONT_SIZE)
+            p.drawString(MARGIN, y, 'No transactions in this period.')
+
+        self._end_page(p, page, pages, page_income, page_expenses, totals)
+        p.save()
+
+    def _start_page(self, p, page, pages, totals=None):
+        y = self.height - MARGIN
+        p.setFont(FONT_BOLD, 16)
+        p.drawString(MARGIN, y, 'FinFlow - Financial Report')
+        p.setFont(FONT, FONT_SIZE)
+        p.drawRightString(self.width - MARGIN, y, f'Page {page} of {pages}')
+        y -= 18
+
+        period = f"{self.filters['start'] or 'Beginning'} to {self.filters['end'] or datetime.now().date()}"
+        if self.category:
+            period += f' | Category: {self.category.name}'
+        p.drawString(MARGIN, y, fit_text(period, self.width - 2 * MARGIN))
+        y -= 14
+
+        if totals is not None:
+            # Summary block, first page only
+            y -= 6
+            net = totals['income'] - totals['expenses']
+            p.setFont(FONT_BOLD, 10)
+            p.drawString(MARGIN, y, 'Profit & Loss Statement')
+            p.setFont(FONT, FONT_SIZE)
+            y -= 14
+            for label, value in (
+                ('Total Income', money(totals['income'])),
+                ('Total Expenses', money(totals['expenses'])),
+                ('Net Profit', money(net)),
+                ('Transactions', f"{totals['rows']:,}"),
+            ):
+                p.drawString(MARGIN, y, label)
+                p.drawRightString(MARGIN + 200, y, value)
+                y -= 12
+            y -= 8
+
+        p.setFont(FONT_BOLD, FONT_SIZE)
+        self._draw_row(p, y, [title for title, _, _ in COLUMNS], font=FONT_BOLD)
+        y -= 4
+        p.line(MARGIN, y, self.width - MARGIN, y)
+        p.setFont(FONT, FONT_SIZE)
+        return y - ROW_HEIGHT + 2
+
+    def _draw_row(self, p, y, values, font=FONT):
+        x = MARGIN
+        for value, (_, width, align) in zip(values, COLUMNS):
+            text = fit_text(value, width - 6, font)
+            if align == 'right':
+                p.drawRightString(x + width, y, text)
+            else:
+                p.drawString(x, y, text)
+            x += width
+
+    def _end_page(self, p, page, pages, page_income, page_expenses, totals=None):
+        y = MARGIN + 12
+        p.line(MARGIN, y + 10, self.width - MARGIN, y + 10)
+        p.setFont(FONT, FONT_SIZE)
+        p.drawString(MARGIN, y, f'Page income: {money(page_income)}')
+        p.drawString(MARGIN + 180, y, f'Page expenses: {money(page_expenses)}')
+        if totals is not None:
+            p.setFont(FONT_BOLD, FONT_SIZE)
+            net = totals['income'] - totals['expenses']
+            p.drawRightString(self.width - MARGIN, y, f'Net profit: {money(net)}')
+        p.setFont(FONT, 7)
+        p.drawString(MARGIN, MARGIN - 6, f'Generated: {datetime.now().strftime("%Y-%m-%d %H:%M")}')
+
+
+def pdf_report_file(user, progress=None, **options):
+    """Render a ``PdfReport`` to a spooled temp file positioned at 0"""
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    PdfReport(user, **options).render(output, progress=progress)
+    output.seek(0)
+    return output
@@ -0,0 +1,143 @@
+"""
+Calendar periods for reports.
+
+``buckets()`` splits a date range into exact day, week, month, quarter or
+year buckets (weeks start on Monday), and ``period_totals()`` fills them
+with income and expense totals from one grouped query, zero-filling the
+buckets without transactions. Ranges made of whole months are read from
+the monthly rollups when the buckets are months or longer, so the cost of a
+report grows with the number of buckets, not with the number of
+transactions.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import models
+from django.db.models.functions import Trunc
+
+from .aggregation import add_months, month_end, month_start
+from .models import MonthlyRollup, Transaction
+
+
+GRANULARITIES = (
+    ('day', 'Daily'),
+    ('week', 'Weekly'),
+    ('month', 'Monthly'),
+    ('quarter', 'Quarterly'),
+    ('year', 'Yearly'),
+)
+MONTHS_PER_BUCKET = {'month': 1, 'quarter': 3, 'year': 12}
+# Upper bound on the buckets of one report (about four years of days)
+MAX_BUCKETS = 1500
+
+
+def bucket_start(day, granularity):
+    """First day of the bucket containing ``day``"""
+    if granularity == 'day':
+        return day
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return month_start(day)
+    if granularity == 'quarter':
+        return month_start(day).replace(month=(day.month - 1) // 3 * 3 + 1)
+    if granularity == 'year':
+        return day.replace(month=1, day=1)
+    raise ValueError(f'Unknown granularity "{granularity}".')
+
+
+def next_bucket(start, granularity):
+    """First day of the bucket after the one starting on ``start``"""
+    if granularity == 'day':
+        return start + timedelta(days=1)
+    if granularity == 'week':
+        return start + timedelta(weeks=1)
+    return add_months(start, MONTHS_PER_BUCKET[granularity])
+
+
+def label(start, granularity):
+    if granularity == 'day':
+        return start.strftime('%d %b %Y')
+    if granularity == 'week':
+        return start.strftime('Week of %d %b %Y')
+    if granularity == 'month':
+        return start.strftime('%b %Y')
+    if granularity == 'quarter':
+        return f'Q{(start.month - 1) // 3 + 1} {start.year}'
+    return str(start.year)
+
+
+def buckets(start, end, granularity):
+    """
+    The ``(start, end)`` of every bucket between ``start`` and ``end``.
+
+    The first and last buckets are clipped to the range, so they may be
+    partial. Raises ``ValueError`` for an unknown granularity, an empty
+    range, or more than ``MAX_BUCKETS`` buckets.
+    """
+    if end < start:
+        raise ValueError('The end date is before the start date.')
+
+    result = []
+    current = bucket_start(start, granularity)
+    while current <= end:
+        following = next_bucket(current, granularity)
+        result.append((max(current, start), min(following - timedelta(days=1), end)))
+        if len(result) > MAX_BUCKETS:
+            raise ValueError(f'The range has more than {MAX_BUCKETS} {granularity} buckets; pick a longer period.')
+        current = following
+    return result
+
+
+def _grouped_totals(user, start, end, granularity):
+    """``{(bucket_start, transaction_type): total}`` from one grouped query"""
+    if granularity in MONTHS_PER_BUCKET and start == month_start(start) and end == month_end(end):
+        rows = (
+            MonthlyRollup.objects.filter(user=user, month__gte=start, month__lte=end)
+            .order_by()
+            .values('month', 'transaction_type')
+            .annotate(total=models.Sum('amount'))
+        )
+        bucket_field = 'month'
+    else:
+        rows = (
+            Transaction.objects.filter(user=user, date__gte=start, date__lte=end)
+            .order_by()
+            .annotate(bucket=Trunc('date', granularity, output_field=models.DateField()))
+            .values('bucket', 'transaction_type')
+            .annotate(total=models.Sum('amount'))
+        )
+        bucket_field = 'bucket'
+
+    totals = {}
+    for row in rows:
+        key = (bucket_start(row[bucket_field], granularity), row['transaction_type'])
+        totals[key] = totals.get(key, Decimal('0')) + row['total']
+    return totals
+
+
+def period_totals(user, start, end, granularity='month'):
+    """
+    Income, expenses and net profit per bucket of ``granularity``.
+
+    Returns a list of dicts with the bucket ``start``/``end`` (clipped to the
+    range), its ``label``, ``income``, ``expenses`` and ``net_profit``,
+    oldest first, with a zero entry for every bucket without transactions.
+    """
+    spans = buckets(start, end, granularity)
+    totals = _grouped_totals(user, start, end, granularity)
+
+    periods = []
+    for span_start, span_end in spans:
+        key = bucket_start(span_start, granularity)
+        income = totals.get((key, 'income'), Decimal('0'))
+        expenses = totals.get((key, 'expense'), Decimal('0'))
+        periods.append({
+            'start': span_start,
+            'end': span_end,
+            'label': label(key, granularity),
+            'income': income,
+            'expenses': expenses,
+            'net_profit': income - expenses,
+        })
+    return periods
@@ -0,0 +1,118 @@
+"""
+Materialization of recurring transactions.
+
+Every ``RecurringTransaction`` keeps ``next_date``, its first occurrence not
+yet turned into a ``Transaction``. ``materialize_due()`` repeatedly takes a
+batch of active rules that are due (one query on the partial
+``(next_date, id)`` index), creates all their occurrences up to today with
+one ``bulk_create``, and moves their ``next_date`` forward in the same
+database transaction. A batch is committed
+completely or not at all, so running it twice creates nothing twice, and an
+interrupted run simply continues with the rules that are still due.
+"""
+import calendar
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import bulk
+from .aggregation import add_months, month_start
+from .models import MonthlyRollup, RecurringTransaction, Transaction
+
+
+MONTHS = {'monthly': 1, 'quarterly': 3, 'yearly': 12}
+DAYS = {'daily': 1, 'weekly': 7}
+# Occurrences created per rule and batch; a rule that is further behind
+# (a daily rule started years ago) stays due and is finished by later batches
+MAX_OCCURRENCES = 400
+
+
+def following(rule, day):
+    """The occurrence of ``rule`` after ``day``"""
+    interval = max(rule.interval, 1)
+    if rule.frequency in DAYS:
+        return day + timedelta(days=DAYS[rule.frequency] * interval)
+    # Month-based rules stay on the day of month they started on, clamped to
+    # shorter months (Jan 31, Feb 28, Mar 31, ...)
+    month = add_months(month_start(day), MONTHS[rule.frequency] * interval)
+    last_day = calendar.monthrange(month.year, month.month)[1]
+    return month.replace(day=min(rule.start_date.day, last_day))
+
+
+def due_occurrences(rule, today):
+    """The dates to materialize for ``rule`` up to ``today``, and its new ``next_date``"""
+    dates = []
+    day = rule.next_date
+    while day <= today and (rule.end_date is None or day <= rule.end_date) and len(dates) < MAX_OCCURRENCES:
+        dates.append(day)
+        day = following(rule, day)
+    return dates, day
+
+
+def materialize_batch(rules, today):
+    """Create the due occurrences of ``rules``; returns the number of transactions created"""
+    new, now = [], timezone.now()
+    for rule in rules:
+        dates, rule.next_date = due_occurrences(rule, today)
+        if rule.end_date is not None and rule.next_date > rule.end_date:
+            rule.active = False
+        new.extend(
+            Transaction(
+                user_id=rule.user_id,
+                date=day,
+                description=rule.description,
+                category_id=rule.category_id,
+                transaction_type=rule.transaction_type,
+                amount=rule.amount,
+                recurring=rule,
+            )
+            for day in dates
+        )
+
+    created = Transaction.objects.bulk_create(new, batch_size=1000)
+    rollup_deltas = {}
+    bulk.transactions_created(created, rollup_deltas=rollup_deltas)
+    MonthlyRollup.objects.apply(rollup_deltas)
+    # Rules mostly move to the same few dates, so one UPDATE per (date, active)
+    # is far cheaper than bulk_update()'s per-row CASE expressions
+    groups = {}
+    for rule in rules:
+        groups.setdefault((rule.next_date, rule.active), []).append(rule.pk)
+    for (next_date, active), pks in groups.items():
+        for i in range(0, len(pks), 1000):
+            RecurringTransaction.objects.filter(pk__in=pks[i:i + 1000]).update(
+                next_date=next_date, active=active, updated_at=now,
+            )
+    return len(created)
+
+
+def materialize_due(today=None, batch_size=None, progress=None):
+    """
+    Materialize every due occurrence of every user's active rules.
+
+    Returns ``{'rules': ..., 'transactions': ..., 'batches': ...}``;
+    ``progress`` is called with the running totals after each batch.
+    """
+    today = today or date.today()
+    batch_size = batch_size or getattr(settings, 'FINFLOW_RECURRING_BATCH_SIZE', 1000)
+    totals = {'rules': 0, 'transactions': 0, 'batches': 0}
+
+    while True:
+        with transaction.atomic():
+            # Rows locked by a concurrent run are skipped rather than doubled
+            rules = list(
+                RecurringTransaction.objects.select_for_update(skip_locked=True)
+                .filter(active=True, next_date__lte=today)
+                .order_by('next_date', 'id')[:batch_size]
+            )
+            if not rules:
+                break
+            totals['transactions'] += materialize_batch(rules, today)
+        totals['rules'] += len(rules)
+        totals['batches'] += 1
+        if progress:
+            progress(totals)
+
+    return totals
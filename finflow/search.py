@@ -0,0 +1,192 @@
+"""
+Indexed search over transaction descriptions.
+
+On SQLite builds with FTS5 the index is the ``finflow_transaction_fts``
+virtual table (migrations 0006 and 0017); everywhere else it is the
+``SearchToken`` inverted-index table. Both are scoped per user: the FTS5
+table indexes the owner as the term ``u<id>`` in its ``user_id`` column,
+and every MATCH requires it, so a search only ranks the user's own rows. Both support prefix matching of every
+query term (AND semantics) and relevance ranking, and are kept in sync by
+the Transaction signals in ``finflow/models.py``.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Case, Count, IntegerField, Q, Sum, Value, When
+from django.db.models.expressions import RawSQL
+
+from .models import SearchToken, Transaction
+
+
+FTS_TABLE = 'finflow_transaction_fts'
+MAX_TOKEN_LENGTH = SearchToken._meta.get_field('token').max_length
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+_fts_available = {}
+
+
+def tokenize(text):
+    """Lower-cased word tokens of ``text``, de-duplicated, in order"""
+    tokens = []
+    for token in _TOKEN_RE.findall((text or '').lower()):
+        token = token[:MAX_TOKEN_LENGTH]
+        if token not in tokens:
+            tokens.append(token)
+    return tokens
+
+
+def fts5_enabled():
+    """Whether the FTS5 index table exists on the current database"""
+    key = (connection.alias, str(connection.settings_dict['NAME']))
+    if key not in _fts_available:
+        if connection.vendor != 'sqlite':
+            _fts_available[key] = False
+        else:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE]
+                )
+                _fts_available[key] = cursor.fetchone() is not None
+    return _fts_available[key]
+
+
+def _user_term(user_id):
+    return f'u{user_id}'
+
+
+def _fts_query(tokens, user_id):
+    # Every term is quoted (so user input can't inject FTS syntax) and
+    # prefix-matched against the description; space-separated terms are
+    # ANDed by FTS5, and so is the owner's term in the user_id column.
+    terms = ' '.join('"{}"*'.format(token.replace('"', '""')) for token in tokens)
+    return f'user_id : "{_user_term(user_id)}" AND description : ({terms})'
+
+
+def _token_range(token):
+    # A range rather than LIKE 'x%' so the (user, token) index is usable
+    # on every backend regardless of collation.
+    return Q(token__gte=token, token__lt=token + '\uffff')
+
+
+# -----------------------------
+# INDEX MAINTENANCE
+# -----------------------------
+
+def index_transactions(transactions, replace=True):
+    """(Re)index the descriptions of ``transactions``; ``replace=False`` for new rows"""
+    transactions = list(transactions)
+    if not transactions:
+        return
+    if replace:
+        remove_transactions([t.pk for t in transactions])
+
+    if fts5_enabled():
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, description, user_id) VALUES (%s, %s, %s)',
+                [(t.pk, t.description, _user_term(t.user_id)) for t in transactions],
+            )
+        return
+
+    SearchToken.objects.bulk_create(
+        [
+            SearchToken(user_id=t.user_id, transaction_id=t.pk, token=token)
+            for t in transactions
+            for token in tokenize(t.description)
+        ],
+        batch_size=1000,
+    )
+
+
+def remove_transactions(pks):
+    """Drop the index entries of the given transaction ids"""
+    pks = list(pks)
+    if not pks:
+        return
+    if fts5_enabled():
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(pk,) for pk in pks])
+    else:
+        SearchToken.objects.filter(transaction_id__in=pks).delete()
+
+
+def rebuild_index(user=None):
+    """Re-index every transaction (or every transaction of ``user``)"""
+    transactions = Transaction.objects.order_by().only('id', 'user_id', 'description')
+    if user is not None:
+        transactions = transactions.filter(user=user)
+
+    batch = []
+    for t in transactions.iterator(chunk_size=2000):
+        batch.append(t)
+        if len(batch) >= 2000:
+            index_transactions(batch)
+            batch = []
+    index_transactions(batch)
+
+
+# -----------------------------
+# QUERIES
+# -----------------------------
+
+def filter_transactions(queryset, user, query):
+    """
+    Restrict ``queryset`` to transactions of ``user`` matching ``query``.
+
+    The original ordering of ``queryset`` is kept, so this composes with the
+    keyset pagination of the transactions page.
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return queryset.filter(description__icontains=query)
+
+    if fts5_enabled():
+        return queryset.filter(id__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            [_fts_query(tokens, user.id)],
+        ))
+
+    for token in tokens:
+        queryset = queryset.filter(id__in=SearchToken.objects.filter(
+            _token_range(token), user=user,
+        ).values('transaction_id'))
+    return queryset
+
+
+def search_transactions(user, query, limit=20):
+    """
+    Best matches for ``query`` among the transactions of ``user``.
+
+    FTS5 ranks by bm25; the token index ranks exact word matches above
+    prefix-only matches, newest first within the same score.
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return []
+
+    if fts5_enabled():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s ORDER BY rank LIMIT %s',
+                [_fts_query(tokens, user.id), limit],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+    else:
+        candidates = filter_transactions(Transaction.objects.filter(user=user), user, query)
+        any_token = Q()
+        for token in tokens:
+            any_token |= _token_range(token)
+        ids = list(
+            SearchToken.objects.filter(user=user, transaction__in=candidates)
+            .filter(any_token)
+            .values('transaction_id')
+            .annotate(
+                exact=Sum(Case(When(token__in=tokens, then=Value(1)), default=Value(0), output_field=IntegerField())),
+                matched=Count('id'),
+            )
+            .order_by('-exact', '-matched', '-transaction__date', '-transaction_id')
+            .values_list('transaction_id', flat=True)[:limit]
+        )
+
+    by_id = Transaction.objects.select_related('category').in_bulk(ids)
+    return [by_id[pk] for pk in ids if pk in by_id]
@@ -0,0 +1,141 @@
+"""
+Delta sync of transactions and categories.
+
+A client keeps the opaque token returned by the last sync and sends it back;
+the response only holds the transactions and categories created or updated
+after it (``updated_at``) and the ids deleted after it (``SyncTombstone``).
+Without a token the whole dataset is returned, page by page.
+
+Transactions are paged on ``(updated_at, id)``, so a token may also point
+into the middle of a burst of changes (``has_more``). A complete sync moves
+the token to the current time; the next one starts ``FINFLOW_SYNC_OVERLAP``
+seconds earlier so rows whose database transaction committed late are not
+missed. Rows may therefore be sent twice and clients should upsert by id.
+"""
+import base64
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Category, SyncTombstone, Transaction
+
+
+def page_size():
+    return getattr(settings, 'FINFLOW_SYNC_PAGE_SIZE', 500)
+
+
+def overlap():
+    return timedelta(seconds=getattr(settings, 'FINFLOW_SYNC_OVERLAP', 5))
+
+
+def tombstone_retention():
+    return timedelta(days=getattr(settings, 'FINFLOW_SYNC_TOMBSTONE_DAYS', 90))
+
+
+def encode_token(since, last_id=None):
+    """Opaque sync token for position ``since`` (and ``last_id`` mid-page)"""
+    raw = f'{since.isoformat()}|{last_id or ""}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_token(token):
+    """Return ``(since, last_id)``; raises ``ValueError`` for an invalid token"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        since, last_id = raw.split('|')
+        since = datetime.fromisoformat(since)
+        last_id = int(last_id) if last_id else None
+        # Tokens we issue are aware and carry a positive id; anything else
+        # would fail later, compared with updated_at or bound as a parameter
+        if timezone.is_naive(since) or (last_id is not None and not 0 < last_id < 2 ** 63):
+            raise ValueError
+        since = since.astimezone(dt_timezone.utc)
+    except (ValueError, UnicodeDecodeError, OverflowError):
+        raise ValueError('Invalid sync token.')
+    return since, last_id
+
+
+def serialize_transaction(t):
+    return {
+        'id': t.pk,
+        'date': t.date.isoformat(),
+        'description': t.description,
+        'category': t.category_id,
+        'type': t.transaction_type,
+        'amount': str(t.amount),
+        'created_at': t.created_at.isoformat(),
+        'updated_at': t.updated_at.isoformat(),
+    }
+
+
+def serialize_category(category):
+    return {
+        'id': category.pk,
+        'name': category.name,
+        'type': category.category_type,
+        'updated_at': category.updated_at.isoformat(),
+    }
+
+
+def changes_since(user, token=None, limit=None):
+    """
+    Everything that changed for ``user`` after ``token``.
+
+    Returns a dict with the changed ``transactions`` and ``categories``, the
+    ``deleted`` ids per kind, ``has_more`` when another page is waiting, the
+    next ``token`` and ``reset``. ``reset`` is true for a full sync, which is
+    also what a token older than the tombstone retention gets, so the client
+    knows to replace its local copy instead of merging into it.
+    """
+    limit = limit or page_size()
+    now = timezone.now()
+
+    since, last_id = decode_token(token) if token else (None, None)
+    reset = since is None
+    if since is not None and since < now - tombstone_retention():
+        # The tombstones of that period may be gone, start over
+        since, last_id, reset = None, None, True
+    if since is not None and last_id is None:
+        since -= overlap()
+
+    transactions = Transaction.objects.filter(user=user).order_by('updated_at', 'id')
+    categories = Category.objects.filter(user=user).order_by('updated_at', 'id')
+    tombstones = SyncTombstone.objects.filter(user=user)
+    if since is not None:
+        if last_id is not None:
+            transactions = transactions.filter(Q(updated_at__gt=since) | Q(updated_at=since, id__gt=last_id))
+        else:
+            transactions = transactions.filter(updated_at__gt=since)
+        categories = categories.filter(updated_at__gt=since)
+        tombstones = tombstones.filter(deleted_at__gt=since)
+    else:
+        tombstones = tombstones.none()
+
+    rows = list(transactions[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    if has_more:
+        # Categories and deletes are sent up to where this page of
+        # transactions stops; the rest follows with the next page
+        until = rows[-1].updated_at
+        categories = categories.filter(updated_at__lte=until)
+        tombstones = tombstones.filter(deleted_at__lte=until)
+        next_token = encode_token(until, rows[-1].pk)
+    else:
+        next_token = encode_token(now)
+
+    deleted = {'transactions': [], 'categories': []}
+    for kind, object_id in tombstones.values_list('kind', 'object_id'):
+        deleted['transactions' if kind == 'transaction' else 'categories'].append(object_id)
+
+    return {
+        'transactions': [serialize_transaction(t) for t in rows],
+        'categories': [serialize_category(c) for c in categories],
+        'deleted': deleted,
+        'has_more': has_more,
+        'reset': reset,
+        'token': next_token,
+    }
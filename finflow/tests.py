@@ -1,3 +1,1352 @@
-from django.test import TestCase
+import base64
+import csv
+import io
+import json
+import re
+import shutil
+import tempfile
+import time
+from datetime import date, timedelta
+from unittest import mock
+from decimal import Decimal
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+import numpy as np
+from openpyxl import load_workbook
+from PIL import Image
+
+from . import db, instrumentation, logos
+from .aggregation import category_breakdown, financial_summary
+from .analytics import NO_CATEGORY, daily_totals, forecast, rolling_mean, to_arrays, trend_slopes
+from .backends import ProfileBackend
+from .balances import balance_at, rebuild
+from .benchmarks import query_growth, run
+from .budgets import utilization
+from .cache import cached_context
+from .context_processors import branding
+from .exports import csv_report_lines
+from .importers import ImportFileError, import_transactions
+from .jobs import claim_pending, request_export, run_job
+from .models import (
+    Budget, BudgetAlert, Category, ExportJob, MonthlyRollup, Profile, RecurringTransaction, SyncTombstone, Transaction,
+)
+from .pagination import ORDERING, _after, _before, decode_cursor, encode_cursor, paginate_transactions
+from .pdf_reports import PdfReport, ReportTooLarge
+from .periods import buckets, period_totals
+from .recurring import materialize_due
+from .search import FTS_TABLE, _fts_query, filter_transactions, fts5_enabled, search_transactions
+from .synthetic import generate
+from .sync import changes_since, decode_token
+
+
+def rollups_match(user):
+    """True when the user's rollup rows equal a fresh grouping of their transactions"""
+    expected = {
+        (row['month'], row['transaction_type'], row['category_id']): (row['total'], row['n'])
+        for row in Transaction.objects.filter(user=user).order_by()
+        .annotate(month=TruncMonth('date'))
+        .values('month', 'transaction_type', 'category_id')
+        .annotate(total=Sum('amount'), n=Count('id'))
+    }
+    stored = {
+        (row.month, row.transaction_type, row.category_id): (row.amount, row.count)
+        for row in MonthlyRollup.objects.filter(user=user)
+    }
+    return expected == stored
+
+
+def use_temporary_media(testcase):
+    """Point MEDIA_ROOT at a fresh directory until ``testcase`` ends"""
+    media = tempfile.mkdtemp()
+    testcase.addCleanup(shutil.rmtree, media, ignore_errors=True)
+    media_override = override_settings(MEDIA_ROOT=media)
+    media_override.enable()
+    testcase.addCleanup(media_override.disable)
+
+
+class QueryCountTests(TestCase):
+    """Pages must not issue more queries for users with more transactions"""
+
+    def test_query_counts_do_not_grow_with_rows(self):
+        report = run([20, 400], repeat=1)
+        for view, entries in report['results'].items():
+            for entry in entries:
+                self.assertEqual(entry['status'], 200, f'{view} at {entry["rows"]} rows')
+        self.assertEqual(query_growth(report), [])
+
+
+class RollupTests(TestCase):
+    """MonthlyRollup follows single-row transaction and category writes"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('roller')
+        self.rent = Category.objects.create(user=self.user, name='Rent', category_type='expense')
+        self.food = Category.objects.create(user=self.user, name='Food', category_type='expense')
+
+    def add(self, day, amount, category=None, transaction_type='expense'):
+        return Transaction.objects.create(
+            user=self.user, date=day, description='Row', category=category,
+            transaction_type=transaction_type, amount=Decimal(amount),
+        )
+
+    def test_rollups_follow_writes(self):
+        first = self.add(date(2026, 1, 5), '100', self.rent)
+        self.add(date(2026, 1, 9), '40', self.rent)
+        self.add(date(2026, 2, 1), '7', transaction_type='income')
+        self.assertTrue(rollups_match(self.user))
+
+        first.date, first.category, first.amount = date(2026, 3, 2), self.food, Decimal('55')
+        first.save()
+        self.assertTrue(rollups_match(self.user))
+
+        first.delete()
+        self.assertTrue(rollups_match(self.user))
+
+    def test_deleted_category_folds_into_uncategorized(self):
+        self.add(date(2026, 1, 5), '100', self.rent)
+        self.add(date(2026, 1, 6), '30')
+        self.rent.delete()
+        self.assertTrue(rollups_match(self.user))
+        self.assertEqual(MonthlyRollup.objects.filter(user=self.user, category__isnull=True).count(), 1)
+
+    def test_deleting_the_user_removes_everything(self):
+        self.add(date(2026, 1, 5), '100', self.rent)
+        self.add(date(2026, 1, 6), '30')
+        self.user.delete()
+        self.assertFalse(MonthlyRollup.objects.exists())
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_one_uncategorized_bucket_per_month_and_type(self):
+        self.add(date(2026, 1, 6), '30')
+        with self.assertRaises(IntegrityError):
+            MonthlyRollup.objects.create(
+                user=self.user, month=date(2026, 1, 1), transaction_type='expense', amount=1, count=1,
+            )
+
+
+class FinancialSummaryTests(TestCase):
+    """Dashboard and reports totals come from one rollup query and match the transactions"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('summarized')
+        for day, transaction_type, amount in [
+            (date(2025, 6, 1), 'income', '1000'),
+            (date(2026, 2, 3), 'income', '200'),
+            (date(2026, 2, 9), 'expense', '50'),
+            (date(2026, 4, 2), 'income', '300'),
+            (date(2026, 4, 20), 'expense', '100'),
+        ]:
+            Transaction.objects.create(
+                user=self.user, date=day, description='Row', transaction_type=transaction_type, amount=Decimal(amount),
+            )
+
+    def test_summary(self):
+        with self.assertNumQueries(1):
+            summary = financial_summary(self.user, months=3, today=date(2026, 4, 25))
+        expected = {
+            row['transaction_type']: row['total']
+            for row in Transaction.objects.filter(user=self.user).order_by()
+            .values('transaction_type').annotate(total=Sum('amount'))
+        }
+        self.assertEqual(summary['total_income'], expected['income'])
+        self.assertEqual(summary['total_expenses'], expected['expense'])
+        self.assertEqual(summary['net_profit'], Decimal('1350'))
+        self.assertEqual((summary['income_count'], summary['expense_count']), (3, 2))
+        # March has no rows but still gets its zero entry
+        self.assertEqual(
+            [(item['month'], item['income'], item['expenses']) for item in summary['monthly']],
+            [('Feb 2026', 200, 50), ('Mar 2026', 0, 0), ('Apr 2026', 300, 100)],
+        )
+        self.assertEqual(summary['this_month']['net_profit'], Decimal('200'))
+        self.assertEqual((summary['income_change_percent'], summary['expense_change_percent']), (100, 100))
+
+
+class CategoryStatsTests(TestCase):
+    """Category counts and totals are annotated in the query that lists the categories"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('counter')
+        self.rent = Category.objects.create(user=self.user, name='Rent', category_type='expense')
+        self.unused = Category.objects.create(user=self.user, name='Unused', category_type='expense')
+        for day, amount in [(date(2026, 1, 5), '10'), (date(2026, 2, 7), '15')]:
+            Transaction.objects.create(
+                user=self.user, date=day, description='Row', category=self.rent,
+                transaction_type='expense', amount=Decimal(amount),
+            )
+        Category.objects.create(user=User.objects.create_user('other'), name='Rent', category_type='expense')
+
+    def test_with_stats(self):
+        with self.assertNumQueries(1):
+            stats = {
+                category.name: (category.transaction_count, category.total_amount, category.last_used)
+                for category in Category.objects.with_stats(self.user)
+            }
+        self.assertEqual(stats, {'Rent': (2, Decimal('25'), date(2026, 2, 7)), 'Unused': (0, None, None)})
+
+    def test_categories_page_queries_do_not_grow(self):
+        self.client.force_login(self.user)
+        counts = []
+        for name in ('Food', 'Travel', 'Salary'):
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.get(reverse('finflow:categories')).status_code, 200)
+            counts.append(len(queries))
+            Category.objects.create(user=self.user, name=name, category_type='income')
+        self.assertEqual(len(set(counts)), 1)
+
+
+class CategoryBreakdownTests(TestCase):
+    """Every category is listed under its own type, including those without transactions"""
+
+    def test_breakdown_lists_all_categories_by_category_type(self):
+        user = User.objects.create_user('breakdown')
+        sales = Category.objects.create(user=user, name='Sales', category_type='income')
+        Category.objects.create(user=user, name='Grants', category_type='income')
+        rent = Category.objects.create(user=user, name='Rent', category_type='expense')
+        for category, transaction_type, amount in [
+            (sales, 'income', '300'), (rent, 'expense', '120'), (rent, 'income', '20'), (None, 'expense', '5'),
+        ]:
+            Transaction.objects.create(
+                user=user, date=date(2026, 1, 5), description='Row', category=category,
+                transaction_type=transaction_type, amount=Decimal(amount),
+            )
+
+        for start, end in [(None, None), (date(2026, 1, 1), date(2026, 1, 31)), (date(2026, 1, 2), date(2026, 1, 9))]:
+            with self.subTest(start=start, end=end):
+                breakdown = category_breakdown(user, start, end)
+                self.assertEqual(
+                    [(item['name'], item['amount'], item['count']) for item in breakdown['income']],
+                    [('Sales', 300, 1), ('Grants', 0, 0)],
+                )
+                self.assertEqual(
+                    [(item['name'], item['amount'], item['count']) for item in breakdown['expense']],
+                    [('Rent', 140, 2), ('Uncategorized', 5, 1)],
+                )
+
+
+class PeriodTests(TestCase):
+    """Report buckets split exactly at calendar boundaries and zero-fill empty ones"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('periods')
+        for day, transaction_type, amount in [
+            (date(2025, 12, 31), 'income', '100'),
+            (date(2026, 1, 1), 'expense', '40'),
+            (date(2026, 1, 31), 'expense', '5'),
+            (date(2026, 3, 1), 'income', '7'),
+        ]:
+            Transaction.objects.create(
+                user=self.user, date=day, description='Row', transaction_type=transaction_type, amount=Decimal(amount),
+            )
+
+    def test_bucket_boundaries(self):
+        self.assertEqual(buckets(date(2025, 12, 30), date(2026, 1, 2), 'month'), [
+            (date(2025, 12, 30), date(2025, 12, 31)), (date(2026, 1, 1), date(2026, 1, 2)),
+        ])
+        self.assertEqual(buckets(date(2025, 11, 15), date(2026, 2, 10), 'year'), [
+            (date(2025, 11, 15), date(2025, 12, 31)), (date(2026, 1, 1), date(2026, 2, 10)),
+        ])
+        self.assertEqual(buckets(date(2026, 2, 1), date(2026, 4, 1), 'quarter'), [
+            (date(2026, 2, 1), date(2026, 3, 31)), (date(2026, 4, 1), date(2026, 4, 1)),
+        ])
+        # Weeks start on Monday; 2026-01-05 is one
+        self.assertEqual(buckets(date(2026, 1, 1), date(2026, 1, 12), 'week'), [
+            (date(2026, 1, 1), date(2026, 1, 4)), (date(2026, 1, 5), date(2026, 1, 11)),
+            (date(2026, 1, 12), date(2026, 1, 12)),
+        ])
+        self.assertEqual(buckets(date(2024, 2, 28), date(2024, 3, 1), 'day')[1], (date(2024, 2, 29), date(2024, 2, 29)))
+        for args in [(date(2026, 2, 1), date(2026, 1, 1), 'month'), (date(2026, 1, 1), date(2026, 2, 1), 'fortnight'),
+                     (date(2000, 1, 1), date(2026, 1, 1), 'day')]:
+            with self.subTest(args=args), self.assertRaises(ValueError):
+                buckets(*args)
+
+    def test_totals_per_bucket(self):
+        def totals(start, end, granularity):
+            return [
+                (period['label'], period['income'], period['expenses'])
+                for period in period_totals(self.user, start, end, granularity)
+            ]
+
+        # Whole months are read from the rollups; February has no rows
+        self.assertEqual(totals(date(2025, 12, 1), date(2026, 3, 31), 'month'), [
+            ('Dec 2025', 100, 0), ('Jan 2026', 0, 45), ('Feb 2026', 0, 0), ('Mar 2026', 7, 0),
+        ])
+        # A partial range is grouped from the transactions, at the same boundaries
+        self.assertEqual(totals(date(2025, 12, 31), date(2026, 3, 1), 'year'), [
+            ('2025', 100, 0), ('2026', 7, 45),
+        ])
+        self.assertEqual(totals(date(2026, 1, 1), date(2026, 1, 31), 'quarter'), [('Q1 2026', 0, 45)])
+        self.assertEqual(totals(date(2026, 1, 2), date(2026, 1, 30), 'week')[0][1:], (0, 0))
+
+
+class ChartDataTests(TestCase):
+    """Chart datasets answer conditional GETs with 304 until the user's data changes"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('charter')
+        self.client.force_login(self.user)
+        self.category = Category.objects.create(user=self.user, name='Rent', category_type='expense')
+        self.row = Transaction.objects.create(
+            user=self.user, date=date.today(), description='Row', category=self.category,
+            transaction_type='expense', amount=Decimal('10'),
+        )
+        self.url = reverse('finflow:chart_data', args=['expense-categories'])
+
+    def etag(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def test_conditional_gets(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.json()['labels'], ['Rent'])
+        etag, modified = response['ETag'], response['Last-Modified']
+        self.assertEqual(self.client.get(self.url, headers={'if-none-match': etag}).status_code, 304)
+        self.assertEqual(self.client.get(self.url, headers={'if-modified-since': modified}).status_code, 304)
+        # Another range of the same chart is another dataset
+        other = self.client.get(self.url, {'start': '2020-01-01'}, headers={'if-none-match': etag})
+        self.assertEqual(other.status_code, 200)
+
+    def test_etag_changes_with_the_data(self):
+        etags = [self.etag()]
+
+        self.row.amount = Decimal('12')
+        self.row.save()
+        etags.append(self.etag())
+
+        self.category.name = 'Office rent'
+        self.category.save()
+        etags.append(self.etag())
+
+        self.row.delete()
+        response = self.client.get(self.url, headers={'if-none-match': etags[-1]})
+        self.assertEqual(response.status_code, 200)
+        etags.append(response['ETag'])
+        self.assertEqual(len(set(etags)), 4)
+
+
+class AnalyticsTests(TestCase):
+    """The vectorized metrics against hand-computed values"""
+
+    def test_daily_totals(self):
+        data = to_arrays([
+            (date(2026, 1, 1), 'income', None, Decimal('10')),
+            (date(2026, 1, 1), 'expense', 5, Decimal('4')),
+            (date(2026, 1, 3), 'expense', 5, Decimal('6')),
+        ])
+        self.assertEqual(data.categories.tolist(), [NO_CATEGORY, 5, 5])
+        income, expenses = daily_totals(data, date(2026, 1, 1), date(2026, 1, 4))
+        self.assertEqual(income.tolist(), [10, 0, 0, 0])
+        self.assertEqual(expenses.tolist(), [4, 0, 6, 0])
+
+    def test_rolling_mean(self):
+        self.assertEqual(rolling_mean(np.array([1.0, 2, 3, 4, 5]), 2).tolist(), [1, 1.5, 2.5, 3.5, 4.5])
+        # Fewer values than the window: the mean of what there is
+        self.assertEqual(rolling_mean(np.array([3.0, 6, 9]), 5).tolist(), [3, 4.5, 6])
+
+    def test_trend_slopes(self):
+        rows = [
+            (date(2026, 1, 10), 'expense', 5, Decimal('10')),
+            (date(2026, 2, 10), 'expense', 5, Decimal('20')),
+            (date(2026, 3, 10), 'expense', 5, Decimal('30')),
+            (date(2026, 1, 2), 'income', 7, Decimal('30')),
+            (date(2026, 4, 1), 'income', 7, Decimal('999')),  # after the window
+        ] + [(date(2026, month, 1), 'income', None, Decimal('5')) for month in (1, 2, 3)]
+        ids, is_expense, slopes, means = trend_slopes(to_arrays(rows), date(2026, 1, 1), 3)
+        # Monthly totals: category 5 expenses 10/20/30, category 7 income
+        # 30/0/0, uncategorized income 5/5/5
+        self.assertEqual(ids.tolist(), [NO_CATEGORY, 5, 7])
+        self.assertEqual(is_expense.tolist(), [False, True, False])
+        self.assertEqual(slopes.tolist(), [0, 10, -15])
+        self.assertEqual(means.tolist(), [5, 20, 10])
+
+    def test_forecast_queries(self):
+        user = User.objects.create_user('forecaster')
+        rent = Category.objects.create(user=user, name='Rent', category_type='expense')
+        for day in (date(2025, 1, 1), date(2026, 3, 15), date(2026, 5, 20)):
+            Transaction.objects.create(
+                user=user, date=day, description='Row', category=rent, transaction_type='expense', amount=Decimal('30'),
+            )
+        with self.assertNumQueries(3):
+            metrics = forecast(user, today=date(2026, 5, 31))
+        self.assertEqual(metrics['balance'], -90)
+        self.assertEqual(metrics['rolling_expenses'], 1)
+        self.assertEqual([item['name'] for item in metrics['trends']], ['Rent'])
+
+
+class ImportTests(TestCase):
+    """CSV/XLSX import: valid rows are written, bad rows and bad files are reported"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('importer')
+
+    def import_csv(self, text, encoding='utf-8'):
+        return import_transactions(self.user, io.BytesIO(text.encode(encoding)), 'upload.csv')
+
+    def test_valid_rows_are_created_with_rollups(self):
+        result = self.import_csv(
+            'Date,Description,Category,Type,Amount\n'
+            '2026-01-05,Consulting fee,Consulting,Income,"Ksh 1,200.00"\n'
+            '2026-01-06,Rent,Rent,Expense,500\n'
+        )
+        self.assertEqual((result['created'], result['categories_created'], result['error_count']), (2, 2, 0))
+        self.assertEqual(Transaction.objects.filter(user=self.user).aggregate(total=Sum('amount'))['total'], 1700)
+        self.assertTrue(rollups_match(self.user))
+
+    def test_non_finite_amounts_are_row_errors(self):
+        result = self.import_csv(
+            'Date,Description,Type,Amount\n'
+            '2026-01-05,Not a number,Expense,NaN\n'
+            '2026-01-05,Infinite,Expense,Infinity\n'
+            '2026-01-05,Too precise,Expense,1e40\n'
+            '2026-01-05,Fine,Expense,10\n'
+        )
+        self.assertEqual(result['created'], 1)
+        self.assertEqual([error['row'] for error in result['errors']], [2, 3, 4])
+
+    def test_unreadable_files_raise_import_file_error(self):
+        uploads = [
+            (b'Date,Description,Type,Amount\n2026-01-05,Caf\xe9,Expense,10\n', 'latin1.csv'),
+            ('Date,Description,Type,Amount\n2026-01-05,"{}",Expense,10\n'.format('x' * 200_000).encode(), 'huge.csv'),
+            (b'PK\x03\x04 not really a workbook', 'broken.xlsx'),
+            (b'plain text', 'text.xlsx'),
+        ]
+        for data, name in uploads:
+            with self.subTest(name=name), self.assertRaises(ImportFileError):
+                import_transactions(self.user, io.BytesIO(data), name)
+        self.assertFalse(Transaction.objects.filter(user=self.user).exists())
+
+    def test_view_reports_bad_files_as_client_errors(self):
+        self.client.force_login(self.user)
+        for data, name, status in [
+            (b'Date,Description,Type,Amount\n2026-01-05,x,Expense,NaN\n', 'nan.csv', 200),
+            (b'Date,Description,Type,Amount\n2026-01-05,Caf\xe9,Expense,10\n', 'latin1.csv', 400),
+            (b'not a zip', 'broken.xlsx', 400),
+        ]:
+            with self.subTest(name=name):
+                response = self.client.post(
+                    reverse('finflow:import_transactions'),
+                    {'file': SimpleUploadedFile(name, data), 'ajax': 'true'},
+                )
+                self.assertEqual(response.status_code, status)
+                self.assertEqual(response.json()['success'], status == 200)
+
+
+class BatchTests(TestCase):
+    """JSON batch API: all operations apply together, or none do"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('batcher')
+        self.client.force_login(self.user)
+        self.category = Category.objects.create(user=self.user, name='Rent', category_type='expense')
+        self.existing = Transaction.objects.create(
+            user=self.user, date=date(2026, 1, 5), description='Old', transaction_type='expense', amount=Decimal('50'),
+        )
+
+    def post(self, body):
+        return self.client.post(reverse('finflow:batch_transactions'), body, content_type='application/json')
+
+    def test_batch_applies_with_rollups(self):
+        response = self.post(json.dumps({'operations': [
+            {'op': 'create', 'ref': 'a', 'data': {
+                'date': '2026-02-01', 'description': 'New', 'type': 'expense', 'amount': '20', 'category': self.category.pk,
+            }},
+            {'op': 'update', 'id': self.existing.pk, 'data': {'amount': '75.50', 'category': self.category.pk}},
+        ]}))
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['results'][0]['ref'], 'a')
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.amount, Decimal('75.50'))
+        self.assertTrue(rollups_match(self.user))
+
+        response = self.post(json.dumps({'operations': [{'op': 'delete', 'id': self.existing.pk}]}))
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertFalse(Transaction.objects.filter(pk=self.existing.pk).exists())
+        self.assertTrue(rollups_match(self.user))
+
+    def test_invalid_values_are_per_operation_errors(self):
+        body = '{"operations": [%s]}' % ', '.join([
+            '{"op": "update", "id": %d, "data": {"amount": NaN}}' % self.existing.pk,
+            '{"op": "create", "data": {"date": "2026-02-01", "description": "x", "type": "expense", '
+            '"amount": Infinity}}',
+            '{"op": "create", "data": {"date": "2026-02-01", "description": "x", "type": "expense", '
+            '"amount": 1, "category": [%d]}}' % self.category.pk,
+            '{"op": "create", "data": {"date": "2026-02-01", "description": "x", "type": "expense", '
+            '"amount": 1, "category": {}}}',
+            '{"op": "create", "data": {"date": "2026-02-01", "description": "x", "type": "expense", '
+            '"amount": 1, "category": true}}',
+        ])
+        response = self.post(body)
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(all(result['errors'] for result in response.json()['results']))
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.amount, Decimal('50'))
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 1)
+
+
+class RunningBalanceTests(TestCase):
+    """Stored running balances equal a cumulative sum in (date, id) order after every kind of write"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('balancer')
+        self.other = User.objects.create_user('bystander')
+        Transaction.objects.create(
+            user=self.other, date=date(2026, 1, 1), description='Other', transaction_type='income', amount=Decimal('999'),
+        )
+
+    def add(self, day, amount, transaction_type='expense'):
+        return Transaction.objects.create(
+            user=self.user, date=day, description='Row', transaction_type=transaction_type, amount=Decimal(amount),
+        )
+
+    def assertBalances(self):
+        balance, expected = Decimal('0'), []
+        rows = Transaction.objects.filter(user=self.user).order_by('date', 'id')
+        for row in rows:
+            balance += -row.amount if row.transaction_type == 'expense' else row.amount
+            expected.append((row.pk, balance))
+        self.assertEqual([(row.pk, row.running_balance) for row in rows], expected)
+        self.assertEqual(Transaction.objects.get(user=self.other).running_balance, Decimal('999'))
+
+    def test_single_row_writes(self):
+        self.add(date(2026, 1, 10), '1000', 'income')
+        rent = self.add(date(2026, 1, 15), '400')
+        self.add(date(2026, 2, 1), '50')
+        self.add(date(2026, 1, 5), '20')
+        self.assertBalances()
+
+        rent.date = date(2026, 2, 10)
+        rent.save()
+        self.assertBalances()
+        rent.amount, rent.transaction_type = Decimal('75'), 'income'
+        rent.save()
+        self.assertBalances()
+        rent.date = date(2025, 12, 31)
+        rent.save()
+        self.assertBalances()
+
+        rent.delete()
+        self.assertBalances()
+        self.assertEqual(balance_at(self.user, date(2026, 1, 31)), Decimal('980'))
+        self.assertEqual(balance_at(self.user, date(2025, 1, 1)), Decimal('0'))
+
+    def test_bulk_writes_and_rebuild(self):
+        self.add(date(2026, 1, 10), '1000', 'income')
+        self.add(date(2026, 3, 1), '10')
+        result = import_transactions(self.user, io.BytesIO(
+            b'Date,Description,Type,Amount\n'
+            b'2026-01-05,Early,Expense,30\n'
+            b'2026-02-01,Salary,Income,500\n'
+        ), 'upload.csv')
+        self.assertEqual(result['created'], 2)
+        self.assertBalances()
+
+        first, second = Transaction.objects.filter(user=self.user).order_by('date', 'id')[:2]
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('finflow:batch_transactions'), json.dumps({'operations': [
+            {'op': 'update', 'id': second.pk, 'data': {'date': '2026-02-15', 'amount': '900'}},
+            {'op': 'delete', 'id': first.pk},
+            {'op': 'create', 'data': {'date': '2026-01-01', 'description': 'New', 'type': 'expense', 'amount': '5'}},
+        ]}), content_type='application/json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertBalances()
+
+        Transaction.objects.filter(user=self.user).update(running_balance=0)
+        self.assertEqual(rebuild(self.user), 1)
+        self.assertBalances()
+        self.assertEqual(balance_at(self.user, date(2026, 2, 28)), Decimal('1395'))
+
+
+class BudgetTests(TestCase):
+    """Budget alerts follow spending as it crosses the budget, and utilization reads the rollups"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('budgeter')
+        self.rent = Category.objects.create(user=self.user, name='Rent', category_type='expense')
+        self.food = Category.objects.create(user=self.user, name='Food', category_type='expense')
+        self.budget = Budget.objects.create(user=self.user, category=self.rent, amount=Decimal('500'))
+
+    def add(self, day, amount, category=None):
+        return Transaction.objects.create(
+            user=self.user, date=day, description='Row', category=category or self.rent,
+            transaction_type='expense', amount=Decimal(amount),
+        )
+
+    def alerts(self):
+        return {alert.month: alert.spent for alert in BudgetAlert.objects.filter(budget=self.budget)}
+
+    def test_alerts_follow_spending(self):
+        first = self.add(date(2026, 1, 5), '300')
+        self.add(date(2026, 1, 20), '150')
+        self.add(date(2026, 1, 21), '900', self.food)
+        self.assertEqual(self.alerts(), {})
+
+        late = self.add(date(2026, 1, 25), '100')
+        self.assertEqual(self.alerts(), {date(2026, 1, 1): Decimal('550')})
+
+        first.date = date(2026, 2, 5)
+        first.save()
+        self.assertEqual(self.alerts(), {})
+
+        late.date = date(2026, 2, 6)
+        late.amount = Decimal('250')
+        late.save()
+        self.assertEqual(self.alerts(), {date(2026, 2, 1): Decimal('550')})
+
+        late.delete()
+        self.assertEqual(self.alerts(), {})
+
+    def test_bulk_writes_and_budget_changes(self):
+        result = import_transactions(self.user, io.BytesIO(
+            b'Date,Description,Category,Type,Amount\n'
+            b'2026-03-01,Rent,Rent,Expense,400\n'
+            b'2026-03-02,Repairs,Rent,Expense,200\n'
+        ), 'upload.csv')
+        self.assertEqual(result['created'], 2)
+        self.assertEqual(self.alerts(), {date(2026, 3, 1): Decimal('600')})
+
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse('finflow:set_budget', args=[self.rent.pk]), {'amount': '650', 'ajax': 'true'},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.alerts(), {})
+
+        response = self.client.post(
+            reverse('finflow:set_budget', args=[self.rent.pk]), {'amount': '550.50', 'ajax': 'true'},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.alerts(), {date(2026, 3, 1): Decimal('600')})
+
+        for amount in ['NaN', '-1', 'lots']:
+            with self.subTest(amount=amount):
+                response = self.client.post(
+                    reverse('finflow:set_budget', args=[self.rent.pk]), {'amount': amount, 'ajax': 'true'},
+                )
+                self.assertEqual(response.status_code, 400)
+        self.budget.refresh_from_db()
+        self.assertEqual(self.budget.amount, Decimal('550.50'))
+
+    def test_utilization(self):
+        self.add(date(2026, 4, 3), '250')
+        self.add(date(2026, 4, 9), '600', self.food)
+        Budget.objects.create(user=self.user, category=self.food, amount=Decimal('400'))
+        with self.assertNumQueries(1):
+            rows = utilization(self.user, date(2026, 4, 15))
+        self.assertEqual(
+            [(row['name'], row['spent'], row['remaining'], row['percent']) for row in rows],
+            [('Food', Decimal('600'), Decimal('-200'), 150.0), ('Rent', Decimal('250'), Decimal('250'), 50.0)],
+        )
+        self.assertEqual(utilization(self.user, date(2026, 5, 1))[0]['spent'], Decimal('0'))
+
+
+class RecurringTests(TestCase):
+    """The materializer creates every due occurrence exactly once"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('repeater')
+        self.rent = Category.objects.create(user=self.user, name='Rent', category_type='expense')
+
+    def rule(self, frequency, start, end=None, interval=1):
+        return RecurringTransaction.objects.create(
+            user=self.user, description=frequency.title(), category=self.rent, transaction_type='expense',
+            amount=Decimal('10'), frequency=frequency, interval=interval, start_date=start, end_date=end,
+        )
+
+    def dates(self, rule):
+        return list(rule.occurrences.order_by('date').values_list('date', flat=True))
+
+    def test_due_occurrences_are_created_once(self):
+        monthly = self.rule('monthly', date(2026, 1, 31))
+        weekly = self.rule('weekly', date(2026, 3, 2), end=date(2026, 3, 20), interval=2)
+        future = self.rule('yearly', date(2027, 1, 1))
+
+        totals = materialize_due(today=date(2026, 4, 30), batch_size=2)
+        self.assertEqual(totals, {'rules': 2, 'transactions': 6, 'batches': 1})
+        self.assertEqual(
+            self.dates(monthly), [date(2026, 1, 31), date(2026, 2, 28), date(2026, 3, 31), date(2026, 4, 30)],
+        )
+        self.assertEqual(self.dates(weekly), [date(2026, 3, 2), date(2026, 3, 16)])
+        self.assertEqual(self.dates(future), [])
+
+        monthly.refresh_from_db()
+        weekly.refresh_from_db()
+        self.assertEqual((monthly.next_date, monthly.active), (date(2026, 5, 31), True))
+        self.assertFalse(weekly.active)
+        self.assertTrue(rollups_match(self.user))
+        self.assertEqual(balance_at(self.user, date(2026, 4, 30)), Decimal('-60'))
+
+        self.assertEqual(materialize_due(today=date(2026, 4, 30))['transactions'], 0)
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 6)
+
+    def test_rules_far_behind_finish_over_batches(self):
+        rule = self.rule('daily', date(2025, 1, 1))
+        with mock.patch('finflow.recurring.MAX_OCCURRENCES', 100):
+            totals = materialize_due(today=date(2025, 12, 31))
+        self.assertEqual(totals['transactions'], 365)
+        self.assertEqual(totals['batches'], 4)
+        self.assertEqual(len(set(self.dates(rule))), 365)
+        self.assertTrue(rollups_match(self.user))
+
+
+class SyntheticDataTests(TestCase):
+    """Generated users get consistent rollups and balances, reproducibly per seed"""
+
+    def test_generated_data_is_consistent(self):
+        users = generate(users=2, categories=5, transactions=300, years=2, seed=7, today=date(2026, 6, 30))
+        self.assertEqual([user.username for user in users], ['synthetic1', 'synthetic2'])
+        for user in users:
+            rows = Transaction.objects.filter(user=user).order_by('date', 'id')
+            self.assertEqual(rows.count(), 300)
+            self.assertEqual(Category.objects.filter(user=user).count(), 5)
+            self.assertTrue(rollups_match(user))
+            self.assertGreaterEqual(rows.first().date, date(2024, 7, 1))
+            self.assertLessEqual(rows.last().date, date(2026, 6, 30))
+
+            balance = Decimal('0')
+            for row in rows:
+                balance += -row.amount if row.transaction_type == 'expense' else row.amount
+                self.assertEqual(row.running_balance, balance)
+
+        again = generate(
+            users=1, categories=5, transactions=300, years=2, seed=7, prefix='again', today=date(2026, 6, 30),
+        )
+        fields = ('date', 'description', 'transaction_type', 'amount', 'category__name')
+        self.assertEqual(
+            list(Transaction.objects.filter(user=again[0]).order_by('id').values_list(*fields)),
+            list(Transaction.objects.filter(user=users[0]).order_by('id').values_list(*fields)),
+        )
+
+    def test_command_rejects_empty_spans(self):
+        for args in [['--years', '0'], ['--users', '0'], ['--transactions', '-1'], ['--categories', '-1']]:
+            with self.subTest(args=args), self.assertRaises(CommandError):
+                call_command('generate_synthetic_data', *args, stdout=io.StringIO())
+        self.assertFalse(User.objects.exists())
+        with self.assertRaises(ValueError):
+            generate(years=0)
+
+
+class SyncTests(TestCase):
+    """Delta sync: changes and deletes after a token, and only those"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('syncer')
+        self.category = Category.objects.create(user=self.user, name='Rent', category_type='expense')
+        self.kept, self.dropped = [
+            Transaction.objects.create(
+                user=self.user, date=date(2026, 1, day), description=f'Row {day}',
+                category=self.category, transaction_type='expense', amount=Decimal('10'),
+            )
+            for day in (1, 2)
+        ]
+
+    def test_changes_and_deletes_after_token(self):
+        full = changes_since(self.user)
+        self.assertTrue(full['reset'])
+        self.assertEqual(len(full['transactions']), 2)
+
+        # Step past the overlap window so only the later writes are new
+        dropped_id, category_id = self.dropped.pk, self.category.pk
+        with self.settings(FINFLOW_SYNC_OVERLAP=0):
+            self.dropped.delete()
+            self.category.delete()
+            delta = changes_since(self.user, full['token'])
+        self.assertFalse(delta['reset'])
+        self.assertEqual(delta['deleted']['transactions'], [dropped_id])
+        self.assertEqual(delta['deleted']['categories'], [category_id])
+        # Losing its category counts as a change of the remaining row
+        self.assertEqual([(t['id'], t['category']) for t in delta['transactions']], [(self.kept.pk, None)])
+
+    def test_batch_deletes_leave_one_tombstone_each(self):
+        full = changes_since(self.user)
+        dropped_id = self.dropped.pk
+        self.client.force_login(self.user)
+        with self.settings(FINFLOW_SYNC_OVERLAP=0):
+            response = self.client.post(
+                reverse('finflow:batch_transactions'),
+                json.dumps({'operations': [{'op': 'delete', 'id': dropped_id}]}),
+                content_type='application/json',
+            )
+            self.assertEqual(response.status_code, 200, response.content)
+            delta = changes_since(self.user, full['token'])
+        self.assertEqual(delta['deleted']['transactions'], [dropped_id])
+        self.assertEqual(SyncTombstone.objects.filter(kind='transaction', object_id=dropped_id).count(), 1)
+        self.assertFalse(Transaction.objects.filter(pk=dropped_id).exists())
+        self.assertTrue(rollups_match(self.user))
+
+    def test_pages_follow_each_other(self):
+        first = changes_since(self.user, limit=1)
+        self.assertTrue(first['has_more'])
+        second = changes_since(self.user, first['token'], limit=1)
+        self.assertFalse(second['has_more'])
+        ids = [t['id'] for t in first['transactions'] + second['transactions']]
+        self.assertEqual(sorted(ids), sorted([self.kept.pk, self.dropped.pk]))
+
+    def test_crafted_tokens_are_rejected(self):
+        self.client.force_login(self.user)
+        for raw in ['2026-01-01T00:00:00|', '2026-01-01T00:00:00+00:00|-1', '0001-01-01T00:00:00+14:00|', 'junk']:
+            token = base64.urlsafe_b64encode(raw.encode()).decode()
+            with self.subTest(raw=raw):
+                with self.assertRaises(ValueError):
+                    decode_token(token)
+                response = self.client.get(reverse('finflow:sync'), {'token': token})
+                self.assertEqual(response.status_code, 400)
+
+
+class CsvExportTests(TestCase):
+    """The CSV report is streamed in batches from two queries however many rows there are"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('csv')
+        self.client.force_login(self.user)
+        rent = Category.objects.create(user=self.user, name='Rent', category_type='expense')
+        Transaction.objects.bulk_create(
+            Transaction(
+                user=self.user, date=date(2026, 1, 1) + timedelta(days=i % 28), description=f'Row {i}',
+                category=rent if i % 2 else None, transaction_type='expense', amount=Decimal(i),
+            )
+            for i in range(1, 1201)
+        )
+
+    def test_streamed_rows(self):
+        response = self.client.get(reverse('finflow:export_report_csv'))
+        self.assertTrue(response.streaming)
+        chunks = list(response.streaming_content)
+        rows = list(csv.reader(io.StringIO(b''.join(chunks).decode())))
+        header = rows.index(['Date', 'Description', 'Category', 'Type', 'Amount'])
+        body = rows[header + 1:]
+        self.assertEqual(len(body), 1200)
+        self.assertEqual(sorted(int(row[1].split()[1]) for row in body), list(range(1, 1201)))
+        self.assertIn(['2026-01-02', 'Row 1', 'Rent', 'Expense', 'Ksh 1.00'], body)
+        self.assertIn(['2026-01-03', 'Row 2', '', 'Expense', 'Ksh 2.00'], body)
+        # Lines go out in batches, not one chunk per row or one for everything
+        self.assertLess(len(chunks), 20)
+        self.assertGreater(len(chunks), 3)
+
+    def test_query_count_does_not_depend_on_rows(self):
+        with self.assertNumQueries(2):
+            lines = list(csv_report_lines(self.user))
+        self.assertEqual(sum(line.count('\n') for line in lines), 10 + 1200)
+
+
+class ExcelExportTests(TestCase):
+    """The write-only Excel report holds the summary and every row"""
+
+    def test_workbook(self):
+        user = User.objects.create_user('excel')
+        rent = Category.objects.create(user=user, name='Rent', category_type='expense')
+        for i, category in enumerate([rent, None, rent]):
+            Transaction.objects.create(
+                user=user, date=date(2026, 1, 1 + i), description=f'Row {i}', category=category,
+                transaction_type='income' if category is None else 'expense', amount=Decimal('12.50'),
+            )
+        self.client.force_login(user)
+        with self.assertNumQueries(4):  # session, user, summary, rows
+            response = self.client.get(reverse('finflow:export_report_excel'))
+        workbook = load_workbook(io.BytesIO(b''.join(response.streaming_content)), read_only=True)
+        self.assertEqual(workbook.sheetnames, ['P&L Summary', 'FinFlow Report'])
+        summary = {row[0]: row[1] for row in workbook['P&L Summary'].iter_rows(values_only=True) if len(row) > 1}
+        self.assertEqual(summary['Total Expenses'], 25)
+        self.assertEqual(summary['Net Profit'], -12.5)
+        rows = list(workbook['FinFlow Report'].iter_rows(values_only=True))
+        self.assertEqual(rows[0], ('Date', 'Description', 'Category', 'Type', 'Amount'))
+        self.assertEqual([row[1:4] for row in rows[1:]], [
+            ('Row 2', 'Rent', 'Expense'), ('Row 1', None, 'Income'), ('Row 0', 'Rent', 'Expense'),
+        ])
+        self.assertEqual(rows[1][4], 12.5)
+
+
+class PdfReportTests(TestCase):
+    """PDF pages hold at most a page's worth of rows and subtotal exactly those rows"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('printer')
+        self.category = Category.objects.create(user=self.user, name='Rent', category_type='expense')
+        Transaction.objects.bulk_create(
+            Transaction(
+                user=self.user, date=date(2026, 1, 1) + timedelta(days=i % 60), description=f'Row {i}',
+                category=self.category if i % 2 else None, transaction_type='income' if i % 3 == 0 else 'expense',
+                amount=Decimal(i + 1),
+            )
+            for i in range(130)
+        )
+
+    def test_pages_and_subtotals(self):
+        report = PdfReport(self.user)
+        pages = []
+        draw_row, end_page = PdfReport._draw_row, PdfReport._end_page
+
+        def record_row(self, p, y, values, font='Helvetica'):
+            if font != 'Helvetica-Bold':  # not a column header
+                pages[-1]['rows'].append((values[3], Decimal(values[4][4:].replace(',', ''))))
+            return draw_row(self, p, y, values, font)
+
+        def record_end(self, p, page, page_count, income, expenses, totals=None):
+            pages[-1].update(page=page, page_count=page_count, income=income, expenses=expenses)
+            pages.append({'rows': []})
+            return end_page(self, p, page, page_count, income, expenses, totals)
+
+        pages.append({'rows': []})
+        output = io.BytesIO()
+        with mock.patch.object(PdfReport, '_draw_row', record_row), \
+                mock.patch.object(PdfReport, '_end_page', record_end):
+            report.render(output)
+        pages.pop()
+
+        self.assertEqual(len(pages), report.page_count(130))
+        self.assertEqual(len(re.findall(rb'/Type /Page\b', output.getvalue())), len(pages))
+        self.assertEqual([page['page'] for page in pages], list(range(1, len(pages) + 1)))
+        self.assertEqual(len(pages[0]['rows']), report.first_page_rows)
+        self.assertTrue(all(len(page['rows']) <= report.rows_per_page for page in pages[1:]))
+        self.assertEqual(sum(len(page['rows']) for page in pages), 130)
+        for page in pages:
+            self.assertEqual(page['income'], sum(amount for kind, amount in page['rows'] if kind == 'Income'))
+            self.assertEqual(page['expenses'], sum(amount for kind, amount in page['rows'] if kind == 'Expense'))
+
+    def test_oversized_reports_are_refused(self):
+        with self.settings(FINFLOW_PDF_MAX_ROWS=100), self.assertRaises(ReportTooLarge):
+            PdfReport(self.user).render(io.BytesIO())
+        with self.settings(FINFLOW_PDF_MAX_ROWS=100):
+            PdfReport(self.user, category=self.category).render(io.BytesIO())
+
+        self.client.force_login(self.user)
+        with self.settings(FINFLOW_PDF_MAX_ROWS=100):
+            response = self.client.get(reverse('finflow:export_report_pdf'))
+        self.assertRedirects(response, reverse('finflow:reports'), fetch_redirect_response=False)
+
+    def test_bad_category_parameters_are_not_found(self):
+        self.client.force_login(self.user)
+        other = Category.objects.create(user=User.objects.create_user('other'), name='Rent', category_type='expense')
+        for value in ['abc', '-1', '1e3', str(2 ** 64), str(other.pk)]:
+            with self.subTest(value=value):
+                response = self.client.get(reverse('finflow:export_report_pdf'), {'category': value})
+                self.assertEqual(response.status_code, 404)
+                response = self.client.post(
+                    reverse('finflow:start_export_job'), {'format': 'pdf', 'category': value},
+                )
+                self.assertEqual(response.status_code, 404)
+        response = self.client.get(reverse('finflow:export_report_pdf'), {'category': self.category.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+
+
+@override_settings(FINFLOW_EXPORT_WORKER='command')
+class ExportJobTests(TestCase):
+    """Background exports: reuse while data is unchanged, recovery of jobs whose worker died"""
+
+    def setUp(self):
+        use_temporary_media(self)
+        self.user = User.objects.create_user('exporter')
+        self.category = Category.objects.create(user=self.user, name='Rent', category_type='expense')
+        Transaction.objects.create(
+            user=self.user, date=date(2026, 1, 5), description='Row', category=self.category,
+            transaction_type='expense', amount=Decimal('10'),
+        )
+
+    def export(self):
+        job = request_export(self.user, 'csv')
+        if job.status == 'pending':
+            run_job(job.pk)
+        job.refresh_from_db()
+        return job
+
+    def test_files_are_reused_until_data_or_category_names_change(self):
+        first = self.export()
+        self.assertEqual(first.status, 'done')
+        self.assertEqual(self.export().pk, first.pk)
+
+        self.category.name = 'Office rent'
+        self.category.save()
+        second = self.export()
+        self.assertNotEqual(second.pk, first.pk)
+        self.assertIn(b'Office rent', second.file.read())
+        # The new file replaces the old one
+        self.assertFalse(ExportJob.objects.filter(pk=first.pk).exists())
+        self.assertFalse(first.file.storage.exists(first.file.name))
+
+    def test_jobs_of_dead_workers_are_queued_again_then_failed(self):
+        job = request_export(self.user, 'csv')
+        self.assertEqual(claim_pending(5), [job.pk])
+        silent = timezone.now() - timedelta(hours=1)
+
+        # The worker died mid-job: the next poll picks the job up again
+        ExportJob.objects.filter(pk=job.pk).update(heartbeat_at=silent)
+        self.assertEqual(claim_pending(5), [job.pk])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('running', 2))
+
+        # Out of attempts it fails, and asking again queues a fresh job
+        ExportJob.objects.filter(pk=job.pk).update(heartbeat_at=silent, attempts=3)
+        self.assertEqual(claim_pending(5), [])
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertNotEqual(request_export(self.user, 'csv').pk, job.pk)
+
+    def test_prune_removes_old_files(self):
+        job = self.export()
+        self.assertEqual(ExportJob.objects.prune(timezone.now() - timedelta(days=1)), 0)
+        self.assertEqual(ExportJob.objects.prune(timezone.now() + timedelta(seconds=1)), 1)
+        self.assertFalse(job.file.storage.exists(job.file.name))
+
+
+class ExportWorkerTests(TransactionTestCase):
+    """The worker keeps every slot busy, and jobs keep beating while they render"""
+
+    def test_slow_jobs_do_not_hold_back_the_others(self):
+        queue, finished = [1, 2, 3], []
+
+        def claim(limit):
+            claimed, queue[:limit] = queue[:limit], []
+            return claimed
+
+        def run(pk, claimed):
+            time.sleep(0.5 if pk == 1 else 0.05)
+            finished.append(pk)
+
+        with mock.patch('finflow.management.commands.run_export_worker.claim_pending', claim), \
+                mock.patch('finflow.management.commands.run_export_worker.run_job', run):
+            call_command('run_export_worker', '--once', '--workers', '2', '--interval', '0.01', stdout=io.StringIO())
+        # Job 3 starts in the slot job 2 frees, long before slow job 1 ends
+        self.assertEqual(finished, [2, 3, 1])
+
+    def test_heartbeat_runs_while_the_job_renders(self):
+        use_temporary_media(self)
+        user = User.objects.create_user('beater')
+        silent = timezone.now() - timedelta(hours=1)
+        job = ExportJob.objects.create(user=user, format='csv', fingerprint='x', status='running', heartbeat_at=silent)
+        seen = []
+
+        def render(job, progress):
+            time.sleep(0.3)  # a long workbook save or PDF build, reporting no rows
+            seen.append(ExportJob.objects.get(pk=job.pk).heartbeat_at)
+            return io.BytesIO(b'report')
+
+        with mock.patch('finflow.jobs.HEARTBEAT_EVERY', 0.05), mock.patch('finflow.jobs._render', render):
+            run_job(job.pk, claimed=True)
+        self.assertGreater(seen[0], silent)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'done')
+
+
+class InstrumentationTests(TestCase):
+    """Stats flushed by any process are visible to every other one"""
+
+    def tearDown(self):
+        instrumentation.reset()
+
+    def test_report_merges_processes(self):
+        # Another worker process, flushing into the shared cache
+        other = instrumentation.Registry()
+        other.process = 'elsewhere:1'
+        other.record('finflow:reports', 30.0, 4, 1.5, 0)
+        other.flush()
+        instrumentation.registry.record('finflow:reports', 10.0, 4, 0.5, 1)
+
+        row, = instrumentation.report()
+        self.assertEqual((row['view'], row['requests'], row['duplicates']), ('finflow:reports', 2, 1))
+        self.assertEqual(row['wall_ms']['max'], 30.0)
+
+        instrumentation.reset()
+        self.assertEqual(instrumentation.report(), [])
+
+
+class BrandingTests(TestCase):
+    """Branding comes with the profile loaded along with the user, at no extra query"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('brand', password='pw12345678')
+        self.client.force_login(self.user)
+
+    def branding(self, user):
+        request = RequestFactory().get('/')
+        request.user = user
+        return branding(request)['branding']
+
+    def test_branding_costs_no_query(self):
+        with self.assertNumQueries(1):
+            user = ProfileBackend().get_user(self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.branding(user)['business_name'], '')
+
+        Profile.objects.filter(user=self.user).delete()
+        user = ProfileBackend().get_user(self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.branding(user)['logo_url'], '')
+
+    def test_saved_profile_shows_on_the_next_request(self):
+        self.client.get(reverse('finflow:dashboard'))
+        self.client.post(reverse('finflow:settings'), {'business_name': 'Acme Ltd'})
+        self.assertContains(self.client.get(reverse('finflow:dashboard')), 'Acme Ltd')
+
+    def test_user_save_does_not_write_the_profile(self):
+        self.user.refresh_from_db()
+        with self.assertNumQueries(1):
+            self.user.save()
+        self.assertEqual(Profile.objects.filter(user=self.user).count(), 1)
+
+
+class LogoTests(TestCase):
+    """Uploaded logos are stored as metadata-free hashed variants"""
+
+    def setUp(self):
+        use_temporary_media(self)
+        self.user = User.objects.create_user('logo')
+        self.client.force_login(self.user)
+
+    def jpeg(self, color):
+        image = Image.new('RGB', (400, 200), color)
+        exif = Image.Exif()
+        exif[0x010E] = 'secret-location'  # ImageDescription
+        exif[0x0112] = 6  # Orientation: rotate 90 degrees
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', exif=exif)
+        return buffer.getvalue()
+
+    def upload(self, data):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('finflow:settings'), {
+                'business_name': 'Acme', 'business_logo': SimpleUploadedFile('logo.jpg', data),
+            })
+        return Profile.objects.get(user=self.user)
+
+    def test_upload_stores_upright_variants_without_metadata(self):
+        profile = self.upload(self.jpeg('red'))
+        self.assertEqual(len(profile.logo_variants), len(logos.SIZES) * len(logos.FORMATS))
+        for name in profile.logo_variants.values():
+            data = default_storage.open(name).read()
+            self.assertNotIn(b'secret-location', data)
+            with Image.open(io.BytesIO(data)) as image:
+                self.assertFalse(image.getexif())
+                self.assertLess(image.width, image.height)  # turned upright
+
+        name = profile.logo_variants['128.webp'].rsplit('/', 1)[-1]
+        response = self.client.get(reverse('finflow:logo_file', args=[name]))
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_replaced_logo_files_are_deleted(self):
+        old = self.upload(self.jpeg('red')).logo_variants
+        new = self.upload(self.jpeg('blue')).logo_variants
+        self.assertTrue(all(default_storage.exists(name) for name in new.values()))
+        self.assertFalse(any(default_storage.exists(name) for name in old.values()))
+
+    def test_process_logos_replaces_and_deletes_legacy_uploads(self):
+        original = default_storage.save('business_logos/legacy.jpg', ContentFile(self.jpeg('green')))
+        Profile.objects.filter(user=self.user).update(business_logo=original)
+        call_command('process_logos', stdout=io.StringIO())
+
+        profile = Profile.objects.get(user=self.user)
+        self.assertTrue(profile.logo_variants)
+        self.assertFalse(default_storage.exists(original))
+
+
+class PaginationTests(TestCase):
+    """Keyset pages cover every row once, in both directions"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('pager')
+        # Several rows share a date, so the created_at/id tie-breaks matter
+        for i in range(8):
+            Transaction.objects.create(
+                user=self.user, date=date(2026, 1, 1 + i // 3), description=f'Row {i}',
+                transaction_type='expense', amount=Decimal('1'),
+            )
+        self.queryset = Transaction.objects.filter(user=self.user)
+        self.expected = list(self.queryset.order_by('-date', '-created_at', '-id').values_list('id', flat=True))
+
+    def test_pages_forward_and_back(self):
+        pages, after = [], None
+        while True:
+            items, next_cursor, previous_cursor = paginate_transactions(self.queryset, after=after, page_size=3)
+            pages.append(([t.pk for t in items], previous_cursor))
+            if not next_cursor:
+                break
+            after = next_cursor
+        self.assertEqual([pk for ids, _ in pages for pk in ids], self.expected)
+        self.assertIsNone(pages[0][1])
+
+        # Going back from the last page gives the page before it
+        items, _, _ = paginate_transactions(self.queryset, before=pages[-1][1], page_size=3)
+        self.assertEqual([t.pk for t in items], pages[-2][0])
+
+    def test_deep_pages_seek_on_the_keyset_index(self):
+        cursor = encode_cursor(self.queryset.order_by('-date', '-created_at', '-id')[4])
+        position = decode_cursor(cursor)
+        for direction, queryset in [
+            ('after', self.queryset.filter(_after(position)).order_by(*ORDERING)),
+            ('before', self.queryset.filter(_before(position)).order_by(*(field.lstrip('-') for field in ORDERING))),
+        ]:
+            with self.subTest(direction=direction):
+                plan = queryset[:51].explain()
+                self.assertIn('finflow_transaction_keyset', plan)
+                self.assertRegex(plan, r'date[<>]\?')
+                self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_crafted_cursors_show_the_first_page(self):
+        self.client.force_login(self.user)
+        for raw in ['2026-01-01|2026-01-01T00:00:00|5', '2026-01-01|0001-01-01T00:00:00+14:00|5',
+                    '2026-01-01|2026-01-01T00:00:00+00:00|99999999999999999999', 'junk']:
+            cursor = base64.urlsafe_b64encode(raw.encode()).decode()
+            with self.subTest(raw=raw):
+                response = self.client.get(reverse('finflow:transactions'), {'after': cursor})
+                self.assertEqual(response.status_code, 200)
+
+
+class ContextCacheTests(TestCase):
+    """Cached contexts are rebuilt after any write of the user's data, and only then"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('cached')
+        self.other = User.objects.create_user('bystander')
+        self.builds = 0
+
+    def context(self, user):
+        def build():
+            self.builds += 1
+            return {'rows': Transaction.objects.filter(user=user).count()}
+        return cached_context(user.pk, 'test', build)
+
+    def test_writes_invalidate_only_their_user(self):
+        self.assertEqual(self.context(self.user), {'rows': 0})
+        self.context(self.other)
+        self.assertEqual(self.builds, 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            t = Transaction.objects.create(
+                user=self.user, date=date(2026, 1, 5), description='Row', transaction_type='income', amount=1,
+            )
+        self.assertEqual(self.context(self.user), {'rows': 1})
+        self.context(self.other)
+        self.assertEqual(self.builds, 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(user=self.user, name='Sales', category_type='income')
+        self.context(self.user)
+        self.assertEqual(self.builds, 4)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            t.delete()
+        self.assertEqual(self.context(self.user), {'rows': 0})
+
+
+    def test_writes_in_another_process_invalidate(self):
+        self.assertEqual(self.context(self.user), {'rows': 0})
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = f'{directory}/upload.csv'
+        with open(path, 'w') as upload:
+            upload.write('Date,Description,Type,Amount\n2026-01-05,Sale,Income,10\n')
+
+        # Another process: its own per-process cache, the same shared one
+        other_process = {**settings.CACHES, 'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'other-process',
+        }}
+        with override_settings(CACHES=other_process), self.captureOnCommitCallbacks(execute=True):
+            call_command('import_transactions', self.user.username, path, stdout=io.StringIO())
+        self.assertEqual(self.context(self.user), {'rows': 1})
+        self.assertEqual(self.builds, 2)
+
+
+class SearchTests(TestCase):
+    """The search index follows transaction writes, with FTS5 and with the token table"""
+
+    def check_index(self):
+        user = User.objects.create_user('searcher')
+        other = User.objects.create_user('other')
+        coffee, rent = [
+            Transaction.objects.create(
+                user=user, date=date(2026, 1, 5), description=description, transaction_type='expense', amount=1,
+            )
+            for description in ('Coffee beans "Java" house', 'Office rent January')
+        ]
+        Transaction.objects.create(
+            user=other, date=date(2026, 1, 5), description='Coffee', transaction_type='expense', amount=1,
+        )
+
+        def found(query):
+            return sorted(t.pk for t in filter_transactions(Transaction.objects.filter(user=user), user, query))
+
+        self.assertEqual(found('coff'), [coffee.pk])
+        self.assertEqual(found('coffee jav'), [coffee.pk])
+        self.assertEqual(found('"java"'), [coffee.pk])
+        self.assertEqual(found('coffee rent'), [])
+        self.assertEqual([t.pk for t in search_transactions(user, 'rent')], [rent.pk])
+
+        rent.description = 'Coffee machine'
+        rent.save()
+        self.assertEqual(found('coffee'), sorted([coffee.pk, rent.pk]))
+        self.assertEqual(found('rent'), [])
+
+        coffee.delete()
+        self.assertEqual(found('coffee'), [rent.pk])
+
+    def test_fts5_index(self):
+        if not fts5_enabled():
+            self.skipTest('SQLite without FTS5')
+        self.check_index()
+
+    def test_fts5_match_is_scoped_to_the_user(self):
+        if not fts5_enabled():
+            self.skipTest('SQLite without FTS5')
+        user, other = User.objects.create_user('searcher'), User.objects.create_user('other')
+        mine = Transaction.objects.create(
+            user=user, date=date(2026, 1, 5), description='Coffee', transaction_type='expense', amount=1,
+        )
+        for description in ['Coffee', 'Coffee beans', f'u{user.pk} coffee']:
+            Transaction.objects.create(
+                user=other, date=date(2026, 1, 5), description=description, transaction_type='expense', amount=1,
+            )
+
+        # The MATCH alone selects the user's rows, so FTS5 never ranks anyone else's
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [_fts_query(['coffee'], user.pk)],
+            )
+            self.assertEqual([row[0] for row in cursor.fetchall()], [mine.pk])
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual([t.pk for t in search_transactions(user, 'coffee')], [mine.pk])
+        self.assertNotIn('user_id =', queries[0]['sql'])
+        self.assertEqual(search_transactions(user, f'u{other.pk}'), [])
+
+    def test_token_index(self):
+        with mock.patch('finflow.search.fts5_enabled', return_value=False):
+            self.check_index()
+
+
+class DatabaseProfileTests(TestCase):
+    """SQLite connections get the configured PRAGMAs and are counted per alias."""
+
+    def test_pragmas_in_effect(self):
+        stats = db.connection_stats()['default']
+        self.assertEqual(stats['vendor'], 'sqlite')
+        self.assertGreaterEqual(stats['opened'], 1)
+        self.assertFalse(stats['pool'])
+        pragmas = settings.FINFLOW_SQLITE_PRAGMAS
+        self.assertEqual(stats['pragmas']['synchronous'], 1)  # NORMAL
+        self.assertEqual(stats['pragmas']['busy_timeout'], pragmas['busy_timeout'])
+        # The test database is in memory, where SQLite reports no mmap_size
+        self.assertIn('mmap_size', stats['pragmas'])
+        self.assertEqual(stats['pragmas']['temp_store'], 2)  # MEMORY
+
+    def test_new_connection_is_configured_and_counted(self):
+        opened = db.connection_stats()['default']['opened']
+        fresh = connection.copy()
+        try:
+            with override_settings(FINFLOW_SQLITE_PRAGMAS={'busy_timeout': 1234}):
+                fresh.ensure_connection()
+                with fresh.cursor() as cursor:
+                    self.assertEqual(cursor.execute('PRAGMA busy_timeout').fetchone()[0], 1234)
+        finally:
+            fresh.close()
+        self.assertEqual(db.connection_stats()['default']['opened'], opened + 1)
@@ -8,15 +8,27 @@ urlpatterns = [
     path('transactions/', views.transactions, name='transactions'),
     path('transactions/delete/<int:pk>/', views.delete_transaction, name='delete_transaction'),
     path('transactions/add/', views.add_transaction, name='add_transaction'),
+    path('transactions/import/', views.import_transactions_view, name='import_transactions'),
+    path('transactions/batch/', views.batch_transactions, name='batch_transactions'),
     path('transactions/update/<int:pk>/', views.update_transaction, name='update_transaction'),
+    path('transactions/edit/<int:pk>/', views.transaction_edit_form, name='transaction_edit_form'),
+    path('transactions/search/', views.search_transactions_api, name='search_transactions'),
+    path('sync/', views.sync_changes, name='sync'),
     path('categories/', views.categories, name='categories'),
     path('categories/add/', views.add_category, name='add_category'),
     path('categories/update/<int:pk>/', views.update_category, name='update_category'),
     path('categories/delete/<int:pk>/', views.delete_category, name='delete_category'),
+    path('categories/budget/<int:pk>/', views.set_budget, name='set_budget'),
     path('reports/', views.reports, name='reports'),
+    path('charts/<slug:name>/', views.chart_data, name='chart_data'),
     path('settings/', views.settings, name='settings'),
+    path('logos/<str:name>', views.logo_file, name='logo_file'),
+    path('instrumentation/', views.instrumentation_report, name='instrumentation'),
     path('reports/export/csv/', views.export_report_csv, name='export_report_csv'),
     path('reports/export/excel/', views.export_report_excel, name='export_report_excel'),
     path('reports/export/pdf/', views.export_report_pdf, name='export_report_pdf'),
+    path('reports/export/jobs/', views.start_export_job, name='start_export_job'),
+    path('reports/export/jobs/<int:pk>/', views.export_job_status, name='export_job_status'),
+    path('reports/export/jobs/<int:pk>/download/', views.download_export_job, name='download_export_job'),
 
 ]
@@ -1,22 +1,63 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.http import require_http_methods
-from django.http import JsonResponse, HttpResponse
+from django.contrib.admin.views.decorators import staff_member_required
+from django.views.decorators.http import require_http_methods, condition
+from django.utils.cache import patch_cache_control
+from django.core.files.storage import default_storage
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse, FileResponse, Http404
 from django.contrib import messages
-from django.db import models
-from datetime import datetime, timedelta
+from django.conf import settings as conf_settings
+from django.utils.dateparse import parse_date
+from django.db import models, transaction as db_transaction
+import json
+from datetime import date, datetime
 from decimal import Decimal
-from .models import Transaction, Category, Profile
-import csv
-from openpyxl import Workbook
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
+from .models import Transaction, Category, Profile, ExportJob, Budget
+from .aggregation import financial_summary, category_breakdown, add_months, month_start, month_end
+from .periods import buckets, GRANULARITIES
+from .analytics import forecast
+from .cache import cached_context
+from .pagination import paginate_transactions
+from .search import filter_transactions, search_transactions
+from .exports import csv_report_lines, excel_report_file
+from .pdf_reports import ReportTooLarge, pdf_report_file
+from .jobs import request_export
+from .importers import import_transactions, parse_amount, ImportFileError
+from .batch import apply_batch, BatchError
+from .sync import changes_since
+from .balances import balance_at
+from .budgets import utilization, refresh as refresh_budget
+from . import charts, db, instrumentation, logos
+
+def _dashboard_data(user):
+    """Data-dependent part of the dashboard context (cacheable)"""
+    # Calculate statistics
+    summary = financial_summary(user)
+    total_income = summary['total_income']
+    total_expenses = summary['total_expenses']
+    net_profit = summary['net_profit']
+    profit_margin = (net_profit / total_income * 100) if total_income > 0 else Decimal('0')
+    
+    # Recent transactions
+    recent_transactions = list(
+        Transaction.objects.filter(user=user).select_related('category')[:10]
+    )
+    
+    return {
+        'total_income': float(total_income),
+        'total_expenses': float(total_expenses),
+        'net_profit': float(net_profit),
+        'profit_margin': float(profit_margin),
+        'recent_transactions': recent_transactions,
+        'budgets': utilization(user),
+    }
+
 
 @login_required
 def dashboard(request):
     """Dashboard view with financial overview"""
     user = request.user
-    transactions = Transaction.objects.filter(user=user)
     
     now = datetime.now()
     hour = now.hour
@@ -32,58 +73,15 @@ def dashboard(request):
         greeting = "Good evening"
         gradient_class = "bg-gradient-to-r from-purple-900 to-purple-300"
     
-    # Calculate statistics
-    total_income = transactions.filter(transaction_type='income').aggregate(
-        total=models.Sum('amount'))['total'] or Decimal('0')
-    total_expenses = transactions.filter(transaction_type='expense').aggregate(
-        total=models.Sum('amount'))['total'] or Decimal('0')
-    net_profit = total_income - total_expenses
-    profit_margin = (net_profit / total_income * 100) if total_income > 0 else Decimal('0')
-    
-    # Recent transactions
-    recent_transactions = transactions[:10]
-    
-    # Monthly data for charts
-    today = datetime.today()
-    monthly_data = []
-    for i in range(6):
-        month_start = today.replace(day=1) - timedelta(days=30*i)
-        month_start = month_start.replace(day=1)
-        if i == 0:
-            month_end = today
-        else:
-            month_end = month_start + timedelta(days=32)
-            month_end = month_end.replace(day=1) - timedelta(days=1)
-        
-        month_income = transactions.filter(
-            transaction_type='income',
-            date__range=[month_start, month_end]
-        ).aggregate(total=models.Sum('amount'))['total'] or Decimal('0')
-        
-        month_expenses = transactions.filter(
-            transaction_type='expense',
-            date__range=[month_start, month_end]
-        ).aggregate(total=models.Sum('amount'))['total'] or Decimal('0')
-        
-        monthly_data.append({
-            'month': month_start.strftime('%b %Y'),
-            'income': float(month_income),
-            'expenses': float(month_expenses),
-        })
-    
-    monthly_data.reverse()
-    
-    context = {
-        'total_income': float(total_income),
-        'total_expenses': float(total_expenses),
-        'net_profit': float(net_profit),
-        'profit_margin': float(profit_margin),
-        'recent_transactions': recent_transactions,
-        'monthly_data': monthly_data,
+    # Month-relative figures change at midnight, so the date is part of the key
+    context = dict(cached_context(
+        user.id, 'dashboard', lambda: _dashboard_data(user), extra=now.date().isoformat()
+    ))
+    context.update({
         'greeting' : greeting,
         'gradient_class': gradient_class,
         'now': now,
-    }
+    })
     
     return render(request, 'finflow/dashboard.html', context)
 
@@ -92,7 +90,7 @@ def dashboard(request):
 def transactions(request):
     """Transactions management view"""
     user = request.user
-    transactions = Transaction.objects.filter(user=user)
+    transactions = Transaction.objects.filter(user=user).select_related('category')
     categories = Category.objects.filter(user=user)
     
     # Filters
@@ -101,29 +99,108 @@ def transactions(request):
     category_id = request.GET.get('category', '')
     
     if search:
-        transactions = transactions.filter(description__icontains=search)
+        transactions = filter_transactions(transactions, user, search)
     if transaction_type:
         transactions = transactions.filter(transaction_type=transaction_type)
     if category_id:
         transactions = transactions.filter(category_id=category_id)
     
+    # Keyset pagination
+    page_size = conf_settings.FINFLOW_TRANSACTIONS_PAGE_SIZE
+    try:
+        page_size = min(max(int(request.GET.get('page_size', page_size)), 1), conf_settings.FINFLOW_TRANSACTIONS_MAX_PAGE_SIZE)
+    except ValueError:
+        pass
+    
+    page, next_cursor, previous_cursor = paginate_transactions(
+        transactions,
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+        page_size=page_size,
+    )
+    
+    # Filters are carried over into the pagination links
+    query = request.GET.copy()
+    for key in ('after', 'before'):
+        query.pop(key, None)
+    
     context = {
-        'transactions': transactions,
+        'transactions': page,
         'categories': categories,
         'search': search,
         'selected_type': transaction_type,
         'selected_category': category_id,
+        'next_cursor': next_cursor,
+        'previous_cursor': previous_cursor,
+        'filter_query': query.urlencode(),
+        'balance': balance_at(user, date.today()),
     }
     
     return render(request, 'finflow/transactions.html', context)
 
 
+@login_required
+def transaction_edit_form(request, pk):
+    """Render the edit modal for one transaction, loaded on demand"""
+    user = request.user
+    transaction = get_object_or_404(Transaction, id=pk, user=user)
+    
+    context = {
+        'transaction': transaction,
+        'categories': Category.objects.filter(user=user),
+    }
+    
+    return render(request, 'finflow/partials/transaction_edit_modal.html', context)
+
+
+@login_required
+def search_transactions_api(request):
+    """Ranked description search, for quick lookups from the front end"""
+    query = request.GET.get('q', '')
+    try:
+        limit = min(int(request.GET.get('limit', 20)), 100)
+    except ValueError:
+        limit = 20
+    
+    results = search_transactions(request.user, query, limit=limit)
+    
+    return JsonResponse({
+        'query': query,
+        'results': [
+            {
+                'id': t.id,
+                'date': t.date.isoformat(),
+                'description': t.description,
+                'category': t.category.name if t.category else '',
+                'type': t.transaction_type,
+                'amount': str(t.amount),
+            }
+            for t in results
+        ],
+    })
+
+
+@login_required
+def sync_changes(request):
+    """Delta sync: transactions and categories changed since the client's token"""
+    try:
+        changes = changes_since(request.user, request.GET.get('token') or None)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+    
+    return JsonResponse(changes)
+
+
 @login_required
 def categories(request):
     """Categories management view"""
     user = request.user
-    income_categories = Category.objects.filter(user=user, category_type='income')
-    expense_categories = Category.objects.filter(user=user, category_type='expense')
+    categories = list(Category.objects.with_stats(user))
+    budgets = {item['id']: item for item in utilization(user)}
+    for category in categories:
+        category.utilization = budgets.get(category.id)
+    income_categories = [c for c in categories if c.category_type == 'income']
+    expense_categories = [c for c in categories if c.category_type == 'expense']
     
     context = {
         'income_categories': income_categories,
@@ -132,67 +209,40 @@ def categories(request):
     
     return render(request, 'finflow/categories.html', context)
 
-@login_required
-def reports(request):
-    user = request.user
-    transactions = Transaction.objects.filter(user=user)
 
-    # -----------------------------
-    # TOTAL INCOME & EXPENSES
-    # -----------------------------
-    total_income = transactions.filter(transaction_type='income').aggregate(
-        total=models.Sum('amount')
-    )['total'] or Decimal('0')
+def _parse_date_param(value):
+    try:
+        return parse_date(value or '')
+    except ValueError:
+        return None
+
 
-    total_expenses = transactions.filter(transaction_type='expense').aggregate(
-        total=models.Sum('amount')
-    )['total'] or Decimal('0')
+def _category_param(user, value):
+    """The user's category named by a ``category`` parameter, None when empty; 404 for anything else"""
+    if not value:
+        return None
+    try:
+        pk = int(value)
+    except ValueError:
+        raise Http404('No such category.')
+    if not 0 < pk < 2 ** 63:
+        raise Http404('No such category.')
+    return get_object_or_404(Category, id=pk, user=user)
 
-    net_profit = total_income - total_expenses
 
+def _reports_context(user):
+    """Build the reports context (cacheable)"""
     # -----------------------------
-    # LAST MONTH VS THIS MONTH COMPARISONS
+    # TOTALS, COUNTS & MONTH-OVER-MONTH COMPARISONS
     # -----------------------------
-    today = datetime.today()
-    first_day_this_month = today.replace(day=1)
-    last_month_end = first_day_this_month - timedelta(days=1)
-    last_month_start = last_month_end.replace(day=1)
-
-    # This month totals
-    income_this_month = transactions.filter(
-        transaction_type='income',
-        date__gte=first_day_this_month
-    ).aggregate(total=models.Sum('amount'))['total'] or Decimal('0')
-
-    expenses_this_month = transactions.filter(
-        transaction_type='expense',
-        date__gte=first_day_this_month
-    ).aggregate(total=models.Sum('amount'))['total'] or Decimal('0')
-
-    profit_this_month = income_this_month - expenses_this_month
-
-    # Last month totals
-    income_last_month = transactions.filter(
-        transaction_type='income',
-        date__range=[last_month_start, last_month_end]
-    ).aggregate(total=models.Sum('amount'))['total'] or Decimal('0')
-
-    expenses_last_month = transactions.filter(
-        transaction_type='expense',
-        date__range=[last_month_start, last_month_end]
-    ).aggregate(total=models.Sum('amount'))['total'] or Decimal('0')
-
-    profit_last_month = income_last_month - expenses_last_month
-
-    # Percentage change helpers
-    def percent_change(current, previous):
-        if previous == 0:
-            return 100 if current > 0 else 0
-        return round(((current - previous) / previous) * 100, 2)
-
-    income_change_percent = percent_change(income_this_month, income_last_month)
-    expense_change_percent = percent_change(expenses_this_month, expenses_last_month)
-    net_profit_change = percent_change(profit_this_month, profit_last_month)
+    summary = financial_summary(user)
+    total_income = summary['total_income']
+    total_expenses = summary['total_expenses']
+    net_profit = summary['net_profit']
+
+    income_change_percent = summary['income_change_percent']
+    expense_change_percent = summary['expense_change_percent']
+    net_profit_change = summary['net_profit_change']
 
     # Profit margin
     profit_margin = (
@@ -203,68 +253,16 @@ def reports(request):
     # -----------------------------
     # TOP INCOME + EXPENSE CATEGORIES
     # -----------------------------
-    income_categories = []
-    for cat in Category.objects.filter(user=user, category_type='income'):
-        amount = transactions.filter(category=cat).aggregate(
-            total=models.Sum('amount')
-        )['total'] or Decimal('0')
+    # The chart datasets themselves are served by chart_data()
+    breakdown = category_breakdown(user)
 
-        income_categories.append({"name": cat.name, "amount": float(amount)})
-
-    top_income_category = (
-        max(income_categories, key=lambda x: x["amount"])["name"]
-        if income_categories else "None"
-    )
-
-    expense_categories_data = []
-    for cat in Category.objects.filter(user=user, category_type='expense'):
-        amount = transactions.filter(category=cat).aggregate(
-            total=models.Sum('amount')
-        )['total'] or Decimal('0')
-
-        expense_categories_data.append({"name": cat.name, "amount": float(amount)})
-
-    top_expense_category = (
-        max(expense_categories_data, key=lambda x: x["amount"])["name"]
-        if expense_categories_data else "None"
-    )
+    # Lists are sorted largest first
+    top_income_category = breakdown["income"][0]["name"] if breakdown["income"] else "None"
+    top_expense_category = breakdown["expense"][0]["name"] if breakdown["expense"] else "None"
 
     # TRANSACTION COUNTS
-    income_transactions = transactions.filter(transaction_type='income').count()
-    expense_transactions = transactions.filter(transaction_type='expense').count()
-
-    monthly_data = []
-    today = datetime.today().replace(day=1)
-
-    for i in range(6):
-        month_start = (today - timedelta(days=30 * i)).replace(day=1)
-        next_month = (month_start + timedelta(days=32)).replace(day=1)
-        month_end = next_month - timedelta(days=1)
-
-        m_income = transactions.filter(
-            transaction_type="income",
-            date__range=[month_start, month_end]
-        ).aggregate(total=models.Sum('amount'))['total'] or Decimal('0')
-
-        m_expenses = transactions.filter(
-            transaction_type="expense",
-            date__range=[month_start, month_end]
-        ).aggregate(total=models.Sum('amount'))['total'] or Decimal('0')
-
-        monthly_data.append({
-            "month": month_start.strftime("%b %Y"),
-            "income": float(m_income),
-            "expenses": float(m_expenses),
-            "net_profit": float(m_income - m_expenses),
-        })
-
-    monthly_data.reverse()
-
-    # Expense categories for doughnut
-    expense_categories = expense_categories_data
-
-    # Top income sources (bar chart)
-    top_income_sources = sorted(income_categories, key=lambda x: x['amount'], reverse=True)[:5]
+    income_transactions = summary['income_count']
+    expense_transactions = summary['expense_count']
 
     context = {
         # Cards
@@ -283,24 +281,92 @@ def reports(request):
         "income_transactions": income_transactions,
         "expense_transactions": expense_transactions,
 
-        # Charts
-        "monthly_data": monthly_data,
-        "expense_categories": expense_categories,
-        "top_income_sources": top_income_sources,
+        # Rolling averages, run-rate, projection and category trends
+        "outlook": forecast(user),
     }
 
+    return context
+
+
+@login_required
+def reports(request):
+    user = request.user
+    context = dict(cached_context(
+        user.id, 'reports', lambda: _reports_context(user), extra=datetime.now().date().isoformat()
+    ))
+    
+    # Range and granularity of the period charts (fetched from chart_data)
+    end = _parse_date_param(request.GET.get('end')) or month_end(date.today())
+    start = _parse_date_param(request.GET.get('start')) or add_months(month_start(end), -5)
+    granularity = request.GET.get('granularity') or 'month'
+    try:
+        buckets(start, end, granularity)
+    except ValueError as e:
+        messages.error(request, str(e))
+        end = month_end(date.today())
+        start, granularity = add_months(month_start(end), -5), 'month'
+    
+    context.update({
+        'period_start': start,
+        'period_end': end,
+        'granularity': granularity,
+        'granularity_name': dict(GRANULARITIES)[granularity],
+        'granularities': GRANULARITIES,
+    })
     return render(request, "finflow/reports.html", context)
 
 
 
 
+def _chart_params(request):
+    start = _parse_date_param(request.GET.get('start'))
+    end = _parse_date_param(request.GET.get('end'))
+    granularity = request.GET.get('granularity') or 'month'
+    return start, end, granularity
+
+
+def _chart_last_modified(request, name):
+    # Shared by the ETag and Last-Modified checks, so it's queried once
+    if not hasattr(request, '_chart_last_modified'):
+        request._chart_last_modified = charts.last_modified(request.user)
+    return request._chart_last_modified
+
+
+def _chart_etag(request, name):
+    return charts.etag(request.user, name, *_chart_params(request), _chart_last_modified(request, name))
+
+
+@login_required
+@condition(etag_func=_chart_etag, last_modified_func=_chart_last_modified)
+def chart_data(request, name):
+    """JSON dataset for one chart; answers conditional GETs with 304"""
+    if name not in charts.CHARTS:
+        raise Http404('Unknown chart')
+    try:
+        data = charts.CHARTS[name](request.user, *_chart_params(request))
+    except ValueError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+    response = JsonResponse(data)
+    # Cache in the browser but revalidate every time
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+@staff_member_required
+def instrumentation_report(request):
+    """Per-view latency and query percentiles and database connection stats (staff only)"""
+    return JsonResponse({
+        'enabled': instrumentation.enabled(),
+        'views': instrumentation.report(),
+        'databases': db.connection_stats(),
+    })
+
+
 @login_required
 def settings(request):
     """Settings view"""
     user = request.user
-    profile = user.profile
-    
-    # Ensure profile exists
+    # One lookup; users created before profiles existed get one here
     profile, created = Profile.objects.get_or_create(user=user)
     
     if request.method == 'POST':
@@ -314,10 +380,17 @@ def settings(request):
         
         profile.business_name = request.POST.get('business_name', '')
         
+        old_variants = list(profile.logo_variants.values())
         if 'business_logo' in request.FILES:
-            profile.business_logo = request.FILES['business_logo']
-            
-        profile.save()
+            try:
+                profile.set_logo(logos.process(request.FILES['business_logo']))
+            except logos.LogoError as e:
+                messages.error(request, f'Error updating logo: {str(e)}')
+                return redirect('finflow:settings')
+        
+        if profile.has_changed():
+            profile.save()
+            logos.delete_unused(old_variants, keep=profile.logo_variants.values())
             
         messages.success(request, 'Settings updated successfully.')
         return redirect('finflow:settings') 
@@ -329,117 +402,112 @@ def settings(request):
     
     return render(request, 'finflow/settings.html', context)
 
+def logo_file(request, name):
+    """A processed logo variant; names are content hashes, so it never changes"""
+    match = logos.NAME_RE.match(name)
+    path = f'{logos.LOGO_DIR}/{name}'
+    if not match or not default_storage.exists(path):
+        raise Http404('No such logo.')
+    response = FileResponse(default_storage.open(path), content_type=logos.CONTENT_TYPES[match.group(1)])
+    patch_cache_control(response, public=True, max_age=365 * 24 * 60 * 60, immutable=True)
+    return response
+
 #export csv view
+@login_required
 def export_report_csv(request):
-    # Calculate totals
-    total_income = Transaction.objects.filter(
-        user=request.user,
-        transaction_type='income'
-    ).aggregate(total=models.Sum('amount'))['total'] or 0
-
-    total_expenses = Transaction.objects.filter(
-        user=request.user,
-        transaction_type='expense'
-    ).aggregate(total=models.Sum('amount'))['total'] or 0
-
-    net_profit = total_income - total_expenses
-
-    # Create CSV response
-    response = HttpResponse(content_type='text/csv')
+    # Rows are generated lazily and streamed, so nothing is buffered in memory
+    response = StreamingHttpResponse(csv_report_lines(request.user), content_type='text/csv')
     response['Content-Disposition'] = (
         f'attachment; filename="finflow_report_{datetime.now().strftime("%Y%m%d")}.csv"'
     )
-    
-    writer = csv.writer(response)
-
-    # Header
-    writer.writerow(['FinFlow - Financial Report'])
-    writer.writerow([f'Generated: {datetime.now().strftime("%Y-%m-%d %H:%M")}'])
-    writer.writerow([])
-    
-    # P&L Summary
-    writer.writerow(['Profit & Loss Statement'])
-    writer.writerow(['Total Income', f'Ksh {total_income}'])
-    writer.writerow(['Total Expenses', f'Ksh {total_expenses}'])
-    writer.writerow(['Net Profit', f'Ksh {net_profit}'])
-    writer.writerow([])
-    
-    # All Transactions
-    writer.writerow(['All Transactions'])
-    writer.writerow(['Date', 'Description', 'Category', 'Type', 'Amount'])
-    
-    transactions = Transaction.objects.filter(user=request.user).order_by('-date')
-    
-    for t in transactions:
-        writer.writerow([
-            t.date,
-            t.description,
-            t.category.name if t.category else '',
-            t.transaction_type.title(),
-            f'Ksh {t.amount}'
-        ])
-    
     return response
 
 #export excel view
+@login_required
 def export_report_excel(request):
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "FinFlow Report"
-
-    # Create data
-    transactions = Transaction.objects.filter(user=request.user)
-
-    ws.append(["Date", "Description", "Category", "Type", "Amount"])
-
-    for t in transactions:
-        ws.append([
-            t.date,
-            t.description,
-            t.category.name if t.category else "",
-            t.transaction_type.title(),
-            t.amount
-        ])
-
-    # Prepare response
-    response = HttpResponse(
-        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
-    response["Content-Disposition"] = (
-        f'attachment; filename="finflow_report_{datetime.now().strftime("%Y%m%d")}.xlsx"'
+    # FileResponse streams the spooled workbook back in blocks
+    return FileResponse(
+        excel_report_file(request.user),
+        as_attachment=True,
+        filename=f'finflow_report_{datetime.now().strftime("%Y%m%d")}.xlsx',
+        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
     )
 
-    wb.save(response)
-    return response
-
 #export pdf view
+@login_required
 def export_report_pdf(request):
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="finflow_report_{datetime.now().strftime("%Y%m%d")}.pdf"'
+    """PDF report, optionally limited by ?start=, ?end= (YYYY-MM-DD) and ?category="""
+    try:
+        report = pdf_report_file(
+            request.user,
+            start=_parse_date_param(request.GET.get('start')),
+            end=_parse_date_param(request.GET.get('end')),
+            category=_category_param(request.user, request.GET.get('category')),
+        )
+    except ReportTooLarge as e:
+        messages.error(request, str(e))
+        return redirect('finflow:reports')
+    return FileResponse(
+        report,
+        as_attachment=True,
+        filename=f'finflow_report_{datetime.now().strftime("%Y%m%d")}.pdf',
+        content_type='application/pdf',
+    )
+
 
-    p = canvas.Canvas(response, pagesize=letter)
-    width, height = letter
+def _export_job_json(job):
+    return {
+        'id': job.id,
+        'format': job.format,
+        'status': job.status,
+        'progress': job.progress,
+        'rows_total': job.rows_total,
+        'rows_done': job.rows_done,
+        'error': job.error,
+        'download_url': reverse('finflow:download_export_job', args=[job.id]) if job.status == 'done' else None,
+    }
 
-    y = height - 50
-    p.setFont("Helvetica-Bold", 16)
-    p.drawString(50, y, "FinFlow - Financial Report")
 
-    y -= 40
-    p.setFont("Helvetica", 12)
+@login_required
+@require_http_methods(["POST"])
+def start_export_job(request):
+    """Queue a background export, or reuse an identical one"""
+    export_format = request.POST.get('format')
+    if export_format not in dict(ExportJob.FORMATS):
+        return JsonResponse({'success': False, 'message': 'Unknown export format.'}, status=400)
+    
+    params = {}
+    if export_format == 'pdf':
+        start = _parse_date_param(request.POST.get('start'))
+        end = _parse_date_param(request.POST.get('end'))
+        params = {
+            'start': start.isoformat() if start else None,
+            'end': end.isoformat() if end else None,
+        }
+        category = _category_param(request.user, request.POST.get('category'))
+        if category:
+            params['category'] = category.id
+    
+    job = request_export(request.user, export_format, params)
+    return JsonResponse({'success': True, 'job': _export_job_json(job)})
 
-    transactions = Transaction.objects.filter(user=request.user)
 
-    for t in transactions:
-        p.drawString(50, y, f"{t.date} - {t.description} - {t.category} - {t.transaction_type} - Ksh {t.amount}")
-        y -= 18
+@login_required
+def export_job_status(request, pk):
+    """Progress of a background export"""
+    job = get_object_or_404(ExportJob, id=pk, user=request.user)
+    return JsonResponse({'success': True, 'job': _export_job_json(job)})
 
-        if y < 50:
-            p.showPage()
-            p.setFont("Helvetica", 12)
-            y = height - 50
 
-    p.save()
-    return response
+@login_required
+def download_export_job(request, pk):
+    """Download the file produced by a finished export job"""
+    job = get_object_or_404(ExportJob, id=pk, user=request.user, status='done')
+    return FileResponse(
+        job.file.open('rb'),
+        as_attachment=True,
+        filename=f'finflow_report_{job.created_at.strftime("%Y%m%d")}.{job.format}',
+    )
 
 
 # API endpoints for AJAX requests
@@ -458,14 +526,16 @@ def add_transaction(request):
         
         category = get_object_or_404(Category, id=category_id, user=user)
         
-        transaction = Transaction.objects.create(
-            user=user,
-            date=date,
-            description=description,
-            category=category,
-            transaction_type=transaction_type,
-            amount=Decimal(amount)
-        )
+        # The monthly rollup is updated by signals in the same DB transaction
+        with db_transaction.atomic():
+            transaction = Transaction.objects.create(
+                user=user,
+                date=date,
+                description=description,
+                category=category,
+                transaction_type=transaction_type,
+                amount=Decimal(amount)
+            )
         messages.success(request, "Transaction added successfully. ")
         JsonResponse({'success': True, 'message': 'Transaction added successfully.'})
     except Exception as e:
@@ -474,6 +544,67 @@ def add_transaction(request):
         
     return redirect('finflow:transactions')
 
+@login_required
+@require_http_methods(["POST"])
+def import_transactions_view(request):
+    """Bulk import transactions from an uploaded CSV/XLSX file"""
+    upload = request.FILES.get('file')
+    is_ajax = request.POST.get('ajax') == 'true'
+    
+    if upload is None:
+        result = {'success': False, 'message': 'Choose a CSV or Excel file to import.'}
+    else:
+        try:
+            result = import_transactions(
+                request.user, upload, upload.name, dry_run=request.POST.get('dry_run') == 'true'
+            )
+            result['success'] = True
+            result['message'] = (
+                f"Imported {result['created']} of {result['rows']} rows"
+                f"{', ' + str(result['error_count']) + ' rows skipped' if result['error_count'] else ''}."
+            )
+        except ImportFileError as e:
+            result = {'success': False, 'message': str(e)}
+    
+    if is_ajax:
+        return JsonResponse(result, status=200 if result['success'] else 400)
+    
+    if result['success']:
+        messages.success(request, result['message'])
+        for error in result['errors'][:10]:
+            messages.warning(request, f"Row {error['row']}: {' '.join(error['errors'])}")
+    else:
+        messages.error(request, result['message'])
+    return redirect('finflow:transactions')
+
+@login_required
+@require_http_methods(["POST"])
+def batch_transactions(request):
+    """Apply a JSON batch of transaction create/update/delete operations atomically"""
+    try:
+        payload = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'Request body must be valid JSON.'}, status=400)
+    
+    try:
+        operations = payload.get('operations') if isinstance(payload, dict) else None
+        applied, results = apply_batch(request.user, operations)
+    except BatchError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+    
+    if not applied:
+        failed = sum(1 for result in results if result['errors'])
+        return JsonResponse({
+            'success': False,
+            'message': f'{failed} of {len(results)} operations are invalid; nothing was changed.',
+            'results': results,
+        }, status=400)
+    return JsonResponse({
+        'success': True,
+        'message': f'Applied {len(results)} operations.',
+        'results': results,
+    })
+
 @login_required
 @require_http_methods(["POST"])
 def update_transaction(request, pk):
@@ -495,7 +626,8 @@ def update_transaction(request, pk):
         transaction.category = category
         transaction.transaction_type = transaction_type
         transaction.amount = Decimal(amount)
-        transaction.save()
+        with db_transaction.atomic():
+            transaction.save()
 
         messages.success(request, 'Transaction updated successfully.')
     except Exception as e:
@@ -529,6 +661,8 @@ def add_category(request):
             name=name,
             category_type=category_type
         )
+        # A brand new category has no transactions yet
+        category.num_transactions = 0
         message = f'Category "{name}" added successfully.'
         if is_ajax:
             return JsonResponse({
@@ -584,7 +718,7 @@ def delete_category(request, pk):
 def update_category(request, pk):
     """Update an existing category"""
     user = request.user
-    category = get_object_or_404(Category, id=pk, user=user)
+    category = get_object_or_404(Category.objects.with_stats(user), id=pk)
 
     name = request.POST.get('name')
     category_type = request.POST.get('category_type', category.category_type)
@@ -618,3 +752,50 @@ def update_category(request, pk):
     return redirect('finflow:categories')
 
 
+@login_required
+@require_http_methods(["POST"])
+def set_budget(request, pk):
+    """Set (or with an empty amount remove) the monthly budget of an expense category"""
+    category = get_object_or_404(Category, id=pk, user=request.user)
+    raw_amount = (request.POST.get('amount') or '').strip()
+    is_ajax = request.POST.get('ajax') == 'true'
+
+    try:
+        if category.category_type != 'expense':
+            raise ValueError('Budgets can only be set on expense categories.')
+        if raw_amount:
+            amount = parse_amount(raw_amount)
+            if amount is None or not amount.is_finite() or not 0 <= amount < Decimal('100000000'):
+                raise ValueError(f'Invalid budget amount "{raw_amount}".')
+            with db_transaction.atomic():
+                budget, _ = Budget.objects.update_or_create(
+                    category=category, defaults={'user': request.user, 'amount': amount},
+                )
+                refresh_budget(budget)
+            message = f'Budget for "{category.name}" set to {amount}.'
+        else:
+            Budget.objects.filter(category=category).delete()
+            message = f'Budget for "{category.name}" removed.'
+        budget = next((item for item in utilization(request.user) if item['id'] == category.id), None)
+        if is_ajax:
+            return JsonResponse({
+                'success': True,
+                'message': message,
+                'budget': budget and {
+                    'budget': str(budget['budget']),
+                    'spent': str(budget['spent']),
+                    'remaining': str(budget['remaining']),
+                    'percent': budget['percent'],
+                    'over_budget': budget['over_budget'],
+                },
+            })
+        else:
+            messages.success(request, message)
+    except ValueError as e:
+        error_msg = f'Error setting budget: {str(e)}'
+        if is_ajax:
+            return JsonResponse({'success': False, 'message': error_msg}, status=400)
+        else:
+            messages.error(request, error_msg)
+
+    return redirect('finflow:categories')